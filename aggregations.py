@@ -0,0 +1,189 @@
+# aggregations.py
+# Shared, memoized group-by aggregates for the dashboard views.
+#
+# One AggregationService exists per data version (the app caches it next to the
+# FilterIndex). Every view asks it for "<stat> of <KPIs> by <dimension> under these
+# filters"; results live in a bounded LRU, so the same aggregate requested by
+# another view, another rerun or another session is a dictionary lookup. Misses are
+# rolled up from the KPI cube (kpi_cube.py) where the statistic is additive, and
+# only fall back to scanning the filtered rows for min/max or non-cube dimensions.
+# Trends (time_series.py) are built from per-day totals rolled up the same way.
+
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from filter_index import FilterIndex
+from kpi_cube import KpiCube
+from schema import KPI_GROUPS, numeric_cols
+from time_series import MAX_POINTS, ROWS, daily_totals_from_rows, total_cols, trend_from_totals
+
+# dimension name -> column; raw column names are accepted as well
+DIMENSIONS = {
+    "block": "block_name_static",
+    "shelter_type": "shelter_category",
+    "officer": "officer_name",
+    "date": "date",
+}
+STATS = ("mean", "sum", "count", "min", "max", "std", "var", "size")
+FILTER_KEYS = ("start", "end", "block", "shelter_type", "officer")
+
+
+def composite_score(agg: pd.DataFrame, kpis: list) -> pd.DataFrame:
+    """Add a "score" column (mean of min-max normalised KPIs) and sort by it, best first."""
+    df_norm = agg.copy()
+    for c in kpis:
+        mn = df_norm[c].min(); mx = df_norm[c].max()
+        if pd.isna(mn) or pd.isna(mx) or mx == mn:
+            df_norm[c] = 0.5
+        else:
+            df_norm[c] = (df_norm[c] - mn) / (mx - mn)
+    df_norm["score"] = df_norm[kpis].mean(axis=1)
+    return df_norm.sort_values("score", ascending=False)
+
+
+def filter_key(filters) -> tuple:
+    """Hashable, normalised form of a filter-state dict."""
+    filters = filters or {}
+    key = []
+    for name in FILTER_KEYS:
+        value = filters.get(name)
+        if value is None or value == "All":
+            value = None
+        elif name in ("start", "end"):
+            value = pd.Timestamp(value).strftime("%Y-%m-%d")
+        else:
+            value = str(value)
+        key.append(value)
+    return tuple(key)
+
+
+class AggregationService:
+    """Group-by aggregates over the filtered inspection rows, memoized in an LRU."""
+
+    def __init__(self, index: FilterIndex, version: str, max_entries: int = 256, cube: KpiCube = None):
+        self.index = index
+        self.cube = cube if cube is not None else KpiCube(index.frame)
+        self.version = version
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        return self.index.frame
+
+    def resolve_kpis(self, kpis) -> list:
+        """Numeric columns for a KPI group name, a single KPI or a list of KPIs."""
+        if kpis is None:
+            return []
+        if isinstance(kpis, str):
+            kpis = KPI_GROUPS.get(kpis, [kpis])
+        return numeric_cols(self.frame, list(kpis))
+
+    def filtered(self, filters=None) -> pd.DataFrame:
+        start, end, block, shelter_type, officer = filter_key(filters)
+        return self.index.select(start, end, block=block, shelter_type=shelter_type, officer=officer)
+
+    def _compute(self, dimension: str, kpis: list, stat: str, filters) -> pd.DataFrame:
+        col = DIMENSIONS.get(dimension, dimension)
+        if self.cube.supports(col, stat, kpis):
+            start, end, block, shelter_type, officer = filter_key(filters)
+            return self.cube.rollup(col, kpis, stat, start, end, block=block,
+                                    shelter_type=shelter_type, officer=officer)
+        df = self.filtered(filters)
+        if col not in df.columns:
+            return pd.DataFrame()
+        grouped = df.groupby(col, observed=True)
+        if stat == "size":
+            return grouped.size().reset_index(name="Inspections")
+        if not kpis:
+            return pd.DataFrame(columns=[col])
+        return grouped[kpis].agg(stat).reset_index()
+
+    def aggregate(self, dimension: str, kpis=None, stat: str = "mean", filters=None) -> pd.DataFrame:
+        """<stat> of kpis grouped by dimension, for the rows matching filters.
+
+        kpis is a KPI group name, a KPI column or a list of KPI columns (only the
+        numeric ones are aggregated). stat "size" counts rows as "Inspections".
+        Returns a fresh frame with the dimension column followed by the KPIs.
+        """
+        if stat not in STATS:
+            raise ValueError(f"unsupported statistic: {stat}")
+        cols = self.resolve_kpis(kpis)
+        key = (dimension, tuple(cols), stat, filter_key(filters))
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key].copy()
+        result = self._compute(dimension, cols, stat, filters)
+        self._store(key, result)
+        return result.copy()
+
+    def _store(self, key, result: pd.DataFrame):
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def top_n(self, dimension: str, kpis=None, stat: str = "mean", n: int = 10, filters=None,
+              ascending: bool = False, by: str = None) -> pd.DataFrame:
+        """The n best (or, ascending, the n lowest) groups by `by` (default: the first KPI,
+        or "Inspections" for stat "size"); groups without a value are left out."""
+        agg = self.aggregate(dimension, kpis, stat, filters)
+        by = by or ("Inspections" if stat == "size" else next((c for c in self.resolve_kpis(kpis)), None))
+        if by not in agg.columns:
+            return agg
+        return agg.dropna(subset=[by]).sort_values(by, ascending=ascending, kind="stable").head(n)
+
+    def summary(self, kpis, stats=("count", "mean", "sum"), filters=None) -> pd.DataFrame:
+        """One row per KPI with the requested statistics over all filtered rows."""
+        cols = self.resolve_kpis(kpis)
+        key = ("__summary__", tuple(cols), tuple(stats), filter_key(filters))
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key].copy()
+        if self.cube.supports(None, "mean", cols):
+            start, end, block, shelter_type, officer = filter_key(filters)
+            parts = {s: self.cube.rollup(None, cols, s, start, end, block=block, shelter_type=shelter_type,
+                                         officer=officer).iloc[0] for s in stats}
+            result = pd.DataFrame(parts).reindex(cols).rename_axis("kpi").reset_index()
+        else:
+            result = self.filtered(filters)[cols].agg(list(stats)).T.reset_index().rename(columns={"index": "kpi"})
+        self._store(key, result)
+        return result.copy()
+
+    def daily_totals(self, kpis=None, filters=None) -> pd.DataFrame:
+        """Per-day row count and KPI sums / non-null counts of the filtered rows."""
+        cols = self.resolve_kpis(kpis)
+        key = ("__daily__", tuple(cols), filter_key(filters))
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key].copy()
+        if self.cube.supports("date", "sum", cols):
+            start, end, block, shelter_type, officer = filter_key(filters)
+            cells = self.cube.cells(start, end, block=block, shelter_type=shelter_type, officer=officer)
+            measures = [ROWS] + [c for k in cols for c in total_cols(k)]
+            result = cells.groupby("date", sort=True)[measures].sum().reset_index()
+        else:
+            result = daily_totals_from_rows(self.filtered(filters), cols)
+        self._store(key, result)
+        return result.copy()
+
+    def trend(self, kpi=None, filters=None, stat: str = "mean", freq: str = "D", rolling: int = 0,
+              max_points: int = MAX_POINTS) -> pd.DataFrame:
+        """<stat> of kpi per day / week / month / quarter, see time_series.trend_from_totals."""
+        return trend_from_totals(self.daily_totals([kpi] if kpi else None, filters), kpi, stat, freq, rolling, max_points)
+
+    def stats(self) -> dict:
+        return {"version": self.version, "entries": len(self._cache), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,198 @@
+# batch.py
+# Headless batch run: the district pack without Streamlit.
+#
+# Loads and prepares the data once (same sheet snapshot, data prep, filter index
+# and aggregation service as the dashboard), writes the district-wide KPI tables,
+# leaderboards and coverage, then fans the per-block work (officer tables and the
+# block PDF report) out over a process pool. Meant to run nightly, e.g.
+#
+#   python batch.py --out district_pack
+#   python batch.py --input snapshot.parquet --start 2025-01-01 --end 2025-03-31 --workers 4
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from aggregations import AggregationService, composite_score
+from chart_images import ChartImageCache
+from data_prep import data_fingerprint, prep_key, prepare_inspection, prepare_static
+from filter_index import FilterIndex
+from reports import build_report_pdf, sample_table
+from schema import COL_RENAME, KPI_GROUPS
+from sources import load_registry, sync_sources
+from shelter_matching import coverage, load_or_build_match_table, static_shelter_count
+
+SOURCES_PATH = "sources.json"
+LOCAL_STATIC_PATH = "goshala_static_data.xlsx"
+SNAPSHOT_DIR = ".goshala_cache"
+REPORT_FONT_PATH = "DejaVuSans.ttf"
+INSPECT_SHELTER_COL = "shelter_name_static"
+STATIC_SHELTER_COL = "shelter_name_base"
+
+
+def slug(name: str) -> str:
+    """Directory name for a block: the name with path separators, whitespace and control
+    characters replaced (Devanagari matras / virama kept), plus a short hash of the
+    original name so that distinct names never share a directory."""
+    text = re.sub(r'[\s/\\:*?"<>|\x00-\x1f\x7f]+', "_", str(name)).strip("_.") or "unknown"
+    return f"{text}_{hashlib.sha1(str(name).encode('utf-8')).hexdigest()[:8]}"
+
+
+def load_inspection(args) -> pd.DataFrame:
+    if args.input:
+        if args.input.endswith(".parquet"):
+            return pd.read_parquet(args.input)
+        return pd.read_csv(args.input, dtype=str)
+    df, reports = sync_sources(load_registry(args.sources), SNAPSHOT_DIR)
+    for r in reports:
+        if not r["ok"]:
+            print(f"source {r['source']}: {r['state']} ({r.get('error')})", file=sys.stderr)
+    return df
+
+
+def load_static(path: str) -> pd.DataFrame:
+    try:
+        return pd.read_excel(path)
+    except Exception:
+        return pd.DataFrame()
+
+
+def write_csv(df: pd.DataFrame, path: str, files: list):
+    df.to_csv(path, index=False, encoding="utf-8")
+    files.append(path)
+
+
+def kpi_tables(service: AggregationService, filters: dict, out_dir: str, dimensions, files: list):
+    """Mean of every KPI group by each dimension, plus inspection counts."""
+    for dim in dimensions:
+        write_csv(service.aggregate(dim, stat="size", filters=filters), os.path.join(out_dir, f"inspections_by_{dim}.csv"), files)
+        for group in KPI_GROUPS:
+            kpis = service.resolve_kpis(group)
+            if kpis:
+                write_csv(service.aggregate(dim, kpis, "mean", filters),
+                          os.path.join(out_dir, f"kpi_{group}_by_{dim}.csv"), files)
+
+
+def leaderboards(service: AggregationService, filters: dict, out_dir: str, files: list):
+    lb = service.aggregate("block", stat="size", filters=filters).sort_values("Inspections", ascending=False)
+    write_csv(lb, os.path.join(out_dir, "leaderboard_inspections.csv"), files)
+    for group in KPI_GROUPS:
+        kpis = service.resolve_kpis(group)
+        if kpis:
+            scored = composite_score(service.aggregate("block", kpis, "mean", filters), kpis)
+            write_csv(scored[["block_name_static", "score"] + kpis], os.path.join(out_dir, f"leaderboard_{group}.csv"), files)
+
+
+def block_pack(block: str, rows: pd.DataFrame, filters: dict, out_dir: str, match_table, total_static: int) -> dict:
+    """Per-block outputs, run in a worker process: officer KPI tables and the block PDF."""
+    started = time.perf_counter()
+    block_dir = os.path.join(out_dir, "blocks", slug(block))
+    os.makedirs(block_dir, exist_ok=True)
+    files = []
+    service = AggregationService(FilterIndex(rows), version=f"block:{block}")
+    kpi_tables(service, filters, block_dir, ["officer"], files)
+
+    selected = service.filtered(filters)
+    trend = service.aggregate("date", stat="size", filters=filters)
+    metrics = [("Inspections", len(selected))]
+    if match_table is not None:
+        cov = coverage(match_table, selected[INSPECT_SHELTER_COL], total_static)
+        metrics.append(("Shelters inspected (static matches)", cov["inspected"]))
+    spec = {
+        "title": f"Goshala Inspection Report — {block}",
+        "start": filters.get("start") or "all",
+        "end": filters.get("end") or "all",
+        "filters": {"Block": block},
+        "metrics": metrics,
+        "charts": [{"title": "Inspections per day", "data": trend, "x": "date", "y": "Inspections"}] if len(trend) else [],
+        "table": sample_table(selected, ["date", "shelter_name_static", "officer_name"]),
+    }
+    images = ChartImageCache(cache_dir=os.path.join(SNAPSHOT_DIR, "charts"))
+    pdf_path = os.path.join(block_dir, "report.pdf")
+    with open(pdf_path, "wb") as f:
+        f.write(build_report_pdf(spec, font_path=REPORT_FONT_PATH, images=images))
+    files.append(pdf_path)
+    return {"block": block, "rows": len(rows), "files": files, "seconds": round(time.perf_counter() - started, 3)}
+
+
+def run(args) -> dict:
+    started = time.perf_counter()
+    os.makedirs(args.out, exist_ok=True)
+    raw = load_inspection(args)
+    fingerprint = data_fingerprint(raw)
+    df = prepare_inspection(raw, COL_RENAME)
+    static_df = prepare_static(load_static(args.static), COL_RENAME)
+    index = FilterIndex(df)
+    service = AggregationService(index, prep_key(fingerprint))
+    filters = {"start": args.start, "end": args.end}
+    files = []
+
+    kpi_tables(service, filters, args.out, ["block", "officer"], files)
+    leaderboards(service, filters, args.out, files)
+
+    match_table, total_static = None, 0
+    if STATIC_SHELTER_COL in static_df.columns and INSPECT_SHELTER_COL in df.columns:
+        match_table = load_or_build_match_table(df[INSPECT_SHELTER_COL], static_df[STATIC_SHELTER_COL], SNAPSHOT_DIR)
+        total_static = static_shelter_count(static_df[STATIC_SHELTER_COL])
+        cov = coverage(match_table, service.filtered(filters)[INSPECT_SHELTER_COL], total_static)
+        path = os.path.join(args.out, "coverage.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(cov, f, indent=2)
+        files.append(path)
+
+    blocks = index.options("block")
+    if args.blocks:
+        blocks = [b for b in blocks if b in set(args.blocks)]
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        # each worker gets only its block's rows
+        futures = {pool.submit(block_pack, b, index.select(block=b), filters, args.out, match_table, total_static): b
+                   for b in blocks}
+        for fut in as_completed(futures):
+            try:
+                results.append(fut.result())
+            except Exception as e:
+                results.append({"block": futures[fut], "error": str(e)})
+                print(f"block {futures[fut]} failed: {e}", file=sys.stderr)
+
+    manifest = {
+        "generated_at": pd.Timestamp.now().isoformat(timespec="seconds"),
+        "data_version": prep_key(fingerprint),
+        "rows": len(df),
+        "filters": filters,
+        "files": files,
+        "blocks": sorted(results, key=lambda r: r["block"]),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    with open(os.path.join(args.out, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return manifest
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Compute the Goshala district pack without the dashboard.")
+    p.add_argument("--out", default="district_pack", help="output directory")
+    p.add_argument("--input", help="inspection CSV / Parquet file (default: sync the Google Sheet)")
+    p.add_argument("--sources", default=SOURCES_PATH, help="sheet registry JSON (default: the single default sheet)")
+    p.add_argument("--static", default=LOCAL_STATIC_PATH, help="static shelter Excel file")
+    p.add_argument("--start", help="first inspection date (YYYY-MM-DD)")
+    p.add_argument("--end", help="last inspection date (YYYY-MM-DD)")
+    p.add_argument("--blocks", nargs="*", help="only these blocks")
+    p.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    return p.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    m = run(args)
+    failed = [b for b in m["blocks"] if "error" in b]
+    print(f"{len(m['files'])} district files, {len(m['blocks'])} blocks ({len(failed)} failed) "
+          f"in {m['seconds']}s -> {os.path.abspath(args.out)}")
+    sys.exit(1 if failed else 0)
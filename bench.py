@@ -0,0 +1,223 @@
+# bench.py
+# Stage-by-stage benchmark of the dashboard pipeline on synthetic data.
+#
+# Generates raw inspection / static sheets (synthetic_data.py), then times each
+# stage the dashboard goes through on a cold start and on typical interactions,
+# and writes the timings as JSON so runs can be compared across versions:
+#
+#   python bench.py --rows 100000 --out bench_results/100k.json
+#   python bench.py --rows 1000000 --blocks 40 --compare bench_results/100k.json
+#
+# Memory is roughly 1 GB per million raw rows (all sheet columns are kept).
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from aggregations import DIMENSIONS, AggregationService
+from data_prep import data_fingerprint, prepare_inspection, prepare_static
+from exports import write_csv, write_parquet, write_xlsx
+from filter_index import FilterIndex
+from geo import parse_gps
+from query_store import open_store
+from reports import build_report_pdf, sample_table
+from schema import COL_RENAME, KPI_GROUPS, all_numeric_kpis
+from sheet_sync import parse_csv_bytes
+from shelter_matching import build_match_table, coverage, static_shelter_count
+from synthetic_data import make_inspection, make_static
+
+FILTER_QUERIES = 50
+
+
+class Stages:
+    """Wall-clock seconds per named stage."""
+
+    def __init__(self, verbose: bool = True):
+        self.seconds = {}
+        self.verbose = verbose
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        yield
+        self.seconds[name] = round(time.perf_counter() - started, 4)
+        if self.verbose:
+            print(f"{name:<28} {self.seconds[name]:>10.4f}s", flush=True)
+
+
+def _git_revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run(args) -> dict:
+    timer = Stages(verbose=not args.quiet)
+    stage = timer.stage
+    rng = np.random.default_rng(args.seed)
+    details = {}
+
+    with stage("generate"):
+        raw = make_inspection(args.rows, blocks=args.blocks, shelters=args.shelters, officers=args.officers,
+                              invalid_gps=args.invalid_gps, seed=args.seed)
+        raw_static = make_static(blocks=args.blocks, shelters=args.shelters, seed=args.seed)
+
+    # sheet load: the CSV export as the sync sees it, and the local Parquet snapshot
+    csv_bytes = raw.to_csv(index=False).encode("utf-8")
+    details["csv_mb"] = round(len(csv_bytes) / 2**20, 2)
+    with stage("sheet_load_csv"):
+        raw = parse_csv_bytes(csv_bytes)
+    del csv_bytes
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot = os.path.join(tmp, "snapshot.parquet")
+        with stage("snapshot_write"):
+            raw.to_parquet(snapshot, index=False)
+        with stage("snapshot_read"):
+            raw = pd.read_parquet(snapshot)
+
+    with stage("fingerprint"):
+        data_fingerprint(raw)
+    with stage("gps_parse"):
+        parse_gps(raw["GPS Location inspection "])
+    with stage("prep_inspection"):
+        df = prepare_inspection(raw, COL_RENAME)
+    with stage("prep_static"):
+        static_df = prepare_static(raw_static, COL_RENAME)
+    del raw
+
+    with stage("filter_index_build"):
+        index = FilterIndex(df)
+    lo, hi = index.date_bounds()
+    blocks, officers = index.options("block"), index.options("officer")
+    queries = []
+    for _ in range(FILTER_QUERIES):
+        a, b = sorted(rng.integers(0, max(1, (hi - lo).days), 2))
+        queries.append({"start": lo + pd.Timedelta(days=int(a)), "end": lo + pd.Timedelta(days=int(b)),
+                        "block": blocks[rng.integers(len(blocks))] if rng.random() < 0.7 else None,
+                        "officer": officers[rng.integers(len(officers))] if rng.random() < 0.3 else None})
+    with stage("filter_queries"):
+        rows = sum(len(index.select(q["start"], q["end"], block=q["block"], officer=q["officer"])) for q in queries)
+    details["filter_query_ms"] = round(timer.seconds["filter_queries"] / FILTER_QUERIES * 1000, 3)
+    details["filter_rows_avg"] = rows // FILTER_QUERIES
+
+    with stage("coverage_match"):
+        table = build_match_table(df["shelter_name_static"], static_df["shelter_name_base"])
+        cov = coverage(table, df["shelter_name_static"], static_shelter_count(static_df["shelter_name_base"]))
+    details["coverage"] = cov
+
+    with stage("aggregation_service_build"):
+        service = AggregationService(index, "bench")
+    # stays below the service's LRU size, so the warm pass measures cache hits
+    requests_ = [(dim, group, q) for dim in DIMENSIONS for group in KPI_GROUPS for q in queries[:3]]
+    with stage("aggregations_cold"):
+        for dim, group, q in requests_:
+            service.aggregate(dim, group, "mean", q)
+    with stage("aggregations_warm"):
+        for dim, group, q in requests_:
+            service.aggregate(dim, group, "mean", q)
+    with stage("aggregations_minmax"):
+        for dim, group, q in requests_[:len(requests_) // 5]:
+            service.aggregate(dim, group, "max", q)
+    kpi = service.resolve_kpis(next(iter(KPI_GROUPS)))[:1]
+    with stage("trends"):
+        for q in queries[:10]:
+            for freq in ("D", "W", "M"):
+                service.trend(kpi[0] if kpi else None, q, stat="mean" if kpi else "size", freq=freq, rolling=4)
+    details["aggregate_requests"] = len(requests_)
+    details["aggregation_cache"] = service.stats()
+
+    if args.query_store:
+        with tempfile.TemporaryDirectory() as tmp:
+            with stage("query_store_build"):
+                store = open_store(tmp, "bench", lambda: (df, static_df))
+            details["query_store_mb"] = store.stats()["file_mb"]
+            with stage("query_store_filters"):
+                for q in queries:
+                    store.count(q)
+            with stage("query_store_aggregations"):
+                for dim, group, q in requests_:
+                    store.aggregate(dim, group, "mean", q)
+            with stage("query_store_top_n"):
+                for group in KPI_GROUPS:
+                    store.top_n("block", group, "mean", 10, queries[0])
+            store = None
+
+    kpis = all_numeric_kpis(df)
+    with stage("correlation"):
+        df[kpis].corr()
+
+    export = df.head(args.export_rows)
+    details["export_rows"] = len(export)
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt, writer in (("csv", write_csv), ("xlsx", write_xlsx), ("parquet", write_parquet)):
+            path = os.path.join(tmp, f"export.{fmt}")
+            with stage(f"export_{fmt}"):
+                writer(export, path)
+            details[f"export_{fmt}_mb"] = round(os.path.getsize(path) / 2**20, 2)
+    trend = service.aggregate("date", stat="size")
+    spec = {"title": "Benchmark", "metrics": [("Inspections", len(df))], "table": sample_table(df),
+            "charts": [{"title": "Inspections per day", "data": trend, "x": "date", "y": "Inspections"}]}
+    with stage("pdf_report"):
+        build_report_pdf(spec)
+
+    return {
+        "meta": {
+            "timestamp": pd.Timestamp.now().isoformat(timespec="seconds"),
+            "git": _git_revision(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "params": {k: v for k, v in vars(args).items() if k not in ("out", "compare", "quiet")},
+        "stages": timer.seconds,
+        "details": details,
+    }
+
+
+def compare(current: dict, baseline: dict):
+    print(f"\n{'stage':<28} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for name, sec in current["stages"].items():
+        base = baseline.get("stages", {}).get(name)
+        ratio = f"{sec / base:.2f}x" if base else "-"
+        print(f"{name:<28} {base if base is not None else '-':>10} {sec:>10} {ratio:>7}")
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Benchmark the dashboard pipeline on synthetic data.")
+    p.add_argument("--rows", type=int, default=100_000, help="inspection rows (10k .. 5M)")
+    p.add_argument("--blocks", type=int, default=20)
+    p.add_argument("--shelters", type=int, default=800)
+    p.add_argument("--officers", type=int, default=60)
+    p.add_argument("--invalid-gps", type=float, default=0.05, help="share of blank / swapped GPS strings")
+    p.add_argument("--export-rows", type=int, default=100_000, help="rows written by the export stages")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--query-store", action="store_true", help="also time the SQLite query store")
+    p.add_argument("--out", help="write the results JSON here")
+    p.add_argument("--compare", help="baseline results JSON to compare against")
+    p.add_argument("--quiet", action="store_true")
+    return p.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    result = run(args)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False, default=str)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(result, json.load(f))
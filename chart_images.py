@@ -0,0 +1,132 @@
+# chart_images.py
+# Content-addressed cache of rendered chart images.
+#
+# Rendering a Plotly figure to PNG goes through kaleido (a headless browser) and
+# dominates report build time. The rendered bytes only depend on the figure spec
+# and the render options, so they are cached under a hash of both: in memory in
+# an LRU bounded by total bytes, and optionally on disk so the images survive a
+# restart. The disk tier has its own byte budget: a disk hit touches the file,
+# and each write removes the least recently used files (oldest mtime) beyond the
+# budget. Failed renders are not cached.
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_DISK_BYTES = 256 * 1024 * 1024
+
+
+def figure_key(fig, fmt: str = "png", scale: float = 2, width=None, height=None) -> str:
+    """Hash of the figure JSON and the render options."""
+    options = json.dumps({"format": fmt, "scale": scale, "width": width, "height": height}, sort_keys=True)
+    h = hashlib.sha256(options.encode("utf-8"))
+    h.update(fig.to_json().encode("utf-8"))
+    return h.hexdigest()
+
+
+def render_figure(fig, fmt: str = "png", scale: float = 2, width=None, height=None):
+    """Image bytes of a plotly figure, or None when kaleido is unavailable."""
+    try:
+        return fig.to_image(format=fmt, scale=scale, width=width, height=height)
+    except Exception:
+        return None
+
+
+class ChartImageCache:
+    """Byte-bounded LRU of rendered figures, optionally backed by a directory."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, cache_dir=None, renderer=render_figure,
+                 max_disk_bytes: int = DEFAULT_MAX_DISK_BYTES):
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.cache_dir = cache_dir
+        self.renderer = renderer
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.size = 0
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key: str, fmt: str):
+        return os.path.join(self.cache_dir, f"chart_{key[:32]}.{fmt}") if self.cache_dir else None
+
+    def get(self, fig, fmt: str = "png", scale: float = 2, width=None, height=None):
+        """Rendered image bytes, from memory, disk or a fresh render (None on failure)."""
+        key = figure_key(fig, fmt, scale, width, height)
+        with self._lock:
+            data = self._images.get(key)
+            if data is not None:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return data
+        path = self._path(key, fmt)
+        if path and os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                os.utime(path)  # recently used: evicted last
+                self._put(key, data, counter="disk_hits")
+                return data
+            except Exception:
+                pass
+        data = self.renderer(fig, fmt, scale, width, height)
+        with self._lock:
+            self.misses += 1
+        if data:
+            self._put(key, data)
+            if path:
+                self._write(path, data)
+        return data
+
+    def _put(self, key: str, data: bytes, counter=None):
+        with self._lock:
+            if counter:
+                setattr(self, counter, getattr(self, counter) + 1)
+            if key in self._images:
+                self.size -= len(self._images.pop(key))
+            self._images[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes and len(self._images) > 1:
+                _, old = self._images.popitem(last=False)
+                self.size -= len(old)
+
+    def _write(self, path: str, data: bytes):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+            self._evict_disk(path)
+        except Exception:
+            pass
+
+    def _evict_disk(self, keep: str):
+        """Remove the least recently used chart files until the directory fits max_disk_bytes."""
+        files = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.startswith("chart_") and not entry.name.endswith(".tmp"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        return {"entries": len(self._images), "bytes": self.size, "hits": self.hits,
+                "disk_hits": self.disk_hits, "misses": self.misses}
@@ -0,0 +1,107 @@
+# data_prep.py
+# Preprocessing pipeline for the inspection and static frames.
+#
+# The raw frames are prepared once per data version: callers key their cache on
+# data_fingerprint(raw) together with PREP_VERSION, so every rerun starts from the
+# already-prepared frame. The prepare_* functions never modify their input and the
+# frames they return are shared between reruns, so treat them as read-only.
+
+import hashlib
+
+import pandas as pd
+
+from geo import add_coordinates
+from schema import STATIC_COL_RENAME, apply_schema
+
+# bump whenever a step below changes its output, so cached frames are rebuilt
+PREP_VERSION = 3
+
+INSPECTION_TEXT_COLS = ["block_name_static", "shelter_name_static", "shelter_category", "officer_name"]
+STATIC_TEXT_COLS = ["block_name_static", "shelter_name_static", "shelter_category"]
+
+
+def data_fingerprint(df: pd.DataFrame) -> str:
+    """Content hash of a frame (values and header), used as its data version."""
+    h = hashlib.sha256()
+    h.update("\x1f".join(map(str, df.columns)).encode("utf-8"))
+    if len(df):
+        h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return h.hexdigest()
+
+
+def prep_key(fingerprint: str) -> str:
+    return f"v{PREP_VERSION}:{fingerprint}"
+
+
+# -------------------------------
+# Steps
+# -------------------------------
+def safe_rename(df: pd.DataFrame, mapping: dict) -> pd.DataFrame:
+    present_map = {k: v for k, v in mapping.items() if k in df.columns}
+    return df.rename(columns=present_map)
+
+
+def ensure_date_col(df: pd.DataFrame):
+    # prefer existing renamed 'date', else try Created At / created_at; gaps in
+    # 'date' are filled from the creation timestamp. Kept as day-level datetime64
+    # rather than python date objects.
+    dates = pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns]")
+    if "date" in df.columns:
+        try:
+            dates = pd.to_datetime(df["date"], errors="coerce").dt.normalize()
+        except Exception:
+            pass
+    for c in ["Created At", "created_at", "CreatedAt", "Created"]:
+        if not dates.isna().any():
+            break
+        if c in df.columns:
+            try:
+                dates = dates.fillna(pd.to_datetime(df[c], errors="coerce").dt.normalize())
+            except Exception:
+                pass
+    df["date"] = dates
+    return df
+
+
+def prefix_cols_lower(df: pd.DataFrame, cols):
+    for c in cols:
+        if c in df.columns:
+            df[c] = df[c].astype(str).str.strip()
+
+
+def lower_text_cols(df: pd.DataFrame, cols):
+    for c in cols:
+        if c in df.columns:
+            s = df[c].astype(str).str.strip().str.lower()
+            df[c] = s.mask(s == "nan")
+
+
+def drop_duplicate_cols(df: pd.DataFrame) -> pd.DataFrame:
+    return df.loc[:, ~df.columns.duplicated()]
+
+
+# -------------------------------
+# Pipelines
+# -------------------------------
+def prepare_inspection(raw: pd.DataFrame, col_rename: dict) -> pd.DataFrame:
+    """Rename, dedupe, date, clean and type the raw inspection rows, then parse GPS."""
+    if raw.empty:
+        return raw
+    df = safe_rename(raw, col_rename)  # rename returns a new frame, raw stays untouched
+    df = drop_duplicate_cols(df)
+    df = ensure_date_col(df)
+    prefix_cols_lower(df, INSPECTION_TEXT_COLS)
+    return add_coordinates(apply_schema(df))
+
+
+def prepare_static(raw: pd.DataFrame, col_rename: dict) -> pd.DataFrame:
+    """Normalise headers, rename and clean the local static shelter sheet."""
+    if raw.empty:
+        return raw
+    df = raw.copy()
+    df.columns = df.columns.astype(str).str.strip()
+    df = safe_rename(df, STATIC_COL_RENAME)
+    df = safe_rename(df, col_rename)
+    df = drop_duplicate_cols(df)
+    lower_text_cols(df, STATIC_TEXT_COLS)
+    return add_coordinates(apply_schema(df))
@@ -0,0 +1,148 @@
+# exports.py
+# On-demand, cached data exports (CSV / Excel / Parquet).
+#
+# Serialising the inspection rows is the most expensive thing the dashboard
+# does, so it only happens when a user asks for a file. Files are written chunk
+# by chunk straight to disk (streaming CSV, openpyxl write-only XLSX, a Parquet
+# row group per chunk), so peak memory follows the chunk size rather than the
+# export size. Finished files are cached by data version + filter state + format
+# in a byte-bounded LRU shared by all sessions; a repeated download of the same
+# selection is served from the file already on disk.
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+CHUNK_ROWS = 50_000
+XLSX_CHUNK_ROWS = 5_000  # rows are boxed to Python objects for openpyxl
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def iter_chunks(df: pd.DataFrame, rows: int = CHUNK_ROWS):
+    for start in range(0, len(df), rows):
+        yield df.iloc[start:start + rows]
+
+
+def write_csv(df: pd.DataFrame, path: str, rows: int = CHUNK_ROWS):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        df.head(0).to_csv(f, index=False)
+        for chunk in iter_chunks(df, rows):
+            chunk.to_csv(f, index=False, header=False)
+
+
+def _cell_values(chunk: pd.DataFrame) -> pd.DataFrame:
+    # openpyxl wants plain Python values; missing values become empty cells
+    values = chunk.astype(object)
+    return values.where(chunk.notna(), None)
+
+
+def write_xlsx(df: pd.DataFrame, path: str, rows: int = XLSX_CHUNK_ROWS, sheet_name: str = "Data"):
+    # write-only workbook: rows are flushed as they are appended
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    ws.append([str(c) for c in df.columns])
+    for chunk in iter_chunks(df, rows):
+        for row in _cell_values(chunk).itertuples(index=False, name=None):
+            ws.append(row)
+    wb.save(path)
+
+
+def write_parquet(df: pd.DataFrame, path: str, rows: int = CHUNK_ROWS):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.Schema.from_pandas(df.head(0), preserve_index=False)
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in iter_chunks(df, rows):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+# format -> (mime type, writer(df, path))
+FORMATS = {
+    "csv": ("text/csv", write_csv),
+    "xlsx": (XLSX_MIME, write_xlsx),
+    "parquet": ("application/vnd.apache.parquet", write_parquet),
+}
+
+
+def export_key(version: str, filters: tuple, fmt: str, columns=None) -> str:
+    """Identity of an export: data version, normalised filter state, format and columns."""
+    payload = json.dumps([version, list(filters), fmt, list(columns) if columns else None], default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:20]
+
+
+class ExportCache:
+    """Byte-bounded LRU of export files in cache_dir."""
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+        self._files = OrderedDict()  # key -> (path, bytes)
+        self._lock = threading.Lock()
+
+    def _path(self, key: str, fmt: str) -> str:
+        return os.path.join(self.cache_dir, f"export_{key}.{fmt}")
+
+    def peek(self, key: str, fmt: str):
+        """Path of the cached export for key, or None (does not build, does not count as a hit)."""
+        path = self._path(key, fmt)
+        with self._lock:
+            if key not in self._files:
+                if not os.path.exists(path):
+                    return None
+                # written by an earlier process
+                self._add(key, path)
+            self._files.move_to_end(key)
+            return self._files[key][0]
+
+    def served(self, key: str):
+        """Count a download of the cached file for key (a reused export)."""
+        with self._lock:
+            if key in self._files:
+                self._files.move_to_end(key)
+                self.hits += 1
+
+    def build(self, key: str, df: pd.DataFrame, fmt: str) -> str:
+        """Write df as fmt (chunked), or return the cached file for key."""
+        path = self.peek(key, fmt)
+        if path is not None:
+            return path
+        path = self._path(key, fmt)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            FORMATS[fmt][1](df, tmp)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        with self._lock:
+            self.misses += 1
+            if key not in self._files:
+                self._add(key, path)
+        return path
+
+    def _add(self, key: str, path: str):
+        nbytes = os.path.getsize(path)
+        self._files[key] = (path, nbytes)
+        self.size += nbytes
+        while self.size > self.max_bytes and len(self._files) > 1:
+            _, (old, old_bytes) = self._files.popitem(last=False)
+            self.size -= old_bytes
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        return {"entries": len(self._files), "bytes": self.size, "hits": self.hits, "misses": self.misses}
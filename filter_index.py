@@ -0,0 +1,92 @@
+# filter_index.py
+# Pre-built index for the global date / block / shelter-type / officer filters.
+#
+# Built once per data version: the rows are sorted by their datetime64 "date" so a
+# date range is a binary-search slice, and every value of a filter dimension keeps
+# the sorted row positions it occurs at. Combining filters is then an intersection
+# of small sorted position arrays instead of a boolean scan per filter.
+
+import numpy as np
+import pandas as pd
+
+# global filter name -> column
+FILTER_DIMS = {
+    "block": "block_name_static",
+    "shelter_type": "shelter_category",
+    "officer": "officer_name",
+}
+
+
+def _value_positions(col: pd.Series) -> dict:
+    # group row positions by value in one pass over the categorical codes
+    cat = col.astype("category") if not isinstance(col.dtype, pd.CategoricalDtype) else col
+    codes = cat.cat.codes.to_numpy()
+    order = np.argsort(codes, kind="stable").astype(np.int32)
+    counts = np.bincount(codes[codes >= 0], minlength=len(cat.cat.categories))
+    start = int((codes < 0).sum())  # missing values (code -1) sort first
+    positions = {}
+    for value, n in zip(cat.cat.categories, counts):
+        if n:
+            positions[str(value)] = order[start:start + n]
+        start += n
+    return positions
+
+
+class FilterIndex:
+    """Date-sorted frame plus per-value row positions for the global filters."""
+
+    def __init__(self, df: pd.DataFrame, dims: dict = FILTER_DIMS):
+        if "date" in df.columns:
+            dates = pd.to_datetime(df["date"], errors="coerce").to_numpy()
+            order = np.argsort(dates, kind="stable")  # NaT sorts last
+            self.frame = df.iloc[order].reset_index(drop=True)
+            dates = dates[order]
+            self.n_dated = int((~np.isnat(dates)).sum())
+            self.dates = dates[:self.n_dated]
+        else:
+            self.frame = df.reset_index(drop=True)
+            self.n_dated = len(df)
+            self.dates = None
+        self.positions = {name: _value_positions(self.frame[col])
+                          for name, col in dims.items() if col in self.frame.columns}
+
+    def options(self, name: str) -> list:
+        return sorted(self.positions.get(name, {}))
+
+    def date_bounds(self):
+        if self.dates is None or not len(self.dates):
+            return None, None
+        return pd.Timestamp(self.dates[0]), pd.Timestamp(self.dates[-1])
+
+    def date_slice(self, start=None, end=None):
+        """Half-open [lo, hi) row range for an inclusive date range."""
+        if self.dates is None:
+            return 0, self.n_dated
+        lo = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start)), side="left"))
+        hi = self.n_dated if end is None else int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end)), side="right"))
+        return lo, max(lo, hi)
+
+    def select_positions(self, start=None, end=None, **filters) -> np.ndarray:
+        """Sorted row positions matching the date range and the given filters.
+
+        filters maps a FILTER_DIMS name to a value; None or "All" means no filter.
+        """
+        lo, hi = self.date_slice(start, end)
+        selected = None
+        for name, value in filters.items():
+            if value is None or value == "All" or name not in self.positions:
+                continue
+            pos = self.positions[name].get(str(value))
+            if pos is None:
+                return np.empty(0, dtype=np.int32)
+            pos = pos[np.searchsorted(pos, lo):np.searchsorted(pos, hi)]
+            selected = pos if selected is None else np.intersect1d(selected, pos, assume_unique=True)
+        if selected is None:
+            return np.arange(lo, hi, dtype=np.int32)
+        return selected
+
+    def select(self, start=None, end=None, **filters) -> pd.DataFrame:
+        lo, hi = self.date_slice(start, end)
+        if not any(v is not None and v != "All" for v in filters.values()):
+            return self.frame.iloc[lo:hi]
+        return self.frame.iloc[self.select_positions(start, end, **filters)]
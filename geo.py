@@ -0,0 +1,60 @@
+# geo.py
+# Vectorised GPS parsing for the prepared frames.
+#
+# The form stores locations as "lat, lon" strings (sometimes in parentheses). They
+# are parsed once during data prep into float32 lat/lon columns with validity
+# flags, so the Map view and anything geospatial read ready-made coordinates.
+# Points outside Uttar Pradesh are flagged invalid; points that only fall inside
+# the state with lat/lon swapped are swapped back and flagged.
+
+import numpy as np
+import pandas as pd
+
+# generous bounding box around Uttar Pradesh (degrees)
+STATE_BOUNDS = {"lat": (23.5, 31.0), "lon": (77.0, 84.8)}
+GPS_SOURCE_COLS = ["gps_location_inspection", "gps_location_static", "gps_location_base"]
+COORD_COLS = ["lat", "lon", "gps_valid", "gps_swapped"]
+
+_GPS_PATTERN = r"([-+]?\d+(?:\.\d+)?)\s*,\s*\(?\s*([-+]?\d+(?:\.\d+)?)"
+
+
+def _in_bounds(lat: np.ndarray, lon: np.ndarray, bounds: dict) -> np.ndarray:
+    (lat_lo, lat_hi), (lon_lo, lon_hi) = bounds["lat"], bounds["lon"]
+    return (lat >= lat_lo) & (lat <= lat_hi) & (lon >= lon_lo) & (lon <= lon_hi)
+
+
+def parse_gps(values: pd.Series, bounds: dict = STATE_BOUNDS) -> pd.DataFrame:
+    """Parse "lat, lon" strings into lat/lon (float32), gps_valid and gps_swapped."""
+    text = values.astype(object).where(values.notna())
+    parts = text.str.extract(_GPS_PATTERN)
+    lat = pd.to_numeric(parts[0], errors="coerce").to_numpy(dtype="float64")
+    lon = pd.to_numeric(parts[1], errors="coerce").to_numpy(dtype="float64")
+    direct = _in_bounds(lat, lon, bounds)
+    swapped = ~direct & _in_bounds(lon, lat, bounds)
+    lat, lon = np.where(swapped, lon, lat), np.where(swapped, lat, lon)
+    valid = direct | swapped
+    return pd.DataFrame({
+        "lat": np.where(valid, lat, np.nan).astype("float32"),
+        "lon": np.where(valid, lon, np.nan).astype("float32"),
+        "gps_valid": valid,
+        "gps_swapped": swapped,
+    }, index=values.index)
+
+
+def add_coordinates(df: pd.DataFrame, sources=GPS_SOURCE_COLS) -> pd.DataFrame:
+    """Add lat/lon/gps_valid/gps_swapped, taking the first valid source per row."""
+    coords = None
+    for col in sources:
+        if col not in df.columns:
+            continue
+        parsed = parse_gps(df[col])
+        if coords is None:
+            coords = parsed
+        else:
+            fill = ~coords["gps_valid"] & parsed["gps_valid"]
+            coords.loc[fill] = parsed.loc[fill]
+    if coords is None:
+        coords = pd.DataFrame({"lat": np.float32(np.nan), "lon": np.float32(np.nan),
+                               "gps_valid": False, "gps_swapped": False}, index=df.index)
+    out = df.drop(columns=[c for c in COORD_COLS if c in df.columns])
+    return pd.concat([out, coords], axis=1)
@@ -0,0 +1,150 @@
+# instrumentation.py
+# Lightweight per-rerun stage timing and cache hit/miss counters.
+#
+# Each script run creates a RunTrace and wraps its stages (load, prep, filter
+# index, the active view, figures, exports) in trace.stage(...). A stage records
+# wall time, rows processed, the process RSS delta and, for stages around a
+# cached loader, whether the loader body actually ran: cached functions call
+# cache_miss(name) in their body, which only executes on a miss. Stage records
+# and a per-run summary are emitted as JSON lines on the "goshala.perf" logger;
+# the last runs are kept in memory for the diagnostics panel.
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger("goshala.perf")
+
+RECENT_RUNS = deque(maxlen=50)
+CACHE_COUNTERS = {}  # cache name -> {"hits": n, "misses": n}
+_counters_lock = threading.Lock()
+_local = threading.local()
+
+
+def rss_bytes():
+    """Resident set size of this process, or None when it cannot be read."""
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().rss
+    except Exception:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        return None
+
+
+def current_trace():
+    return getattr(_local, "trace", None)
+
+
+def cache_miss(name: str):
+    """Call from inside a cached function body: marks the running stage as a miss."""
+    trace = current_trace()
+    if trace is not None:
+        trace.misses.add(name)
+
+
+def _count(name: str, hit: bool):
+    with _counters_lock:
+        c = CACHE_COUNTERS.setdefault(name, {"hits": 0, "misses": 0})
+        c["hits" if hit else "misses"] += 1
+
+
+class RunTrace:
+    """Stage records for one script run."""
+
+    def __init__(self, user=None, **context):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.user = user
+        self.context = context
+        self.started = time.perf_counter()
+        self.stages = []
+        self.misses = set()
+        self._open = {}
+        _local.trace = self
+
+    @contextmanager
+    def stage(self, name: str, cache: str = None, rows=None, accumulate: bool = False):
+        """Time a stage; the yielded dict takes extra fields such as "rows"."""
+        record = self.begin(name, cache=cache, rows=rows, accumulate=accumulate)
+        try:
+            yield record
+        finally:
+            self.end(name)
+
+    def begin(self, name: str, cache: str = None, rows=None, accumulate: bool = False) -> dict:
+        if cache:
+            self.misses.discard(cache)
+        record = {"stage": name, "rows": rows, "cache": cache}
+        self._open[name] = (record, time.perf_counter(), rss_bytes(), accumulate)
+        return record
+
+    def end(self, name: str):
+        if name not in self._open:
+            return
+        record, started, rss_before, accumulate = self._open.pop(name)
+        seconds = time.perf_counter() - started
+        rss_after = rss_bytes()
+        mem = (rss_after - rss_before) if rss_before is not None and rss_after is not None else None
+        if record["cache"]:
+            hit = record["cache"] not in self.misses
+            _count(record["cache"], hit)
+            record["cache"] = f"{record['cache']}:{'hit' if hit else 'miss'}"
+        previous = next((r for r in self.stages if r["stage"] == name), None) if accumulate else None
+        if previous is not None:
+            previous["seconds"] = round(previous["seconds"] + seconds, 4)
+            previous["calls"] += 1
+            if mem is not None and previous["mem_delta_mb"] is not None:
+                previous["mem_delta_mb"] = round(previous["mem_delta_mb"] + mem / 2**20, 2)
+            return
+        record.update(seconds=round(seconds, 4), calls=1,
+                      mem_delta_mb=round(mem / 2**20, 2) if mem is not None else None)
+        self.stages.append(record)
+        self._log("stage", record)
+
+    def finish(self, **extra) -> dict:
+        for name in list(self._open):
+            self.end(name)
+        rss = rss_bytes()
+        summary = {
+            "run_id": self.run_id,
+            "user": self.user,
+            "seconds": round(time.perf_counter() - self.started, 4),
+            "rss_mb": round(rss / 2**20, 1) if rss is not None else None,
+            "stages": {r["stage"]: r["seconds"] for r in self.stages},
+            **self.context,
+            **extra,
+        }
+        RECENT_RUNS.append(summary)
+        self._log("run", summary)
+        if getattr(_local, "trace", None) is self:
+            _local.trace = None
+        return summary
+
+    def _log(self, kind: str, payload: dict):
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({"event": kind, "run_id": self.run_id, "user": self.user, **payload},
+                                   default=str, ensure_ascii=False))
+
+
+def configure_logging(level=logging.INFO):
+    """Send the perf records to stderr once (Streamlit does not configure our loggers)."""
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(level)
+        logger.propagate = False
+
+
+def cache_counters() -> dict:
+    with _counters_lock:
+        return {k: dict(v) for k, v in CACHE_COUNTERS.items()}
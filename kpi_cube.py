@@ -0,0 +1,141 @@
+# kpi_cube.py
+# Additive KPI cube over (day x block x shelter type x officer).
+#
+# Built once per data version from the prepared inspection rows. Each cell keeps the
+# row count and, for every numeric KPI in KPI_GROUPS, the sum, the non-null count
+# and the sum of squares. Those are additive, so any filtered mean / sum / count /
+# variance by any of the cube dimensions is a roll-up of cube cells; the size of
+# the cube follows the number of distinct cells, not the inspection history.
+# Being additive, cells of new rows can also be merged into existing cells
+# (merge_cells), which is how running_aggregates.py keeps the cube current.
+
+import numpy as np
+import pandas as pd
+
+from schema import KPI_GROUPS, numeric_cols
+
+CUBE_DIMS = ["date", "block_name_static", "shelter_category", "officer_name"]
+# filter name (see filter_index.FILTER_DIMS) -> cube column
+CUBE_FILTERS = {"block": "block_name_static", "shelter_type": "shelter_category", "officer": "officer_name"}
+CUBE_STATS = ("mean", "sum", "count", "var", "std", "size")
+ROWS = "__rows"
+
+
+def _measure_cols(kpi: str):
+    return f"{kpi}__sum", f"{kpi}__count", f"{kpi}__sumsq"
+
+
+def cube_kpis(df: pd.DataFrame) -> list:
+    return sorted({c for group in KPI_GROUPS.values() for c in numeric_cols(df, group)})
+
+
+def _sorted_cells(table: pd.DataFrame) -> pd.DataFrame:
+    if "date" in table.columns:
+        table = table.sort_values("date", kind="stable", na_position="last")
+    return table.reset_index(drop=True)
+
+
+def build_cells(df: pd.DataFrame, dims: list, kpis: list) -> pd.DataFrame:
+    """Cube cells (dims + row count + KPI measures) of a frame of prepared rows."""
+    if not dims:
+        return pd.DataFrame()
+    values = df[kpis].astype("float64")
+    parts = {ROWS: np.ones(len(df), dtype="int64")}
+    for k in kpis:
+        s, c, q = _measure_cols(k)
+        parts[s] = values[k].fillna(0.0).to_numpy()
+        parts[c] = values[k].notna().to_numpy().astype("int64")
+        parts[q] = (values[k] ** 2).fillna(0.0).to_numpy()
+    measures = pd.DataFrame(parts, index=df.index)
+    keys = [df[d] for d in dims]
+    return _sorted_cells(measures.groupby(keys, observed=True, dropna=False, sort=False).sum().reset_index())
+
+
+def merge_cells(a: pd.DataFrame, b: pd.DataFrame, dims: list) -> pd.DataFrame:
+    """Cells of a and b added together (same dims and measures)."""
+    if a is None or a.empty:
+        return b
+    if b is None or b.empty:
+        return a
+    both = pd.concat([a, b], ignore_index=True)
+    for d in dims:
+        if d != "date":
+            # categories of the two sides differ; keep the dimension categorical
+            both[d] = both[d].astype("category")
+    return _sorted_cells(both.groupby(dims, observed=True, dropna=False, sort=False).sum().reset_index())
+
+
+class KpiCube:
+    """Sums, counts and sums of squares of every numeric KPI per cube cell."""
+
+    def __init__(self, df: pd.DataFrame):
+        dims = [c for c in CUBE_DIMS if c in df.columns]
+        kpis = cube_kpis(df)
+        self._set(dims, kpis, build_cells(df, dims, kpis))
+
+    @classmethod
+    def from_cells(cls, table: pd.DataFrame, kpis: list) -> "KpiCube":
+        """Cube over already built (e.g. incrementally maintained) cells."""
+        cube = cls.__new__(cls)
+        cube._set([c for c in CUBE_DIMS if c in table.columns], list(kpis), table)
+        return cube
+
+    def _set(self, dims: list, kpis: list, table: pd.DataFrame):
+        self.dims = dims
+        self.kpis = kpis
+        self.table = table
+        if "date" in self.dims:
+            dates = self.table["date"].to_numpy()
+            self.n_dated = int((~np.isnat(dates)).sum())
+            self.dates = dates[:self.n_dated]
+        else:
+            self.n_dated, self.dates = len(self.table), None
+
+    def supports(self, dimension, stat: str, kpis) -> bool:
+        return (stat in CUBE_STATS and (dimension is None or dimension in self.dims)
+                and all(k in self.kpis for k in kpis))
+
+    def cells(self, start=None, end=None, **filters) -> pd.DataFrame:
+        """Cube cells matching the date range and the block/type/officer filters."""
+        table = self.table
+        if self.dates is not None:
+            lo = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start)), side="left"))
+            hi = self.n_dated if end is None else int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end)), side="right"))
+            table = table.iloc[lo:max(lo, hi)]
+        for name, value in filters.items():
+            col = CUBE_FILTERS.get(name)
+            if value is None or value == "All" or col not in self.dims:
+                continue
+            table = table[table[col] == str(value)]
+        return table
+
+    def rollup(self, dimension, kpis, stat: str, start=None, end=None, **filters) -> pd.DataFrame:
+        """<stat> of kpis by dimension (or overall when dimension is None).
+
+        Same layout as a pandas group-by: the dimension column then one column per
+        KPI, or "Inspections" for stat "size".
+        """
+        cells = self.cells(start, end, **filters)
+        needed = [ROWS] + [c for k in kpis for c in _measure_cols(k)]
+        if dimension is None:
+            totals = cells[needed].sum().to_frame().T
+        else:
+            totals = cells.groupby(dimension, observed=True, sort=True)[needed].sum()
+            totals = totals[totals[ROWS] > 0]
+        if stat == "size":
+            out = totals[[ROWS]].rename(columns={ROWS: "Inspections"})
+        else:
+            out = pd.DataFrame(index=totals.index)
+            for k in kpis:
+                s, c, q = (totals[m].astype("float64") for m in _measure_cols(k))
+                if stat == "sum":
+                    out[k] = s
+                elif stat == "count":
+                    out[k] = c.astype("int64")
+                elif stat == "mean":
+                    out[k] = s / c.where(c > 0)
+                else:
+                    var = (q - s * s / c.where(c > 0)) / (c - 1).where(c > 1)
+                    var = var.clip(lower=0)
+                    out[k] = np.sqrt(var) if stat == "std" else var
+        return out.reset_index(drop=dimension is None)
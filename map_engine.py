@@ -0,0 +1,104 @@
+# map_engine.py
+# Server-side binning and rendering for the Map view.
+#
+# Instead of one marker per inspection row, points are aggregated into square grid
+# cells whose size follows the chosen zoom level; each cell carries its centroid,
+# point count and the aggregated KPI / recency value. The cell size is doubled
+# until at most max_bins cells remain, so the payload sent to the browser is
+# bounded whatever the row count. Cells can be drawn with Plotly or, for large
+# extents, as a pydeck (WebGL) layer.
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+MAX_BINS = 2000
+CELLS_PER_TILE = 16  # grid cells across one 256px map tile at the chosen zoom
+METERS_PER_DEGREE = 111_320
+RAMP_LOW = (215, 48, 39)    # red
+RAMP_HIGH = (26, 152, 80)   # green
+NO_VALUE_COLOR = [160, 160, 160]
+
+
+def cell_size_for_zoom(zoom: float) -> float:
+    """Grid cell edge in degrees for a web-mercator zoom level."""
+    return 360.0 / (2 ** float(zoom)) / CELLS_PER_TILE
+
+
+def bin_points(df: pd.DataFrame, values=None, zoom: float = 9, how: str = "mean",
+               max_bins: int = MAX_BINS, label_col: str = "shelter_name_static") -> pd.DataFrame:
+    """Aggregate lat/lon points into grid cells.
+
+    values is an optional Series aligned with df, aggregated per cell with how
+    ("mean", "min", "max", "sum"). Returns one row per cell with lat, lon
+    (centroid), count, value, label (the shelter name when the cell holds a single
+    shelter) and cell_deg.
+    """
+    lat = df["lat"].to_numpy(dtype="float64")
+    lon = df["lon"].to_numpy(dtype="float64")
+    frame = pd.DataFrame({"lat": lat, "lon": lon})
+    frame["value"] = np.nan if values is None else pd.to_numeric(values, errors="coerce").to_numpy(dtype="float64")
+    frame["label"] = df[label_col].astype(object).to_numpy() if label_col in df.columns else None
+
+    size = cell_size_for_zoom(zoom)
+    while True:
+        gy = np.floor(lat / size).astype("int64")
+        gx = np.floor(lon / size).astype("int64")
+        n_cells = len(np.unique(gy * 4_000_037 + gx)) if len(lat) else 0
+        if n_cells <= max_bins:
+            break
+        size *= 2
+    frame["gy"], frame["gx"] = gy, gx
+
+    grouped = frame.groupby(["gy", "gx"], sort=False)
+    bins = grouped.agg(lat=("lat", "mean"), lon=("lon", "mean"), count=("lat", "size"),
+                       value=("value", how), shelters=("label", "nunique"), label=("label", "first"))
+    bins["label"] = bins["label"].where(bins["shelters"] <= 1, bins["shelters"].astype(str) + " shelters")
+    bins["cell_deg"] = size
+    return bins.drop(columns="shelters").reset_index(drop=True)
+
+
+def color_ramp(values: pd.Series, low=RAMP_LOW, high=RAMP_HIGH) -> list:
+    """RGB colours from low (min value) to high (max value); grey for missing."""
+    v = pd.to_numeric(values, errors="coerce").to_numpy(dtype="float64")
+    finite = v[np.isfinite(v)]
+    if not len(finite):
+        return [NO_VALUE_COLOR] * len(v)
+    lo, hi = finite.min(), finite.max()
+    t = np.zeros_like(v) if hi == lo else (v - lo) / (hi - lo)
+    colors = []
+    for x in t:
+        if not np.isfinite(x):
+            colors.append(NO_VALUE_COLOR)
+        else:
+            colors.append([int(a + (b - a) * x) for a, b in zip(low, high)])
+    return colors
+
+
+def plotly_bins_figure(bins: pd.DataFrame, zoom: float, color: str = "value", height: int = 700, **color_kwargs):
+    """Plotly map of the cells, marker size by point count."""
+    fig = px.scatter_map(bins, lat="lat", lon="lon", hover_name="label", color=color, size="count",
+                          hover_data={"count": True}, size_max=30, zoom=zoom, height=height, **color_kwargs)
+    fig.update_layout(map_style="open-street-map")
+    return fig
+
+
+def pydeck_bins_deck(bins: pd.DataFrame, zoom: float, colors: list, value_label: str = "value"):
+    """pydeck (WebGL) scatterplot layer of the cells."""
+    import pydeck as pdk
+
+    data = bins.assign(color=colors, radius=bins["cell_deg"] * METERS_PER_DEGREE / 2)
+    data["value"] = data["value"].round(2)
+    layer = pdk.Layer(
+        "ScatterplotLayer",
+        data=data,
+        get_position=["lon", "lat"],
+        get_fill_color="color",
+        get_radius="radius",
+        radius_min_pixels=3,
+        opacity=0.75,
+        pickable=True,
+    )
+    view = pdk.ViewState(latitude=float(bins["lat"].mean()), longitude=float(bins["lon"].mean()), zoom=zoom)
+    tooltip = {"text": "{label}\ninspections: {count}\n" + value_label + ": {value}"}
+    return pdk.Deck(layers=[layer], initial_view_state=view, tooltip=tooltip, map_provider="carto", map_style="light")
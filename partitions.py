@@ -0,0 +1,110 @@
+# partitions.py
+# Per-block partitions of the prepared inspection rows, for jurisdiction-scoped users.
+#
+# Written once per data version: one Parquet file per block under SNAPSHOT_DIR,
+# plus a manifest (block -> file, rows, districts) that is written last, so a
+# directory with a manifest is complete. A user scoped to some blocks or
+# districts only ever reads those blocks' files; rows of other blocks, and rows
+# without a block, never enter their session. Categories are trimmed to the
+# values present in each block, so other blocks' shelter / officer names do not
+# travel with the partition either.
+
+import glob
+import hashlib
+import json
+import os
+import shutil
+
+import pandas as pd
+
+BLOCK_COL = "block_name_static"
+DISTRICT_COL = "district"
+MANIFEST = "manifest.json"
+KEEP_VERSIONS = 2
+
+
+def partition_dir(cache_dir: str, version: str) -> str:
+    return os.path.join(cache_dir, f"partitions_{hashlib.sha1(version.encode('utf-8')).hexdigest()[:20]}")
+
+
+def scope_key(blocks) -> str:
+    """Short, stable name for a set of blocks (cache keys, export keys)."""
+    return "blocks:" + hashlib.sha1("\x1f".join(sorted(blocks)).encode("utf-8")).hexdigest()[:16]
+
+
+def _trim(rows: pd.DataFrame) -> pd.DataFrame:
+    rows = rows.copy()
+    for c in rows.columns:
+        if isinstance(rows[c].dtype, pd.CategoricalDtype):
+            rows[c] = rows[c].cat.remove_unused_categories()
+    return rows
+
+
+def write_partitions(df: pd.DataFrame, out_dir: str) -> dict:
+    """One Parquet file per block of df plus the manifest; returns the manifest."""
+    tmp_dir = f"{out_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    manifest = {}
+    if BLOCK_COL in df.columns:
+        for i, (block, rows) in enumerate(df.groupby(BLOCK_COL, observed=True, sort=True)):
+            name = f"block_{i:04d}.parquet"
+            _trim(rows).to_parquet(os.path.join(tmp_dir, name), index=False)
+            districts = sorted(rows[DISTRICT_COL].dropna().astype(str).unique()) if DISTRICT_COL in rows.columns else []
+            manifest[str(block)] = {"file": name, "rows": int(len(rows)), "districts": [d for d in districts if d]}
+    with open(os.path.join(tmp_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    try:
+        os.replace(tmp_dir, out_dir)
+    except OSError:
+        # another process finished the same version first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return manifest
+
+
+def _prune(cache_dir: str, keep_dir: str, keep: int = KEEP_VERSIONS):
+    dirs = sorted((d for d in glob.glob(os.path.join(cache_dir, "partitions_*")) if not d.endswith(".tmp")),
+                  key=os.path.getmtime, reverse=True)
+    for d in [d for d in dirs if d != keep_dir][keep - 1:]:
+        shutil.rmtree(d, ignore_errors=True)
+
+
+class BlockPartitions:
+    """Manifest of a partition directory; loads the partitions of a scope."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+
+    def resolve(self, blocks=None, districts=None) -> tuple:
+        """Blocks of a user scope: the listed blocks plus every block of the listed districts."""
+        wanted = {str(b) for b in blocks or []}
+        districts = {str(d) for d in districts or []}
+        wanted |= {b for b, entry in self.manifest.items() if districts & set(entry["districts"])}
+        return tuple(sorted(b for b in wanted if b in self.manifest))
+
+    def load(self, blocks) -> pd.DataFrame:
+        """Prepared rows of the given blocks (an empty frame for none)."""
+        parts = [pd.read_parquet(os.path.join(self.directory, self.manifest[b]["file"]))
+                 for b in blocks if b in self.manifest]
+        if not parts:
+            return pd.DataFrame()
+        if len(parts) == 1:
+            return parts[0]
+        categorical = [c for c in parts[0].columns if isinstance(parts[0][c].dtype, pd.CategoricalDtype)]
+        df = pd.concat(parts, ignore_index=True)
+        for c in categorical:
+            # per-block categories differ, so concat falls back to object
+            df[c] = df[c].astype("category")
+        return df
+
+
+def open_partitions(cache_dir: str, version: str, prepare) -> BlockPartitions:
+    """Partitions for this data version, written from prepare() -> frame when missing."""
+    directory = partition_dir(cache_dir, version)
+    if not os.path.exists(os.path.join(directory, MANIFEST)):
+        os.makedirs(cache_dir, exist_ok=True)
+        write_partitions(prepare(), directory)
+        _prune(cache_dir, directory)
+    return BlockPartitions(directory)
@@ -0,0 +1,442 @@
+# query_store.py
+# Optional on-disk SQLite store for the prepared inspection / static tables.
+#
+# The pandas path (filter_index.py, aggregations.py) keeps the whole prepared
+# frame in every Streamlit process. With the store, the prepared rows are written
+# once per data version to a SQLite file (standard library sqlite3) with indexes
+# on date, block, shelter type, officer and shelter name; the global filters,
+# group-bys and top-N leaderboards run as SQL and only their result rows come
+# back into Python. QueryStore answers the same calls as FilterIndex
+# (options / date_bounds / select) and AggregationService (filtered / aggregate /
+# summary / top_n / trend / stats), so the dashboard can use either.
+#
+# The file is built under a temporary name and renamed into place, so processes
+# sharing SNAPSHOT_DIR open a complete store or build their own; connections are
+# read-only and per thread.
+
+import glob
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from aggregations import DIMENSIONS, STATS, filter_key
+from filter_index import FILTER_DIMS
+from schema import KPI_GROUPS
+from time_series import MAX_POINTS, ROWS, trend_from_totals
+
+INSPECTIONS = "inspections"
+STATIC = "static"
+INSERT_CHUNK_ROWS = 20_000
+KEEP_STORES = 2
+# row frames are large: they get their own, much smaller LRU than the aggregates
+MAX_ROW_ENTRIES = 8
+# (table, columns) -> index; filter columns lead, date second, so equality + date range use one index
+INDEXES = {
+    INSPECTIONS: [("date",), ("block_name_static", "date"), ("shelter_category", "date"),
+                  ("officer_name", "date"), ("shelter_name_static", "date")],
+    STATIC: [("block_ulb_base",), ("shelter_name_base",)],
+}
+_SQL_AGG = {"mean": "AVG({c})", "sum": "TOTAL({c})", "count": "COUNT({c})", "min": "MIN({c})", "max": "MAX({c})"}
+
+
+def _q(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def store_path(cache_dir: str, version: str) -> str:
+    return os.path.join(cache_dir, f"query_store_{hashlib.sha1(version.encode('utf-8')).hexdigest()[:20]}.sqlite")
+
+
+def _sql_frame(df: pd.DataFrame) -> pd.DataFrame:
+    # datetimes as ISO text (sorts like the dates), everything else as plain python values
+    out = {}
+    for c in df.columns:
+        s = df[c]
+        if pd.api.types.is_datetime64_any_dtype(s):
+            fmt = "%Y-%m-%d" if c == "date" else "%Y-%m-%d %H:%M:%S"
+            s = s.dt.strftime(fmt)
+        elif pd.api.types.is_bool_dtype(s):
+            s = s.astype("Int8")
+        elif not pd.api.types.is_numeric_dtype(s):
+            s = s.astype(object)
+        out[c] = s.astype(object).where(s.notna(), None)
+    return pd.DataFrame(out, index=df.index)
+
+
+def _create_table(conn, table: str, df: pd.DataFrame):
+    types = {c: ("REAL" if pd.api.types.is_float_dtype(df[c]) else
+                 "INTEGER" if pd.api.types.is_integer_dtype(df[c]) or pd.api.types.is_bool_dtype(df[c]) else "TEXT")
+             for c in df.columns}
+    conn.execute(f"CREATE TABLE {_q(table)} ({', '.join(f'{_q(c)} {t}' for c, t in types.items())})")
+    insert = f"INSERT INTO {_q(table)} VALUES ({', '.join('?' * len(df.columns))})"
+    for start in range(0, len(df), INSERT_CHUNK_ROWS):
+        chunk = _sql_frame(df.iloc[start:start + INSERT_CHUNK_ROWS])
+        conn.executemany(insert, chunk.itertuples(index=False, name=None))
+    for cols in INDEXES.get(table, []):
+        if all(c in df.columns for c in cols):
+            name = f"ix_{table}_{'_'.join(cols)}"
+            conn.execute(f"CREATE INDEX {_q(name)} ON {_q(table)} ({', '.join(map(_q, cols))})")
+
+
+def build_store(path: str, inspections: pd.DataFrame, static: pd.DataFrame = None, version: str = ""):
+    """Write the prepared frames to a new SQLite file at path (atomically)."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        meta = {"version": version, "dtypes": {}}
+        for table, df in ((INSPECTIONS, inspections), (STATIC, static)):
+            if df is None:
+                continue
+            _create_table(conn, table, df)
+            meta["dtypes"][table] = {c: str(df[c].dtype) for c in df.columns}
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("INSERT INTO meta VALUES ('meta', ?)", (json.dumps(meta, ensure_ascii=False),))
+        conn.commit()
+        conn.execute("ANALYZE")
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp, path)
+
+
+def _prune(cache_dir: str, keep_path: str, keep: int = KEEP_STORES):
+    stores = sorted(glob.glob(os.path.join(cache_dir, "query_store_*.sqlite")), key=os.path.getmtime, reverse=True)
+    for path in [p for p in stores if p != keep_path][keep - 1:]:
+        try:
+            os.remove(path)
+        except Exception:
+            pass
+
+
+def open_store(cache_dir: str, version: str, prepare, max_entries: int = 256) -> "QueryStore":
+    """Store for this data version, built from prepare() -> (inspections, static) when missing."""
+    path = store_path(cache_dir, version)
+    if not os.path.exists(path):
+        inspections, static = prepare()
+        build_store(path, inspections, static, version)
+        del inspections, static
+        _prune(cache_dir, path)
+    return QueryStore(path, max_entries=max_entries)
+
+
+class QueryStore:
+    """Filters, group-bys and leaderboards as SQL over a read-only SQLite store."""
+
+    def __init__(self, path: str, max_entries: int = 256, max_row_entries: int = MAX_ROW_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_row_entries = max_row_entries
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._row_cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        meta = json.loads(self.query("SELECT value FROM meta WHERE key = 'meta'").iat[0, 0])
+        self.version = meta["version"]
+        self.dtypes = meta["dtypes"]
+        self.columns = list(self.dtypes.get(INSPECTIONS, {}))
+        self.numeric = [c for c, t in self.dtypes.get(INSPECTIONS, {}).items()
+                        if t != "bool" and pd.api.types.is_numeric_dtype(pd.api.types.pandas_dtype(t))]
+        self.rows = int(self.query(f"SELECT COUNT(*) FROM {INSPECTIONS}").iat[0, 0]) if self.columns else 0
+
+    # -- connection / raw queries --
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def query(self, sql: str, params=()) -> pd.DataFrame:
+        return pd.read_sql_query(sql, self._conn(), params=list(params))
+
+    def _restore(self, df: pd.DataFrame, table: str = INSPECTIONS, columns=None) -> pd.DataFrame:
+        # back to the prepared dtypes (categories, datetime64, small ints)
+        dtypes = self.dtypes.get(table, {})
+        for c in columns or df.columns:
+            t = dtypes.get(c)
+            if t is None:
+                continue
+            try:
+                if t.startswith("datetime64"):
+                    df[c] = pd.to_datetime(df[c], errors="coerce").astype(t)
+                elif t == "bool":
+                    df[c] = df[c].fillna(0).astype(bool)
+                else:
+                    df[c] = df[c].astype(t)
+            except Exception:
+                pass
+        return df
+
+    # -- FilterIndex interface --
+    def options(self, name: str) -> list:
+        col = FILTER_DIMS.get(name)
+        if col not in self.columns:
+            return []
+        values = self.query(f"SELECT DISTINCT {_q(col)} FROM {INSPECTIONS} WHERE {_q(col)} IS NOT NULL")
+        return sorted(values.iloc[:, 0].astype(str))
+
+    def date_bounds(self):
+        if "date" not in self.columns:
+            return None, None
+        lo, hi = self.query(f"SELECT MIN(date), MAX(date) FROM {INSPECTIONS}").iloc[0]
+        if lo is None:
+            return None, None
+        return pd.Timestamp(lo), pd.Timestamp(hi)
+
+    def select(self, start=None, end=None, **filters) -> pd.DataFrame:
+        return self.filtered({"start": start, "end": end, **filters})
+
+    # -- SQL building --
+    def _where(self, filters, equals=None) -> tuple:
+        # equals: extra {column: value} conditions (the Overview's local selections)
+        start, end, block, shelter_type, officer = filter_key(filters)
+        clauses, params = [], []
+        if "date" in self.columns:
+            # like FilterIndex: rows without a date never match
+            clauses.append("date IS NOT NULL")
+            if start is not None:
+                clauses.append("date >= ?")
+                params.append(start)
+            if end is not None:
+                clauses.append("date <= ?")
+                params.append(end)
+        for name, value in (("block", block), ("shelter_type", shelter_type), ("officer", officer)):
+            col = FILTER_DIMS[name]
+            if value is not None:
+                if col not in self.columns:
+                    return "WHERE 0", []
+                clauses.append(f"{_q(col)} = ?")
+                params.append(value)
+        for col, value in sorted((equals or {}).items()):
+            if col not in self.columns:
+                return "WHERE 0", []
+            clauses.append(f"{_q(col)} = ?")
+            params.append(value)
+        return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _memo(self, key, compute, rows: bool = False) -> pd.DataFrame:
+        cache, limit = (self._row_cache, self.max_row_entries) if rows else (self._cache, self.max_entries)
+        with self._lock:
+            if key in cache:
+                cache.move_to_end(key)
+                self.hits += 1
+                return cache[key].copy()
+        result = compute()
+        with self._lock:
+            self.misses += 1
+            cache[key] = result
+            cache.move_to_end(key)
+            while len(cache) > limit:
+                cache.popitem(last=False)
+        return result.copy()
+
+    # -- AggregationService interface --
+    def resolve_kpis(self, kpis) -> list:
+        if kpis is None:
+            return []
+        if isinstance(kpis, str):
+            kpis = KPI_GROUPS.get(kpis, [kpis])
+        return [c for c in kpis if c in self.numeric]
+
+    def count(self, filters=None) -> int:
+        where, params = self._where(filters)
+        return int(self.query(f"SELECT COUNT(*) FROM {INSPECTIONS} {where}", params).iat[0, 0])
+
+    def filtered(self, filters=None, columns=None, limit: int = None, equals=None) -> pd.DataFrame:
+        """Matching rows (all or the given columns) in date order, memoized per filter state."""
+        key = ("__rows__", filter_key(filters), tuple(columns) if columns else None, limit,
+               tuple(sorted((equals or {}).items())))
+
+        def compute():
+            where, params = self._where(filters, equals)
+            cols = ", ".join(_q(c) for c in columns if c in self.columns) if columns else "*"
+            order = "ORDER BY date, rowid" if "date" in self.columns else "ORDER BY rowid"
+            sql = f"SELECT {cols or '*'} FROM {INSPECTIONS} {where} {order}"
+            if limit is not None:
+                sql += f" LIMIT {int(limit)}"
+            return self._restore(self.query(sql, params))
+
+        return self._memo(key, compute, rows=True)
+
+    def page(self, filters=None, columns=None, sort_by: str = None, ascending: bool = True,
+             page: int = 1, page_size: int = 50):
+        """table_view.get_page over the matching rows: (rows of the page, total, page count).
+        The sort runs in SQL (missing values last) and only the page's rows are read."""
+        total = self.count(filters)
+        n_pages = max(1, math.ceil(total / page_size))
+        page = min(max(1, int(page)), n_pages)
+        lo = (page - 1) * page_size
+        columns = [c for c in (columns or self.columns) if c in self.columns]
+        key = ("__page__", filter_key(filters), tuple(columns), sort_by, bool(ascending), page, page_size)
+
+        def compute():
+            where, params = self._where(filters)
+            order = "rowid"
+            if sort_by in self.columns:
+                order = f"{_q(sort_by)} IS NULL, {_q(sort_by)} {'ASC' if ascending else 'DESC'}, rowid"
+            sql = (f"SELECT {', '.join(_q(c) for c in columns)} FROM {INSPECTIONS} {where} "
+                   f"ORDER BY {order} LIMIT {int(page_size)} OFFSET {int(lo)}")
+            return self._restore(self.query(sql, params))
+
+        rows = self._memo(key, compute, rows=True)
+        rows.index = rows.index + lo + 1
+        return rows, total, n_pages
+
+    def table(self, columns=None) -> pd.DataFrame:
+        """Every inspection row (all or the given columns), including rows without a date."""
+        cols = ", ".join(_q(c) for c in columns if c in self.columns) if columns else "*"
+        return self._restore(self.query(f"SELECT {cols or '*'} FROM {INSPECTIONS} ORDER BY rowid"))
+
+    def distinct(self, column: str, filters=None, equals=None) -> pd.Series:
+        """Distinct non-null values of column: over every row, or over the rows matching filters / equals."""
+        if column not in self.columns:
+            return pd.Series(dtype=object, name=column)
+        key = ("__distinct__", column, None if filters is None and not equals else filter_key(filters),
+               tuple(sorted((equals or {}).items())))
+
+        def compute():
+            where, params = self._where(filters, equals) if filters is not None or equals else ("", [])
+            not_null = f"{_q(column)} IS NOT NULL"
+            where = f"{where} AND {not_null}" if where else f"WHERE {not_null}"
+            values = self.query(f"SELECT DISTINCT {_q(column)} FROM {INSPECTIONS} {where}", params)
+            return values.iloc[:, 0].rename(column)
+
+        return self._memo(key, compute)
+
+    def schema_frame(self) -> pd.DataFrame:
+        """Zero-row frame with the prepared columns and dtypes."""
+        return self._memo(("__schema__",),
+                          lambda: self._restore(pd.DataFrame({c: pd.Series(dtype=object) for c in self.columns})))
+
+    def _group_sql(self, col: str, kpis: list, stat: str, filters) -> pd.DataFrame:
+        where, params = self._where(filters)
+        not_null = f"{_q(col)} IS NOT NULL"
+        where = f"{where} AND {not_null}" if where else f"WHERE {not_null}"
+        if stat == "size":
+            exprs = ["COUNT(*) AS Inspections"]
+        elif stat in _SQL_AGG:
+            exprs = [f"{_SQL_AGG[stat].format(c=_q(k))} AS {_q(k)}" for k in kpis]
+        else:
+            # variance from sums, like the KPI cube
+            exprs = [f"TOTAL({_q(k)}) AS {_q(k + '__sum')}, TOTAL({_q(k)} * {_q(k)}) AS {_q(k + '__sumsq')}, "
+                     f"COUNT({_q(k)}) AS {_q(k + '__count')}" for k in kpis]
+        select = ", ".join([_q(col)] + exprs)
+        result = self.query(f"SELECT {select} FROM {INSPECTIONS} {where} GROUP BY {_q(col)} ORDER BY {_q(col)}", params)
+        if stat in ("var", "std"):
+            result = _variance(result, col, kpis, stat)
+        return self._restore(result, columns=[col])
+
+    def aggregate(self, dimension: str, kpis=None, stat: str = "mean", filters=None) -> pd.DataFrame:
+        """Same contract as AggregationService.aggregate, computed in SQL."""
+        if stat not in STATS:
+            raise ValueError(f"unsupported statistic: {stat}")
+        col = DIMENSIONS.get(dimension, dimension)
+        cols = self.resolve_kpis(kpis)
+        if col not in self.columns:
+            return pd.DataFrame()
+        if stat != "size" and not cols:
+            return pd.DataFrame(columns=[col])
+        key = (dimension, tuple(cols), stat, filter_key(filters))
+        return self._memo(key, lambda: self._group_sql(col, cols, stat, filters))
+
+    def top_n(self, dimension: str, kpis=None, stat: str = "mean", n: int = 10, filters=None,
+              ascending: bool = False, by: str = None) -> pd.DataFrame:
+        """The n best (or, ascending, the n lowest) groups by `by` (default: the first KPI, or
+        "Inspections" for stat "size"); the sort and the limit run in SQL."""
+        col = DIMENSIONS.get(dimension, dimension)
+        cols = self.resolve_kpis(kpis)
+        by = by or ("Inspections" if stat == "size" else (cols[0] if cols else None))
+        if col not in self.columns or by is None or stat not in _SQL_AGG and stat != "size":
+            agg = self.aggregate(dimension, kpis, stat, filters)
+            if by not in agg.columns:
+                return agg
+            return agg.dropna(subset=[by]).sort_values(by, ascending=ascending, kind="stable").head(n)
+        key = ("__top__", dimension, tuple(cols), stat, filter_key(filters), int(n), bool(ascending), by)
+
+        def compute():
+            where, params = self._where(filters)
+            not_null = f"{_q(col)} IS NOT NULL"
+            where = f"{where} AND {not_null}" if where else f"WHERE {not_null}"
+            exprs = (["COUNT(*) AS Inspections"] if stat == "size" else
+                     [f"{_SQL_AGG[stat].format(c=_q(k))} AS {_q(k)}" for k in cols])
+            sql = (f"SELECT {', '.join([_q(col)] + exprs)} FROM {INSPECTIONS} {where} GROUP BY {_q(col)} "
+                   f"HAVING {_q(by)} IS NOT NULL ORDER BY {_q(by)} {'ASC' if ascending else 'DESC'}, {_q(col)} "
+                   f"LIMIT {int(n)}")
+            return self._restore(self.query(sql, params), columns=[col])
+
+        return self._memo(key, compute)
+
+    def summary(self, kpis, stats=("count", "mean", "sum"), filters=None) -> pd.DataFrame:
+        """One row per KPI with the requested statistics over all filtered rows."""
+        cols = self.resolve_kpis(kpis)
+        key = ("__summary__", tuple(cols), tuple(stats), filter_key(filters))
+
+        def compute():
+            where, params = self._where(filters)
+            exprs = []
+            for k in cols:
+                exprs += [f"TOTAL({_q(k)})", f"TOTAL({_q(k)} * {_q(k)})", f"COUNT({_q(k)})",
+                          f"MIN({_q(k)})", f"MAX({_q(k)})"]
+            if not exprs:
+                return pd.DataFrame(columns=["kpi", *stats])
+            values = self.query(f"SELECT {', '.join(exprs)} FROM {INSPECTIONS} {where}", params).iloc[0].to_numpy()
+            rows = []
+            for i, k in enumerate(cols):
+                s, q, c, mn, mx = values[i * 5:i * 5 + 5]
+                s, q, c = float(s), float(q), int(c)
+                var = max((q - s * s / c) / (c - 1), 0.0) if c > 1 else np.nan
+                parts = {"count": c, "sum": s, "mean": s / c if c else np.nan, "min": mn, "max": mx,
+                         "var": var, "std": np.sqrt(var), "size": c}
+                rows.append({"kpi": k, **{name: parts[name] for name in stats}})
+            return pd.DataFrame(rows)
+
+        return self._memo(key, compute)
+
+    def daily_totals(self, kpis=None, filters=None) -> pd.DataFrame:
+        """Per-day row count and KPI sums / non-null counts, as one GROUP BY date."""
+        cols = self.resolve_kpis(kpis)
+        if "date" not in self.columns:
+            return pd.DataFrame(columns=["date", ROWS])
+        key = ("__daily__", tuple(cols), filter_key(filters))
+
+        def compute():
+            where, params = self._where(filters)
+            exprs = [f"COUNT(*) AS {_q(ROWS)}"] + [f"TOTAL({_q(k)}) AS {_q(k + '__sum')}, COUNT({_q(k)}) AS {_q(k + '__count')}"
+                                                   for k in cols]
+            sql = f"SELECT date, {', '.join(exprs)} FROM {INSPECTIONS} {where} GROUP BY date ORDER BY date"
+            return self._restore(self.query(sql, params), columns=["date"])
+
+        return self._memo(key, compute)
+
+    def trend(self, kpi=None, filters=None, stat: str = "mean", freq: str = "D", rolling: int = 0,
+              max_points: int = MAX_POINTS) -> pd.DataFrame:
+        """<stat> of kpi per day / week / month / quarter, see time_series.trend_from_totals."""
+        return trend_from_totals(self.daily_totals([kpi] if kpi else None, filters), kpi, stat, freq, rolling, max_points)
+
+    def stats(self) -> dict:
+        return {"version": self.version, "entries": len(self._cache) + len(self._row_cache),
+                "hits": self.hits, "misses": self.misses,
+                "rows": self.rows, "file_mb": round(os.path.getsize(self.path) / 2**20, 1)}
+
+
+def _variance(sums: pd.DataFrame, col: str, kpis: list, stat: str) -> pd.DataFrame:
+    out = sums[[col]].copy()
+    for k in kpis:
+        s, q, c = (sums[f"{k}__{m}"].astype("float64") for m in ("sum", "sumsq", "count"))
+        var = ((q - s * s / c.where(c > 0)) / (c - 1).where(c > 1)).clip(lower=0)
+        out[k] = np.sqrt(var) if stat == "std" else var
+    return out
@@ -0,0 +1,207 @@
+# reports.py
+# PDF report building and the background report queue.
+#
+# The UI only collects a report spec (plain data: metrics, chart data, sample
+# rows); charts are rendered and the PDF is assembled by a small worker pool, so
+# the requesting session is not blocked. Jobs are keyed by data version + filter
+# state + report content: asking again for the same report returns the running or
+# finished job instead of starting a new one. Finished reports are kept (bounded)
+# for download by any session. Chart images come from a content-addressed cache
+# (chart_images.py), so repeating a report skips the kaleido rendering.
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import pandas as pd
+import plotly.express as px
+from fpdf import FPDF
+
+from chart_images import ChartImageCache
+
+REPORT_WORKERS = 2
+KEEP_FINISHED = 20
+FOOTER = "Auto-generated via Goshala Analytics, © 2025 Government of Uttar Pradesh"
+CORE_FONT = "Helvetica"
+# characters the latin-1 core fonts cannot draw
+_CORE_FONT_REPLACEMENTS = {"—": "-", "–": "-", "’": "'", "‘": "'", "“": '"', "”": '"', "…": "..."}
+
+
+def report_key(version: str, filters: tuple, spec: dict) -> str:
+    """Identity of a report: data version, normalised filter state and spec content."""
+    payload = json.dumps([version, list(filters), _spec_identity(spec)], default=str, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:20]
+
+
+def _frame_digest(df: pd.DataFrame) -> str:
+    # chart data content: the same title can carry another granularity / rolling window
+    h = hashlib.sha1("\x1f".join(map(str, df.columns)).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()[:16]
+
+
+def _spec_identity(spec: dict):
+    ident = {k: v for k, v in spec.items() if k not in ("charts", "table")}
+    ident["charts"] = [(c["title"], c["x"], c["y"], _frame_digest(c["data"])) for c in spec.get("charts", [])]
+    return ident
+
+
+def chart_figure(chart: dict):
+    return px.line(chart["data"], x=chart["x"], y=chart["y"], title=chart["title"], markers=True)
+
+
+class _ReportPdf:
+    """FPDF wrapper: a Unicode TTF when available, else a latin-1 core font."""
+
+    def __init__(self, font_path=None):
+        self.pdf = FPDF(orientation="P", unit="mm", format="A4")
+        self.pdf.set_auto_page_break(auto=True, margin=10)
+        self.unicode = bool(font_path) and os.path.exists(font_path)
+        if self.unicode:
+            self.pdf.add_font("Report", "", font_path)
+            self.pdf.add_font("Report", "B", font_path)
+        self.family = "Report" if self.unicode else CORE_FONT
+
+    def text(self, s) -> str:
+        s = str(s)
+        if self.unicode:
+            return s
+        for a, b in _CORE_FONT_REPLACEMENTS.items():
+            s = s.replace(a, b)
+        return s.encode("latin-1", "replace").decode("latin-1")
+
+    def font(self, size, style=""):
+        self.pdf.set_font(self.family, style, size)
+
+    def line(self, s, h=6):
+        self.pdf.cell(0, h, self.text(s), new_x="LMARGIN", new_y="NEXT")
+
+    def block(self, s, h=5):
+        self.pdf.multi_cell(0, h, self.text(s), new_x="LMARGIN", new_y="NEXT")
+
+
+def build_report_pdf(spec: dict, progress=None, font_path=None, images: ChartImageCache = None) -> bytes:
+    """Render a report spec to PDF bytes; progress(fraction, message) is called per step."""
+    progress = progress or (lambda fraction, message: None)
+    images = images or ChartImageCache()
+    charts = spec.get("charts", [])
+    steps = 2 + len(charts)
+    doc = _ReportPdf(font_path)
+    pdf = doc.pdf
+
+    progress(0.0, "Writing summary")
+    pdf.add_page()
+    doc.font(14, "B")
+    doc.line(spec.get("title", "Goshala Inspection Dashboard"), h=8)
+    pdf.ln(4)
+    doc.font(10)
+    doc.line(f"Date range: {spec.get('start')} to {spec.get('end')}")
+    filters = spec.get("filters", {})
+    doc.line("Filters: " + " | ".join(f"{k}={v}" for k, v in filters.items()))
+    pdf.ln(6)
+    doc.font(12, "B")
+    doc.line("Overview Summary")
+    doc.font(10)
+    for label, value in spec.get("metrics", []):
+        doc.line(f"{label}: {'N/A' if value is None else value}")
+    pdf.ln(6)
+
+    for i, chart in enumerate(charts, start=1):
+        progress(i / steps, f"Rendering chart {i} of {len(charts)}")
+        img = images.get(chart_figure(chart), "png", scale=2)
+        if img:
+            pdf.image(BytesIO(img), w=180)
+        else:
+            doc.font(10)
+            doc.line(f"[{chart['title']}: chart image unavailable]")
+
+    progress((steps - 1) / steps, "Adding sample rows")
+    table = spec.get("table")
+    if table is not None and not table.empty:
+        doc.font(9)
+        pdf.ln(6)
+        doc.block(table.to_csv(index=False))
+
+    # Watermark / footer
+    pdf.set_y(-20)
+    doc.font(8)
+    pdf.cell(0, 5, doc.text(FOOTER), align="C")
+    return bytes(pdf.output())
+
+
+class ReportJob:
+    def __init__(self, key: str):
+        self.key = key
+        self.status = "queued"  # queued -> running -> done | failed
+        self.progress = 0.0
+        self.message = "Queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def update(self, fraction: float, message: str):
+        self.progress = max(0.0, min(1.0, fraction))
+        self.message = message
+
+
+class ReportQueue:
+    """Worker pool building reports in the background, deduplicated by report key."""
+
+    def __init__(self, workers: int = REPORT_WORKERS, keep: int = KEEP_FINISHED, font_path=None,
+                 image_cache: ChartImageCache = None):
+        self.keep = keep
+        self.font_path = font_path
+        self.images = image_cache or ChartImageCache()
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report")
+
+    def submit(self, key: str, spec: dict) -> ReportJob:
+        """Queue a report; an identical queued, running or finished report is reused."""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.status != "failed":
+                self._jobs.move_to_end(key)
+                return job
+            job = ReportJob(key)
+            self._jobs[key] = job
+            self._evict()
+        self._pool.submit(self._run, job, spec)
+        return job
+
+    def get(self, key):
+        with self._lock:
+            return self._jobs.get(key)
+
+    def _run(self, job: ReportJob, spec: dict):
+        job.status = "running"
+        try:
+            job.result = build_report_pdf(spec, job.update, self.font_path, self.images)
+            job.update(1.0, "Ready")
+            job.status = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.message = f"Failed: {e}"
+            job.status = "failed"
+        job.finished_at = time.time()
+
+    def _evict(self):
+        # drop the oldest finished jobs beyond the retention limit; running ones stay
+        finished = [k for k, j in self._jobs.items() if j.finished]
+        for k in finished[:max(0, len(finished) - self.keep)]:
+            del self._jobs[k]
+
+
+def sample_table(df: pd.DataFrame, cols=None, n: int = 10) -> pd.DataFrame:
+    cols = [c for c in (cols or df.columns) if c in df.columns]
+    return df[cols].head(n).reset_index(drop=True)
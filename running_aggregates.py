@@ -0,0 +1,236 @@
+# running_aggregates.py
+# Running KPI aggregates, advanced by the rows appended since the last refresh.
+#
+# Form submissions only ever add rows to the sheets (sheet_sync.py appends them
+# to each source's snapshot), so the aggregates over the full history are kept
+# as additive state and updated from the new rows alone:
+#   - the KPI cube cells (row counts, KPI sums / counts / sums of squares per
+#     day x block x shelter type x officer), which serve group means,
+#     leaderboards and trends (kpi_cube.py, aggregations.py);
+#   - first / last inspection date and inspection count per block, officer and
+#     shelter ("last seen");
+#   - the inspected -> static shelter name matches (coverage), extended with the
+#     names that first appear in the new rows.
+# Per source, the state records how many rows it consumed and the snapshot
+# generation they came from (sheet_sync.py bumps it whenever a sheet is replaced
+# rather than appended to); a refresh prepares and folds in only the rows after
+# that prefix. Callers without generations get a hash of every consumed row
+# instead, which is exact but costs a pass over the data. Everything is rebuilt
+# from the full history when the state no longer describes a prefix of the data:
+# a different sheet header, PREP_VERSION, STATE_VERSION or KPI set, a source that
+# was replaced, shrank or is missing, or a changed static shelter list (for the
+# matches only). The state is persisted under SNAPSHOT_DIR; its files are
+# written first and the meta file that names them last.
+
+import glob
+import hashlib
+import json
+import os
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from data_prep import PREP_VERSION, prepare_inspection
+from kpi_cube import CUBE_DIMS, KpiCube, build_cells, cube_kpis, merge_cells
+from schema import COL_RENAME
+from shelter_matching import MATCH_COLUMNS, build_match_table
+from sources import SOURCE_COL
+
+STATE_VERSION = 2
+META = "running.json"
+INSPECT_SHELTER_COL = "shelter_name_static"
+# last-seen dimension -> column
+LAST_SEEN_DIMS = {"block": "block_name_static", "officer": "officer_name", "shelter": INSPECT_SHELTER_COL}
+LAST_SEEN_COLUMNS = ["dimension", "value", "first_date", "last_date", "inspections"]
+
+
+def schema_key(columns) -> str:
+    h = hashlib.sha1(f"state={STATE_VERSION};prep={PREP_VERSION};dims={CUBE_DIMS}".encode("utf-8"))
+    h.update("\x1f".join(map(str, columns)).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def names_key(names) -> str:
+    uniq = sorted(pd.unique(pd.Series(names).dropna().astype(str))) if names is not None else []
+    return hashlib.sha1("\x1e".join(uniq).encode("utf-8")).hexdigest()[:16]
+
+
+def _prefix_hash(raw: pd.DataFrame, pos: np.ndarray, n: int) -> str:
+    # every one of the first n rows of a source
+    if not n:
+        return ""
+    return hashlib.sha1(pd.util.hash_pandas_object(raw.iloc[pos[:n]], index=False).to_numpy().tobytes()).hexdigest()[:16]
+
+
+def _last_seen(df: pd.DataFrame) -> pd.DataFrame:
+    frames = []
+    for name, col in LAST_SEEN_DIMS.items():
+        if col not in df.columns or "date" not in df.columns:
+            continue
+        g = df[[col, "date"]].dropna().groupby(col, observed=True)["date"]
+        part = pd.DataFrame({"first_date": g.min(), "last_date": g.max(), "inspections": g.size()})
+        part = part.rename_axis("value").reset_index()
+        part["value"] = part["value"].astype(str)
+        part.insert(0, "dimension", name)
+        frames.append(part)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=LAST_SEEN_COLUMNS)
+
+
+def _merge_last_seen(a: pd.DataFrame, b: pd.DataFrame) -> pd.DataFrame:
+    if a.empty:
+        return b
+    if b.empty:
+        return a
+    g = pd.concat([a, b], ignore_index=True).groupby(["dimension", "value"], sort=True)
+    return g.agg(first_date=("first_date", "min"), last_date=("last_date", "max"),
+                 inspections=("inspections", "sum")).reset_index()
+
+
+class RunningAggregates:
+    """Additive aggregates over every inspection row seen so far."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.last_update = None
+        self._reset(None)
+
+    def _reset(self, schema):
+        self.meta = {"schema": schema, "kpis": None, "consumed": {}, "static": None, "state_id": None,
+                     "rows": 0, "updated_at": None}
+        self.cells = pd.DataFrame()
+        self.last_seen = pd.DataFrame(columns=LAST_SEEN_COLUMNS)
+        self.matches = pd.DataFrame(columns=MATCH_COLUMNS)
+
+    # -- persistence --
+    def _path(self, name: str, state_id: str = None) -> str:
+        return os.path.join(self.directory, f"{name}_{state_id or self.meta['state_id']}.parquet")
+
+    @classmethod
+    def load(cls, directory: str) -> "RunningAggregates":
+        """Persisted state, or an empty one when there is none (or it cannot be read)."""
+        running = cls(directory)
+        try:
+            with open(os.path.join(directory, META), encoding="utf-8") as f:
+                meta = json.load(f)
+            state_id = meta["state_id"]
+            running.cells = pd.read_parquet(running._path("cells", state_id))
+            running.last_seen = pd.read_parquet(running._path("last_seen", state_id))
+            running.matches = pd.read_parquet(running._path("matches", state_id))
+            running.meta = meta
+        except Exception:
+            running._reset(None)
+        return running
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        old_id = self.meta.get("state_id")
+        self.meta["state_id"] = uuid.uuid4().hex[:12]
+        for name in ("cells", "last_seen", "matches"):
+            getattr(self, name).to_parquet(self._path(name), index=False)
+        tmp = os.path.join(self.directory, f"{META}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False, default=str)
+        os.replace(tmp, os.path.join(self.directory, META))
+        if old_id:
+            for path in glob.glob(os.path.join(self.directory, f"*_{old_id}.parquet")):
+                try:
+                    os.remove(path)
+                except Exception:
+                    pass
+
+    # -- update --
+    def _sources(self, raw: pd.DataFrame) -> dict:
+        # source -> row positions in raw (in sheet order)
+        if SOURCE_COL not in raw.columns:
+            return {"": np.arange(len(raw))}
+        return {str(name): pos for name, pos in raw.groupby(SOURCE_COL, sort=False, observed=True).indices.items()}
+
+    def _new_rows(self, raw: pd.DataFrame, sources: dict, generations=None):
+        """Positions after the consumed prefix of every source, or None when some source is not an append."""
+        consumed = self.meta["consumed"]
+        if set(consumed) - set(sources):
+            return None
+        tails = []
+        for name, pos in sources.items():
+            seen = consumed.get(name) or {"rows": 0}
+            n = seen["rows"]
+            if n > len(pos):
+                return None
+            if n and generations is not None:
+                if generations.get(name) is None or generations.get(name) != seen.get("generation"):
+                    return None
+            elif n and _prefix_hash(raw, pos, n) != seen.get("prefix_hash"):
+                return None
+            tails.append(pos[n:])
+        return np.concatenate(tails) if tails else np.empty(0, dtype=np.int64)
+
+    def update(self, raw: pd.DataFrame, static_names=None, generations=None) -> dict:
+        """Fold the rows of raw not seen yet into the aggregates; returns what was done.
+
+        generations maps source -> snapshot generation (the sheet_sync status of each
+        source); without it every consumed row is hashed to detect rewrites.
+        """
+        started = time.perf_counter()
+        mode = "incremental"
+        sources = self._sources(raw)
+        if self.meta["schema"] != schema_key(raw.columns):
+            self._reset(schema_key(raw.columns))
+            mode = "rebuild"
+        positions = self._new_rows(raw, sources, generations)
+        if positions is None:
+            self._reset(schema_key(raw.columns))
+            mode = "rebuild"
+            positions = np.arange(len(raw))
+        new_raw = raw.iloc[np.sort(positions)]
+        new = prepare_inspection(new_raw, COL_RENAME) if len(new_raw) else None
+
+        if new is not None:
+            kpis = cube_kpis(new)
+            if self.meta["kpis"] is not None and kpis != self.meta["kpis"]:
+                # a KPI changed type: the stored cells no longer line up
+                self._reset(self.meta["schema"])
+                self.update(raw, static_names, generations)
+                self.last_update["mode"] = "rebuild"
+                return self.last_update
+            dims = [c for c in CUBE_DIMS if c in new.columns]
+            self.meta["kpis"] = kpis
+            previous_names = set(self.last_seen.loc[self.last_seen["dimension"] == "shelter", "value"])
+            self.cells = merge_cells(self.cells, build_cells(new, dims, kpis), dims)
+            self.last_seen = _merge_last_seen(self.last_seen, _last_seen(new))
+            new_names = [] if INSPECT_SHELTER_COL not in new.columns else \
+                [n for n in pd.unique(new[INSPECT_SHELTER_COL].dropna().astype(str)) if n not in previous_names]
+        else:
+            new_names = []
+
+        static = names_key(static_names)
+        if static_names is not None and static != self.meta["static"]:
+            # static list changed: match every inspected name again
+            all_names = self.last_seen.loc[self.last_seen["dimension"] == "shelter", "value"]
+            self.matches = build_match_table(all_names, static_names)
+            self.meta["static"] = static
+        elif static_names is not None and new_names:
+            self.matches = pd.concat([self.matches, build_match_table(pd.Series(new_names), static_names)],
+                                     ignore_index=True)
+
+        if generations is not None:
+            self.meta["consumed"] = {name: {"rows": int(len(pos)), "generation": generations.get(name)}
+                                     for name, pos in sources.items()}
+        else:
+            self.meta["consumed"] = {name: {"rows": int(len(pos)), "prefix_hash": _prefix_hash(raw, pos, len(pos))}
+                                     for name, pos in sources.items()}
+        self.meta["rows"] = int(len(raw))
+        self.meta["updated_at"] = time.time()
+        self.last_update = {"mode": mode, "new_rows": int(len(new_raw)), "rows": int(len(raw)),
+                            "new_names": len(new_names), "seconds": round(time.perf_counter() - started, 3)}
+        return self.last_update
+
+    # -- views --
+    def cube(self) -> KpiCube:
+        return KpiCube.from_cells(self.cells, self.meta["kpis"] or [])
+
+    def seen(self, dimension: str) -> pd.DataFrame:
+        """first_date / last_date / inspections per block, officer or shelter."""
+        rows = self.last_seen[self.last_seen["dimension"] == dimension].drop(columns="dimension")
+        return rows.rename(columns={"value": LAST_SEEN_DIMS.get(dimension, dimension)}).reset_index(drop=True)
@@ -0,0 +1,319 @@
+# schema.py
+# Column mappings and the typed schema registry for the inspection and static data.
+#
+# Every renamed column has one fixed kind in COLUMN_TYPES. apply_schema converts a
+# prepared frame to those dtypes once, so the dashboard never has to guess whether
+# a column is numeric:
+#   category  - block, shelter, officer and status answers (pandas categorical)
+#   int       - counts; smallest integer dtype, or float32 when the column has gaps
+#   float     - areas and quantities, float32
+#   datetime  - datetime64 (day-level for "date")
+#   photo     - photo URLs, string dtype
+#   string    - free text, phone numbers, tags, raw GPS strings
+
+import pandas as pd
+
+# -------------------------------
+# COLUMN RENAME MAPPING (from provided mapping)
+# -------------------------------
+COL_RENAME = {
+    "Created At": "created_at",
+    "निरीक्षण अधिकारी प्रकार": "inspector_type",
+    "निरीक्षण अधिकारी का पद चुनें": "inspector_designation",
+    "अधिकारी का नाम": "officer_name",
+    "निरीक्षण अधिकारी का नंबर": "officer_mobile",
+    "निरीक्षण का प्रकार": "inspection_type",
+    "गांव / गोवंश आश्रय स्थल का प्रकार": "shelter_category",
+    "विकास खंड/ नगर निकाय": "block_name_static",
+    "गोवंश संरक्षण स्थल का नाम": "shelter_name_static",
+    "गांव / गोवंश आश्रय स्थल का नाम": "village_name_static",
+    "गोवंश संरक्षित की क्षमता": "shelter_capacity_static",
+    "संरक्षित गोंवंश": "protected_cattle_static",
+    "ईअर टेगिंग की संख्या": "ear_tag_count_static",
+    "बधियाकरण": "castration_count_static",
+    "मृत पशुओं की संख्या": "dead_animals_count_static",
+    "कृत्रिम गर्भाधान": "artificial_insemination_count_static",
+    "सुपर्दगी गोवंश": "handover_cattle_static",
+    "लाभार्थियों की संख्या": "beneficiary_count_static",
+    "GPS Location": "gps_location_static",
+    "गोशाला का प्रकार": "goshala_type",
+    "उपलब्ध गोंवंश की संख्या": "available_cattle",
+    "उपलब्ध शेड की संख्या": "shed_count",
+    "शेड में उपलब्ध पंखों की संख्या": "fan_count",
+    "बोर से ढके शेड की संख्या": "roofed_shed_count",
+    "शेड के ऊपर पानी के छिड़काव की स्थिति": "shed_spray_status",
+    "शेड में वेंटिलेशन की स्थिति": "ventilation_status",
+    "उपलब्ध शेड में साफ़ सफ़ाई की व्यवस्था?": "cleanliness_arrangement",
+    "शेड की फोटो डालें": "shed_photo",
+    "उपलब्ध सभी शेड का कुल क्षेत्रफल ( वर्ग फीट)": "total_shed_area_sqft",
+    "गोशाला की अधिकतम क्षमता": "max_capacity",
+    "उपलब्ध शेड मौजूद पशुओं के लिए प्रयापत है?": "shed_adequate_animals_1",
+    "उपलब्ध शेड मौजूद पशुओं के लिए प्रयापत है? ": "shed_adequate_animals_2",
+    "अपर्याप्त शेड की दशा में अतिरिक्त शेड के निर्माण की स्थिति": "additional_shed_status",
+    "अतिरिक्त शेड निर्माण की वर्तमान स्थिति": "additional_shed_current_status",
+    "कुल ईअर टेगिंग किए हुए पशुओं की संख्या": "total_eartagged_cattle",
+    "ताजा पेयजल की व्यवस्था": "drinking_water",
+    "गोशाला पर मौजूद पानी भंडारण की क्षमता ( लीटर में)": "water_storage_capacity_litre",
+    "पानी का स्रोत्र की फोटो": "water_source_photo",
+    "उपलब्ध भूसा गोदाम की संख्या": "fodder_godown_count",
+    "उपलब्ध अस्थाई खोप की संख्या": "temp_shed_count",
+    "उपलब्ध भूसे की मात्रा ( क्विंटल में)": "fodder_quantity_quintal",
+    "उपलब्ध भूसा कितने दिन के लिए प्रयापत है?": "fodder_days_available",
+    "भूसे की फोटो": "fodder_photo",
+    "उपलब्ध चोकर - आहार की मात्रा (KG)": "bran_feed_quantity_kg",
+    "चोकर आहार की फोटो": "bran_feed_photo",
+    "उपलब्ध साइलेज की मात्रा (KG)": "silage_quantity_kg",
+    "साइलेज की फोटो": "silage_photo",
+    "गोवंश के विचरण के लिए खुले मैदान की स्थिति": "grazing_field_status",
+    "उपलब्ध मैदान का क्षेत्रफल ( हे में)": "grazing_field_area_ha",
+    "संबंध चारागाह का नाम": "pasture_name",
+    "संबंध चारागाह का क्षेत्रफल ( हेक्टर में)": "pasture_area_ha",
+    "संबंध चारागाह में चारा फसल बुवाई क्षेत्रफल ( हेक्टर में)": "pasture_crop_area_ha",
+    "चरागाह एव फसल की फोटो": "pasture_crop_photo",
+    "गोबर निस्तारण की स्थिति": "dung_disposal_status",
+    "मौजूद पशुओं के स्वास्थ्य की स्थिति": "animal_health_status",
+    "ख़राब स्वाथ्य वाले पशुओं की संख्या": "sick_animal_count",
+    "बीमार पशु का ईयर टैग स्कैन करें": "sick_tag_scan",
+    "ख़राब स्वाथ्य वाले पशुओं के ईयर टैग": "sick_animal_tags",
+    "उपलब्ध दवाओं का चयन करें ": "available_medicines",
+    "अस्वस्थ जानवरों की फोटो": "sick_animals_photo",
+    "मौजूद पशुओं के टीकाकरण की स्थिति": "vaccination_status",
+    "टीकाकरण वाले पशुओं की संख्या": "vaccinated_animals",
+    "टीकों का चयन करें ": "vaccine_types",
+    "आखरी टीकाकरण का दिनांक": "last_vaccine_date",
+    "आखरी कीट नियंत्रण छिड़काव का दिनांक": "last_pest_spray_date",
+    "किस माह तक फण्ड रिक्वेस्ट की गई": "fund_requested_till",
+    "निरीक्षण आख्या पोर्टल पर अपलोड की गई या नहीं": "report_uploaded",
+    "पिछले माह मृत गोवंश की संख्या": "prev_month_dead_count",
+    "पिछले माह मृत गोवंश के उपलब्ध पोस्टमार्टम की संख्या": "prev_month_postmortem_count",
+    "मृत पशुओं के शव के निस्तारण की स्थिति": "dead_disposal_status_1",
+    "मृत पशुओं के शव के निस्तारण की स्थिति ": "dead_disposal_status_2",
+    "गौशाला का सुरक्षा प्रबंधन": "security_management",
+    "कुल केयर टेकर की संख्या": "total_caretakers",
+    "रात्रि में केयर टेकर की संख्या": "night_caretakers",
+    "कुल CCTV की संख्या": "cctv_count",
+    "CCTV की रिकॉर्डिंग (दिवस)": "cctv_days",
+    "सभी केयर टेकर की फोटो": "caretakers_photo",
+    "किस माह तक केयर टेकर को तनख्वाह दी जा चुकी है": "salary_paid_till",
+    "गोशाला पर मौजूद रजिस्टर": "register_main",
+    "अन्य रजिस्टर का नाम एव विवरण दे": "register_other",
+    "सहभागिता के अंतर्गत संरक्षित गोवंश की संख्या": "participation_cattle_count",
+    "सहभागिता के अंतर्गत लाभान्वित परिवारों की संख्या": "participation_family_count",
+    "किस माह तक सहभागिता की राशि का भुगतान हो चुका है": "participation_paid_till",
+    "पोषण मिशन के अंतर्गत संरक्षित गोवंश की संख्या": "nutrition_cattle_count",
+    "पोषण मिशन के अंतर्गत लाभान्वित परिवारों की संख्या": "nutrition_family_count",
+    "किस माह तक पोषण माह की राशि का भुगतान हो चुका है": "nutrition_paid_till",
+    "अन्य रिमार्क": "remarks",
+    "UID टैग": "uid_tag",
+    "विकास खण्ड": "participant_block_name",
+    "राजस्व गांव का नाम": "participant_village_name",
+    "गोशाला का नाम": "participant_shelter_name",
+    "शाहभागी का नाम": "participant_name",
+    "शाहभागी का मोबाइल नंबर": "participant_mobile",
+    "शाहभागी का आधार नंबर": "participant_aadhar",
+    "शाहभागी का पता": "participant_address",
+    "ईयर टैग स्कैन करें": "participant_ear_tag_scan",
+    "शाहभागिता टैग UID": "participant_tag_uid",
+    "Date": "date",
+    "Time": "time",
+    "GPS Location inspection ": "gps_location_inspection",
+}
+
+# -------------------------------
+# Hardcoded KPI groups (as provided)
+# -------------------------------
+KPI_GROUPS = {
+    "inspection_basic": [
+        "created_at", "goshala_type", "available_cattle", "remarks",
+        "date", "time", "gps_location_inspection", "total_eartagged_cattle"
+    ],
+    "inspection_officer": [
+        "inspector_type", "inspector_designation", "officer_name", "officer_mobile",
+        "inspection_type", "shelter_category", "block_name_static",
+        "shelter_name_static", "village_name_static"
+    ],
+    "static_data": [
+        "shelter_capacity_static", "protected_cattle_static", "ear_tag_count_static",
+        "castration_count_static", "dead_animals_count_static", "artificial_insemination_count_static",
+        "handover_cattle_static", "beneficiary_count_static", "gps_location_static"
+    ],
+    "inspection_shed": [
+        "shed_count", "fan_count", "roofed_shed_count", "shed_spray_status", "ventilation_status",
+        "cleanliness_arrangement", "shed_photo", "total_shed_area_sqft", "max_capacity",
+        "shed_adequate_animals_1", "shed_adequate_animals_2", "additional_shed_status",
+        "additional_shed_current_status"
+    ],
+    "inspection_water": [
+        "drinking_water", "water_storage_capacity_litre", "water_source_photo"
+    ],
+    "inspection_fodder": [
+        "fodder_godown_count", "temp_shed_count", "fodder_quantity_quintal",
+        "fodder_days_available", "fodder_photo", "bran_feed_quantity_kg",
+        "bran_feed_photo", "silage_quantity_kg", "silage_photo"
+    ],
+    "inspection_pasture": [
+        "grazing_field_status", "grazing_field_area_ha", "pasture_name",
+        "pasture_area_ha", "pasture_crop_area_ha", "pasture_crop_photo"
+    ],
+    "inspection_health": [
+        "dung_disposal_status", "animal_health_status", "sick_animal_count",
+        "sick_tag_scan", "sick_animal_tags", "available_medicines",
+        "sick_animals_photo"
+    ],
+    "inspection_vaccination": [
+        "vaccination_status", "vaccinated_animals", "vaccine_types",
+        "last_vaccine_date", "last_pest_spray_date"
+    ],
+    "inspection_admin": [
+        "fund_requested_till", "report_uploaded", "register_main", "register_other"
+    ],
+    "inspection_dead_animals": [
+        "prev_month_dead_count", "prev_month_postmortem_count",
+        "dead_disposal_status_1"
+    ],
+    "inspection_security": [
+        "security_management", "total_caretakers", "night_caretakers", "cctv_count",
+        "cctv_days", "caretakers_photo", "salary_paid_till"
+    ],
+    "inspection_sahbhagita": [
+        "participation_cattle_count", "participation_family_count", "participation_paid_till"
+    ],
+    "inspection_poshan_mission": [
+        "nutrition_cattle_count", "nutrition_family_count", "nutrition_paid_till"
+    ],
+    "inspection_sahbhagita_details": [
+        "uid_tag", "participant_block_name", "participant_village_name", "participant_shelter_name",
+        "participant_name", "participant_mobile", "participant_aadhar", "participant_address"
+    ],
+    "sahbhagita_inspection_details": [
+        "participant_ear_tag_scan", "participant_tag_uid", "participant2_block_name",
+        "participant2_village_name", "participant2_shelter_name", "participant2_name",
+        "participant2_mobile", "participant2_aadhar", "participant2_address"
+    ],
+}
+
+# static sheet (goshala_static_data.xlsx) headers
+STATIC_COL_RENAME = {
+    "विकास खंड या नगर निकाय": "block_ulb_base",
+    "गांव / गोवंश आश्रय स्थल का प्रकार": "shelter_category_base",
+    "गांव / गोवंश आश्रय स्थल का नाम": "shelter_name_base",
+    "गोवंश संरक्षित की क्षमता": "shelter_capacity_base",
+    "संरक्षित गोंवंश": "protected_cattle_base",
+    "ईअर टेगिंग की संख्या": "ear_tag_count_base",
+    "बधियाकरण": "count_castaration_base",
+    "मृत पशुओं की संख्या": "count_dead_animal_base",
+    "कृत्रिम गर्भाधान": "count_artificial_insemination_base",
+    "सुपर्दगी गोवंश": "count_sahbhagita_animals_base",
+    "लाभार्थियों की संख्या": "count_sahbhagita_beneficiary_base",
+    "GPS Location": "gps_location_base",
+}
+
+# -------------------------------
+# Typed schema registry
+# -------------------------------
+CATEGORY_COLS = [
+    "inspector_type", "inspector_designation", "officer_name", "inspection_type",
+    "shelter_category", "block_name_static", "shelter_name_static", "village_name_static",
+    "goshala_type", "shed_spray_status", "ventilation_status", "cleanliness_arrangement",
+    "shed_adequate_animals_1", "shed_adequate_animals_2", "additional_shed_status",
+    "additional_shed_current_status", "drinking_water", "grazing_field_status", "pasture_name",
+    "dung_disposal_status", "animal_health_status", "available_medicines", "vaccination_status",
+    "vaccine_types", "fund_requested_till", "report_uploaded", "dead_disposal_status_1",
+    "dead_disposal_status_2", "security_management", "salary_paid_till", "register_main",
+    "participation_paid_till", "nutrition_paid_till", "participant_block_name",
+    "participant_village_name", "participant_shelter_name",
+    "block_ulb_base", "shelter_category_base", "shelter_name_base",
+    "source_sheet", "district",  # provenance added by sources.py
+]
+
+INT_COLS = [
+    "shelter_capacity_static", "protected_cattle_static", "ear_tag_count_static",
+    "castration_count_static", "dead_animals_count_static", "artificial_insemination_count_static",
+    "handover_cattle_static", "beneficiary_count_static", "available_cattle", "shed_count",
+    "fan_count", "roofed_shed_count", "max_capacity", "total_eartagged_cattle",
+    "fodder_godown_count", "temp_shed_count", "fodder_days_available", "sick_animal_count",
+    "vaccinated_animals", "prev_month_dead_count", "prev_month_postmortem_count",
+    "total_caretakers", "night_caretakers", "cctv_count", "cctv_days",
+    "participation_cattle_count", "participation_family_count", "nutrition_cattle_count",
+    "nutrition_family_count",
+    "shelter_capacity_base", "protected_cattle_base", "ear_tag_count_base", "count_castaration_base",
+    "count_dead_animal_base", "count_artificial_insemination_base", "count_sahbhagita_animals_base",
+    "count_sahbhagita_beneficiary_base",
+]
+
+FLOAT_COLS = [
+    "total_shed_area_sqft", "water_storage_capacity_litre", "fodder_quantity_quintal",
+    "bran_feed_quantity_kg", "silage_quantity_kg", "grazing_field_area_ha", "pasture_area_ha",
+    "pasture_crop_area_ha",
+]
+
+DATETIME_COLS = ["created_at", "date", "last_vaccine_date", "last_pest_spray_date"]
+
+PHOTO_COLS = [
+    "shed_photo", "water_source_photo", "fodder_photo", "bran_feed_photo", "silage_photo",
+    "pasture_crop_photo", "sick_animals_photo", "caretakers_photo",
+]
+
+
+def _build_registry() -> dict:
+    # every known column defaults to free text, then the explicit kinds win
+    registry = {c: "string" for c in COL_RENAME.values()}
+    registry.update({c: "string" for c in STATIC_COL_RENAME.values()})
+    registry.update({c: "string" for group in KPI_GROUPS.values() for c in group})
+    for kind, cols in [("category", CATEGORY_COLS), ("int", INT_COLS), ("float", FLOAT_COLS),
+                       ("datetime", DATETIME_COLS), ("photo", PHOTO_COLS)]:
+        registry.update({c: kind for c in cols})
+    return registry
+
+
+COLUMN_TYPES = _build_registry()
+NUMERIC_KINDS = ("int", "float")
+
+
+def is_numeric_col(col: str) -> bool:
+    return COLUMN_TYPES.get(col) in NUMERIC_KINDS
+
+
+def numeric_cols(df: pd.DataFrame, cols) -> list:
+    """Columns of cols that exist in df and are numeric under the schema."""
+    return [c for c in cols if c in df.columns and pd.api.types.is_numeric_dtype(df[c])]
+
+
+def all_numeric_kpis(df: pd.DataFrame) -> list:
+    return sorted({c for group in KPI_GROUPS.values() for c in numeric_cols(df, group)})
+
+
+def _missing_text(s: pd.Series) -> pd.Series:
+    # "nan" / "None" / blanks come from astype(str) on missing sheet cells
+    text = s.astype("string").str.strip()
+    return text.mask(text.isin(["", "nan", "None", "NaT"]))
+
+
+def _to_int(s: pd.Series) -> pd.Series:
+    num = pd.to_numeric(s, errors="coerce")
+    if num.notna().all() and (num % 1 == 0).all():
+        return pd.to_numeric(num, downcast="integer")
+    return num.astype("float32")
+
+
+def convert_column(s: pd.Series, kind: str) -> pd.Series:
+    if kind == "category":
+        return s if isinstance(s.dtype, pd.CategoricalDtype) else _missing_text(s).astype("category")
+    if kind == "int":
+        return _to_int(s)
+    if kind == "float":
+        return pd.to_numeric(s, errors="coerce").astype("float32")
+    if kind == "datetime":
+        out = pd.to_datetime(s, errors="coerce")
+        return out.dt.normalize() if s.name == "date" else out
+    return _missing_text(s)
+
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """Return df with every registered column converted to its schema dtype."""
+    out = df.copy()
+    for c in out.columns:
+        kind = COLUMN_TYPES.get(c)
+        if kind is not None:
+            out[c] = convert_column(out[c], kind)
+    return out
@@ -0,0 +1,164 @@
+# sheet_sync.py
+# Local snapshot store for the inspection Google Sheet export.
+#
+# The sheet is only downloaded again once the local snapshot is older than the
+# TTL. Refreshes are conditional (If-None-Match / If-Modified-Since from the last
+# response) and accept gzip, so an unchanged export costs a 304 and no parsing.
+# When the export bytes are unchanged the snapshot is kept as-is; when they
+# changed, the export becomes the snapshot. The refresh is reported as an append
+# (with the number of new rows) when the old snapshot is an exact prefix of the
+# export, and as a replace otherwise (edited, removed or reordered rows). Every
+# replace bumps the snapshot's "generation", reported with each status, so
+# consumers that folded in a prefix of the rows can tell it no longer holds.
+# Snapshots are stored as Parquet so a cold start is a local read, and a failed
+# download serves the last good snapshot together with its age.
+
+import hashlib
+import io
+import json
+import os
+import time
+
+import pandas as pd
+import requests
+
+DEFAULT_TTL_SECONDS = 15 * 60
+FETCH_TIMEOUT_SECONDS = 30
+
+
+def _snapshot_paths(snapshot_dir: str, csv_url: str):
+    key = hashlib.sha1(csv_url.encode("utf-8")).hexdigest()[:16]
+    base = os.path.join(snapshot_dir, f"sheet_{key}")
+    return base + ".parquet", base + ".json"
+
+
+def read_meta(snapshot_dir: str, csv_url: str) -> dict:
+    _, meta_path = _snapshot_paths(snapshot_dir, csv_url)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_meta(meta_path: str, meta: dict):
+    tmp = meta_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(meta, fh, indent=2)
+    os.replace(tmp, meta_path)
+
+
+def read_snapshot(snapshot_dir: str, csv_url: str):
+    """Return the stored snapshot for csv_url, or None if there is none."""
+    data_path, _ = _snapshot_paths(snapshot_dir, csv_url)
+    if not os.path.exists(data_path):
+        return None
+    try:
+        return pd.read_parquet(data_path)
+    except Exception:
+        return None
+
+
+def _write_snapshot(data_path: str, df: pd.DataFrame):
+    tmp = data_path + ".tmp"
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, data_path)
+
+
+def appended_rows(snapshot, fresh: pd.DataFrame):
+    """Rows fresh adds after the snapshot when the snapshot is an exact prefix of it
+    (same header, same leading rows), else None."""
+    if snapshot is None or list(snapshot.columns) != list(fresh.columns) or len(fresh) < len(snapshot):
+        return None
+    # both frames hold the raw string cells (parse_csv_bytes / its Parquet copy)
+    if not snapshot.equals(fresh.iloc[:len(snapshot)]):
+        return None
+    return len(fresh) - len(snapshot)
+
+
+def fetch_csv(csv_url: str, timeout: float = FETCH_TIMEOUT_SECONDS, session=None, etag=None,
+              last_modified=None):
+    """Conditional GET: (content or None when the server answered 304, validators)."""
+    headers = {"Accept-Encoding": "gzip, deflate"}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    resp = (session or requests).get(csv_url, timeout=timeout, headers=headers)
+    if resp.status_code == 304:
+        return None, {"etag": etag, "last_modified": last_modified}
+    resp.raise_for_status()
+    return resp.content, {"etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified")}
+
+
+def format_age(seconds) -> str:
+    """Human readable age such as "12 min" or "3 h"; "unknown" when not known."""
+    if seconds is None:
+        return "unknown"
+    for unit, size in (("d", 86400), ("h", 3600), ("min", 60)):
+        if seconds >= size:
+            return f"{int(seconds // size)} {unit}"
+    return f"{int(seconds)} s"
+
+
+def parse_csv_bytes(content: bytes) -> pd.DataFrame:
+    # keep raw cells as strings: the snapshot mirrors the sheet, typing happens in data prep
+    return pd.read_csv(io.BytesIO(content), dtype=str, keep_default_na=True)
+
+
+def sync_sheet_status(csv_url: str, snapshot_dir: str, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                      force: bool = False, session=None, timeout: float = FETCH_TIMEOUT_SECONDS):
+    """Return the inspection rows and a status dict, refreshing the local snapshot when it is stale.
+
+    The network is only touched when force is set, no snapshot exists yet or
+    the snapshot is older than ttl_seconds. "state" is one of cached,
+    not_modified (304), unchanged, appended, replaced or offline (download
+    failed, snapshot served, with "error"); "synced_at" is when the snapshot was
+    last confirmed against the sheet (epoch seconds)."""
+    os.makedirs(snapshot_dir, exist_ok=True)
+    data_path, meta_path = _snapshot_paths(snapshot_dir, csv_url)
+    meta = read_meta(snapshot_dir, csv_url)
+    snapshot = read_snapshot(snapshot_dir, csv_url)
+
+    age = time.time() - meta.get("fetched_at", 0)
+    if snapshot is not None and not force and age < ttl_seconds:
+        return snapshot, {"state": "cached", "synced_at": meta.get("fetched_at"), "generation": meta.get("generation", 0)}
+
+    # validators only make sense while the snapshot they describe exists
+    validators = (meta.get("etag"), meta.get("last_modified")) if snapshot is not None else (None, None)
+    try:
+        content, headers = fetch_csv(csv_url, timeout, session, *validators)
+    except Exception as e:
+        if snapshot is not None:
+            return snapshot, {"state": "offline", "error": str(e), "synced_at": meta.get("fetched_at"),
+                              "generation": meta.get("generation", 0)}
+        raise
+
+    if content is None:
+        meta.update(fetched_at=time.time(), appended_rows=0)
+        _write_meta(meta_path, meta)
+        return snapshot, {"state": "not_modified", "synced_at": time.time(), "generation": meta.get("generation", 0)}
+
+    digest = hashlib.sha256(content).hexdigest()
+    if snapshot is not None and digest == meta.get("content_sha256"):
+        meta.update(fetched_at=time.time(), appended_rows=0, **headers)
+        _write_meta(meta_path, meta)
+        return snapshot, {"state": "unchanged", "synced_at": time.time(), "generation": meta.get("generation", 0)}
+
+    # the export is the new snapshot, so the digest always describes the stored rows
+    fresh = parse_csv_bytes(content)
+    appended = appended_rows(snapshot, fresh)
+    state, new_rows = ("replaced", len(fresh)) if appended is None else ("appended", appended)
+    generation = meta.get("generation", 0) + (state == "replaced")
+    _write_snapshot(data_path, fresh)
+    _write_meta(meta_path, {
+        "source": csv_url,
+        "fetched_at": time.time(),
+        "content_sha256": digest,
+        "rows": int(len(fresh)),
+        "appended_rows": int(new_rows),
+        "generation": int(generation),
+        **headers,
+    })
+    return fresh, {"state": state, "appended_rows": int(new_rows), "synced_at": time.time(),
+                   "generation": int(generation)}
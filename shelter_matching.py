@@ -0,0 +1,153 @@
+# shelter_matching.py
+# Inspected -> static shelter name matching for the coverage metrics.
+#
+# Names are normalised once per distinct value (vectorised), exact matches are a
+# hash lookup, and fuzzy candidates for the rest come from a character-trigram
+# index instead of comparing against every static name. Only the few best trigram
+# candidates are scored with difflib, using the same 0.75 ratio cutoff as
+# difflib.get_close_matches. The resulting match table covers every distinct
+# inspected name and is persisted, keyed by the two name sets, so it is rebuilt
+# only when either dataset changes; superseded tables are deleted on each build.
+
+import glob
+import hashlib
+import os
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+
+import pandas as pd
+
+FUZZY_CUTOFF = 0.75
+FUZZY_CANDIDATES = 8
+# the app keeps up to 4 tables in memory (one per column pair / data version)
+KEEP_TABLES = 4
+MATCH_COLUMNS = ["inspected_name", "inspected_norm", "static_norm", "match_type", "score"]
+
+
+def normalize_names(values) -> pd.Series:
+    """Lowercase, replace punctuation with spaces and collapse whitespace.
+
+    Works on the distinct values only; returns a Series indexed by the original
+    value with the normalised name (NA when nothing is left).
+    """
+    # object dtype keeps Python re semantics (\w matches Devanagari letters)
+    uniq = pd.Series(pd.unique(pd.Series(values).dropna().astype(str)), dtype=object)
+    norm = (uniq.str.strip().str.lower()
+            .str.replace(r"[^\w\s]", " ", regex=True)
+            .str.replace(r"\s+", " ", regex=True)
+            .str.strip())
+    norm = norm.mask(norm == "")
+    return pd.Series(norm.to_numpy(), index=uniq.to_numpy())
+
+
+def _trigrams(s: str):
+    padded = f"  {s} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Inverted index from character trigrams to static names."""
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.postings = defaultdict(list)
+        for i, name in enumerate(self.names):
+            for g in _trigrams(name):
+                self.postings[g].append(i)
+
+    def best_match(self, name: str, cutoff: float = FUZZY_CUTOFF, n_candidates: int = FUZZY_CANDIDATES):
+        """(static_name, ratio) of the best candidate at or above cutoff, else None."""
+        shared = Counter()
+        for g in _trigrams(name):
+            shared.update(self.postings.get(g, ()))
+        best = None
+        matcher = SequenceMatcher()
+        matcher.set_seq2(name)
+        for i, _ in shared.most_common(n_candidates):
+            matcher.set_seq1(self.names[i])
+            if matcher.real_quick_ratio() < cutoff or matcher.quick_ratio() < cutoff:
+                continue
+            ratio = matcher.ratio()
+            if ratio >= cutoff and (best is None or ratio > best[1]):
+                best = (self.names[i], ratio)
+        return best
+
+
+def build_match_table(inspected_names, static_names, cutoff: float = FUZZY_CUTOFF) -> pd.DataFrame:
+    """One row per distinct matched inspected name: its normalised form, the
+    static name it maps to and whether that was an exact or fuzzy match."""
+    insp_norm = normalize_names(inspected_names).dropna()
+    static_set = set(normalize_names(static_names).dropna())
+    index = None
+    fuzzy_cache = {}
+    rows = []
+    for raw, norm in insp_norm.items():
+        if norm in static_set:
+            rows.append((raw, norm, norm, "exact", 1.0))
+            continue
+        if norm not in fuzzy_cache:
+            if index is None:
+                index = TrigramIndex(sorted(static_set))
+            fuzzy_cache[norm] = index.best_match(norm, cutoff)
+        hit = fuzzy_cache[norm]
+        if hit:
+            rows.append((raw, norm, hit[0], "fuzzy", round(hit[1], 4)))
+    return pd.DataFrame(rows, columns=MATCH_COLUMNS)
+
+
+def _names_key(inspected_names, static_names, cutoff: float) -> str:
+    h = hashlib.sha1(f"cutoff={cutoff}".encode("utf-8"))
+    for values in (inspected_names, static_names):
+        uniq = sorted(pd.unique(pd.Series(values).dropna().astype(str)))
+        h.update("\x1e".join(uniq).encode("utf-8"))
+        h.update(b"\x1d")
+    return h.hexdigest()[:20]
+
+
+def _prune(cache_dir: str, keep_path: str, keep: int = KEEP_TABLES):
+    tables = sorted(glob.glob(os.path.join(cache_dir, "shelter_matches_*.parquet")), key=os.path.getmtime, reverse=True)
+    for path in [p for p in tables if p != keep_path][keep - 1:]:
+        try:
+            os.remove(path)
+        except Exception:
+            pass
+
+
+def load_or_build_match_table(inspected_names, static_names, cache_dir=None,
+                              cutoff: float = FUZZY_CUTOFF) -> pd.DataFrame:
+    """Match table for the two name sets, read from cache_dir when it was already built."""
+    path = None
+    if cache_dir:
+        path = os.path.join(cache_dir, f"shelter_matches_{_names_key(inspected_names, static_names, cutoff)}.parquet")
+        if os.path.exists(path):
+            try:
+                return pd.read_parquet(path)
+            except Exception:
+                pass
+    table = build_match_table(inspected_names, static_names, cutoff)
+    if path:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp = path + ".tmp"
+            table.to_parquet(tmp, index=False)
+            os.replace(tmp, path)
+            _prune(cache_dir, path)
+        except Exception:
+            pass
+    return table
+
+
+def static_shelter_count(static_names) -> int:
+    return int(normalize_names(static_names).dropna().nunique())
+
+
+def coverage(match_table: pd.DataFrame, inspected_names, total_static: int) -> dict:
+    """Coverage of the static shelters by the given (filtered) inspected names."""
+    names = pd.unique(pd.Series(inspected_names).dropna().astype(str))
+    hits = match_table[match_table["inspected_name"].isin(names)]
+    exact = hits.loc[hits["match_type"] == "exact", "static_norm"].nunique()
+    fuzzy = hits.loc[hits["match_type"] == "fuzzy", "static_norm"].nunique()
+    inspected = hits["static_norm"].nunique()
+    pct = round(inspected / total_static * 100, 2) if total_static else 0.0
+    return {"total": int(total_static), "inspected": int(inspected), "exact": int(exact),
+            "fuzzy": int(fuzzy), "coverage": pct, "inspected_names": int(len(names))}
@@ -0,0 +1,114 @@
+# sources.py
+# Registry of inspection sheets and concurrent ingestion.
+#
+# Every district form export is one source: a sheet ID plus an optional tab GID.
+# Sources are synced in parallel through one pooled requests.Session (connection
+# reuse, retries with backoff on 429/5xx), each with its own timeout and its own
+# local snapshot (sheet_sync.py). The frames are tagged with their source and
+# district and concatenated under the shared sheet header, so a load takes about
+# as long as the slowest source. A source that cannot be fetched falls back to its
+# snapshot or is left out; either way it is listed in the load report.
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from sheet_sync import DEFAULT_TTL_SECONDS, FETCH_TIMEOUT_SECONDS, sync_sheet_status
+
+DEFAULT_SHEET_ID = "1WZ1mKLGvUj24lLvjzP0CwF8_IBIK4jSqxPikTtiSLVg"
+MAX_WORKERS = 8
+RETRIES = 3
+SOURCE_COL = "source_sheet"
+DISTRICT_COL = "district"
+
+
+class SheetSource:
+    """One Google Sheet tab exported as CSV."""
+
+    def __init__(self, name: str, sheet_id: str, gid=None, district=None, timeout: float = FETCH_TIMEOUT_SECONDS):
+        self.name = name
+        self.sheet_id = sheet_id
+        self.gid = gid
+        self.district = district
+        self.timeout = timeout
+
+    @property
+    def csv_url(self) -> str:
+        url = f"https://docs.google.com/spreadsheets/d/{self.sheet_id}/export?format=csv"
+        return f"{url}&gid={self.gid}" if self.gid not in (None, "") else url
+
+    def __repr__(self):
+        return f"SheetSource({self.name!r}, {self.sheet_id!r}, gid={self.gid!r})"
+
+
+DEFAULT_SOURCES = [SheetSource("default", DEFAULT_SHEET_ID)]
+
+
+def load_registry(path=None) -> list:
+    """Sources from a JSON list of {name, sheet_id, gid, district, timeout}; the
+    default sheet when path is not given or does not exist."""
+    if not path or not os.path.exists(path):
+        return list(DEFAULT_SOURCES)
+    with open(path, "r", encoding="utf-8") as fh:
+        entries = json.load(fh)
+    return [SheetSource(e.get("name") or f"{e['sheet_id']}:{e.get('gid') or 0}", e["sheet_id"], e.get("gid"),
+                        e.get("district"), float(e.get("timeout", FETCH_TIMEOUT_SECONDS))) for e in entries]
+
+
+def make_session(pool_size: int = MAX_WORKERS, retries: int = RETRIES) -> requests.Session:
+    """Session with a connection pool sized for the workers and retry/backoff on transient errors."""
+    retry = Retry(total=retries, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=("GET",), raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _sync_one(source: SheetSource, snapshot_dir: str, ttl_seconds: float, force: bool, session):
+    started = time.perf_counter()
+    report = {"source": source.name, "district": source.district, "url": source.csv_url}
+    try:
+        df, status = sync_sheet_status(source.csv_url, snapshot_dir, ttl_seconds, force, session, source.timeout)
+        report.update(status, rows=int(len(df)), ok=status["state"] != "offline")
+    except Exception as e:
+        df = None
+        report.update(state="failed", error=str(e), rows=0, ok=False)
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    return df, report
+
+
+def sync_sources(sources, snapshot_dir: str, ttl_seconds: float = DEFAULT_TTL_SECONDS, force: bool = False,
+                 max_workers: int = MAX_WORKERS, session=None):
+    """Sync every source concurrently; returns (combined rows, per-source reports).
+
+    Rows carry SOURCE_COL and DISTRICT_COL. Raises only when no source produced
+    any rows.
+    """
+    sources = list(sources)
+    own_session = session is None
+    session = session or make_session(min(max_workers, max(1, len(sources))))
+    try:
+        with ThreadPoolExecutor(max_workers=min(max_workers, max(1, len(sources)))) as pool:
+            results = list(pool.map(lambda s: _sync_one(s, snapshot_dir, ttl_seconds, force, session), sources))
+    finally:
+        if own_session:
+            session.close()
+
+    frames, reports = [], []
+    for source, (df, report) in zip(sources, results):
+        reports.append(report)
+        if df is not None:
+            frames.append(df.assign(**{SOURCE_COL: source.name, DISTRICT_COL: source.district or ""}))
+    if not frames:
+        errors = "; ".join(f"{r['source']}: {r.get('error')}" for r in reports)
+        raise RuntimeError(f"no inspection source could be loaded ({errors})")
+    combined = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True, sort=False)
+    return combined, reports
@@ -0,0 +1,123 @@
+# synthetic_data.py
+# Synthetic raw inspection / static sheets for benchmarks and dry runs.
+#
+# Frames carry the real Hindi sheet headers (COL_RENAME / STATIC_COL_RENAME) and
+# string cells, like a CSV export of the Google Sheet, so they go through the same
+# load and prep path as production data. Values are drawn per column kind from
+# the schema registry; blocks, shelters, officers and GPS strings are consistent
+# per shelter, and a share of static names is perturbed so that coverage matching
+# has fuzzy work to do. Cells reference small pools of strings, so memory is
+# roughly 8 bytes per cell plus the pools.
+
+import numpy as np
+import pandas as pd
+
+from geo import STATE_BOUNDS
+from schema import COL_RENAME, COLUMN_TYPES, STATIC_COL_RENAME
+
+SHELTER_TYPES = ["ग्रामीण", "वृहद", "नगरीय", "कांजी हाउस"]
+STATUS_VALUES = ["अच्छा", "सामान्य", "खराब", "हाँ", "नहीं"]
+HEADER = {v: k for k, v in COL_RENAME.items()}
+
+
+def _pool_choice(rng, pool, n):
+    return np.asarray(pool, dtype=object)[rng.integers(0, len(pool), n)]
+
+
+def _entities(blocks: int, shelters: int, officers: int, seed: int):
+    rng = np.random.default_rng(seed)
+    block_names = [f"विकास खंड {i + 1}" for i in range(blocks)]
+    shelter_block = rng.integers(0, blocks, shelters)
+    shelter_names = [f"गोशाला {i + 1} {block_names[b].split()[-1]}" for i, b in enumerate(shelter_block)]
+    lat = rng.uniform(STATE_BOUNDS["lat"][0] + 0.5, STATE_BOUNDS["lat"][1] - 0.5, shelters)
+    lon = rng.uniform(STATE_BOUNDS["lon"][0] + 0.5, STATE_BOUNDS["lon"][1] - 0.5, shelters)
+    return {
+        "block_names": block_names,
+        "shelter_block": shelter_block,
+        "shelter_names": np.asarray(shelter_names, dtype=object),
+        "shelter_type": _pool_choice(rng, SHELTER_TYPES, shelters),
+        "lat": lat,
+        "lon": lon,
+        "officers": [f"अधिकारी {i + 1}" for i in range(officers)],
+    }
+
+
+def _gps_strings(rng, lat, lon, invalid_share: float):
+    # a few metres of jitter around the shelter; some blanks and swapped pairs
+    a = np.round(lat + rng.normal(0, 0.0005, len(lat)), 6).astype(str)
+    b = np.round(lon + rng.normal(0, 0.0005, len(lon)), 6).astype(str)
+    roll = rng.random(len(lat))
+    swapped = roll < invalid_share / 2
+    text = np.char.add(np.char.add(np.where(swapped, b, a), ", "), np.where(swapped, a, b)).astype(object)
+    text[~swapped & (roll < invalid_share)] = ""
+    return text
+
+
+def make_inspection(rows: int, blocks: int = 20, shelters: int = 800, officers: int = 60,
+                    start: str = "2024-01-01", days: int = 365, invalid_gps: float = 0.05,
+                    seed: int = 0) -> pd.DataFrame:
+    """Raw inspection sheet with the real headers and string cells."""
+    rng = np.random.default_rng(seed)
+    ent = _entities(blocks, shelters, officers, seed)
+    shelter = rng.integers(0, shelters, rows)
+    created = (pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days * 86400, rows), unit="s"))
+    created = np.sort(created.to_numpy())  # the sheet is append-only
+
+    cols = {}
+    for header, name in COL_RENAME.items():
+        kind = COLUMN_TYPES.get(name, "string")
+        if kind == "int":
+            cols[header] = _pool_choice(rng, [str(i) for i in range(300)], rows)
+        elif kind == "float":
+            cols[header] = _pool_choice(rng, [f"{x:.1f}" for x in np.linspace(0, 50, 501)], rows)
+        elif kind == "category":
+            cols[header] = _pool_choice(rng, STATUS_VALUES, rows)
+        elif kind == "photo":
+            cols[header] = _pool_choice(rng, [f"https://example.org/photo/{i}.jpg" for i in range(100)], rows)
+        elif kind == "datetime":
+            cols[header] = _pool_choice(rng, [d.strftime("%Y-%m-%d") for d in pd.date_range(start, periods=days)], rows)
+        else:
+            cols[header] = np.full(rows, "", dtype=object)
+    df = pd.DataFrame(cols)
+
+    # per-shelter consistent identity columns
+    df[HEADER["created_at"]] = pd.Series(created).dt.strftime("%Y-%m-%d %H:%M:%S").to_numpy()
+    df[HEADER["date"]] = ""
+    df[HEADER["block_name_static"]] = np.asarray(ent["block_names"], dtype=object)[ent["shelter_block"][shelter]]
+    df[HEADER["shelter_name_static"]] = ent["shelter_names"][shelter]
+    df[HEADER["shelter_category"]] = ent["shelter_type"][shelter]
+    df[HEADER["officer_name"]] = np.asarray(ent["officers"], dtype=object)[_officers_for(rng, ent, shelter, blocks, officers)]
+    df[HEADER["gps_location_inspection"]] = _gps_strings(rng, ent["lat"][shelter], ent["lon"][shelter], invalid_gps)
+    return df
+
+
+def _officers_for(rng, ent, shelter, blocks: int, officers: int):
+    # every officer belongs to one block and inspects shelters there
+    officer_block = np.arange(officers) % blocks
+    order = np.argsort(officer_block, kind="stable")
+    counts = np.bincount(officer_block, minlength=blocks)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    row_block = ent["shelter_block"][shelter]
+    n = counts[row_block]
+    pick = order[np.minimum(starts[row_block] + (rng.random(len(shelter)) * n).astype(int), officers - 1)]
+    # blocks without an officer of their own get any officer
+    return np.where(n > 0, pick, rng.integers(0, officers, len(shelter)))
+
+
+def make_static(blocks: int = 20, shelters: int = 800, fuzzy_share: float = 0.1, seed: int = 0) -> pd.DataFrame:
+    """Raw static shelter list; fuzzy_share of the names are slightly perturbed."""
+    rng = np.random.default_rng(seed + 1)
+    ent = _entities(blocks, shelters, 1, seed)
+    names = ent["shelter_names"].copy()
+    perturb = rng.random(shelters) < fuzzy_share
+    names[perturb] = [n.replace(" ", "", 1) + " गौ" for n in names[perturb]]
+    header = {v: k for k, v in STATIC_COL_RENAME.items()}
+    df = pd.DataFrame({
+        header["block_ulb_base"]: np.asarray(ent["block_names"], dtype=object)[ent["shelter_block"]],
+        header["shelter_category_base"]: ent["shelter_type"],
+        header["shelter_name_base"]: names,
+        header["shelter_capacity_base"]: rng.integers(50, 1000, shelters).astype(str),
+        header["protected_cattle_base"]: rng.integers(0, 900, shelters).astype(str),
+        header["gps_location_base"]: _gps_strings(rng, ent["lat"], ent["lon"], 0.0),
+    })
+    return df
@@ -0,0 +1,91 @@
+# table_view.py
+# Server-side paging for the raw-row tables.
+#
+# Only one page of rows (and only the displayed columns) is materialised and
+# sent to the browser. Sorting does not sort the whole frame: the rows needed up
+# to the requested page are picked with np.argpartition (top-k) and only those
+# are ordered. A sort column that is already monotonic (the date of the
+# date-sorted FilterIndex frame) is paged by plain slicing.
+
+import math
+
+import numpy as np
+import pandas as pd
+
+PAGE_SIZE = 50
+
+
+def sort_keys(col: pd.Series) -> np.ndarray:
+    """float64 keys that order like the column; missing values become NaN."""
+    if pd.api.types.is_datetime64_any_dtype(col):
+        values = col.to_numpy(dtype="datetime64[ns]")
+        keys = values.view("int64").astype("float64")
+        keys[np.isnat(values)] = np.nan
+        return keys
+    if pd.api.types.is_numeric_dtype(col) and not pd.api.types.is_bool_dtype(col):
+        return pd.to_numeric(col, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    codes, _ = pd.factorize(col.astype(object), sort=True)
+    keys = codes.astype("float64")
+    keys[codes < 0] = np.nan
+    return keys
+
+
+def top_k_positions(keys: np.ndarray, k: int, ascending: bool = True) -> np.ndarray:
+    """Positions of the first k rows in sort order (missing values last, ties by position)."""
+    n = len(keys)
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    ranked = np.where(np.isnan(keys), np.inf, keys if ascending else -keys)
+    if k < n:
+        # argpartition picks arbitrary members of a tie group at the k-th value:
+        # keep everything below it and the first of its ties by position
+        kth = ranked[np.argpartition(ranked, k - 1)[k - 1]]
+        below = np.flatnonzero(ranked < kth)
+        candidates = np.concatenate([below, np.flatnonzero(ranked == kth)[:k - len(below)]])
+    else:
+        candidates = np.arange(n)
+    order = np.lexsort((candidates, ranked[candidates]))
+    return candidates[order]
+
+
+def _monotonic_positions(col: pd.Series, lo: int, hi: int, ascending: bool):
+    """Page positions by slicing when col is already sorted ascending without gaps."""
+    if not col.is_monotonic_increasing:
+        return None
+    n = len(col)
+    if ascending:
+        return np.arange(lo, min(hi, n))
+    # descending: the last rows first, but equal values keep their order (like top_k_positions),
+    # so the tail is read back from the start of the run holding the hi-th row from the end
+    values = col.to_numpy()
+    start = max(n - hi, 0)
+    if start > 0:
+        differs = np.flatnonzero(values[:start] != values[start])
+        start = int(differs[-1]) + 1 if len(differs) else 0
+    tail = values[start:]
+    runs = np.concatenate([[0], np.cumsum(tail[1:] != tail[:-1])])
+    order = np.lexsort((np.arange(len(tail)), -runs))
+    return start + order[lo:hi]
+
+
+def get_page(df: pd.DataFrame, columns=None, sort_by=None, ascending: bool = True,
+             page: int = 1, page_size: int = PAGE_SIZE):
+    """(rows of the page, total row count, page count) for df sorted by sort_by."""
+    total = len(df)
+    n_pages = max(1, math.ceil(total / page_size))
+    page = min(max(1, int(page)), n_pages)
+    lo, hi = (page - 1) * page_size, page * page_size
+    columns = [c for c in (columns or df.columns) if c in df.columns]
+    if sort_by is None or sort_by not in df.columns:
+        positions = np.arange(lo, min(hi, total))
+    else:
+        col = df[sort_by]
+        positions = None
+        if not col.isna().any():
+            positions = _monotonic_positions(col, lo, hi, ascending)
+        if positions is None:
+            positions = top_k_positions(sort_keys(col), hi, ascending)[lo:hi]
+    rows = df.iloc[positions][columns].reset_index(drop=True)
+    rows.index = rows.index + lo + 1
+    return rows, total, n_pages
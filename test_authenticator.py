@@ -1,6 +1,8 @@
 import streamlit as st
 import streamlit_authenticator as stauth
 
+from user_store import load_user_store, users_version
+
 
 # --- Read from secrets ---
 auth = st.secrets["auth"]
@@ -9,27 +11,29 @@ cookie_name = str(auth["cookie_name"])
 signature_key = str(auth["signature_key"])
 cookie_expiry_days = int(auth["cookie_expiry_days"])
 
-# --- Build credentials dict dynamically ---
-credentials = {
-    "usernames": {
-        auth["usernames"][0]: {
-            "name": auth["names"][0],
-            "password": auth["passwords"][0]
-        },
-        auth["usernames"][1]: {
-            "name": auth["names"][1],
-            "password": auth["passwords"][1]
-        }
-    }
-}
+# Optional roster (JSON list of {username, name, password, email, role, blocks, districts}) on top of the
+# auth.usernames / names / passwords lists; hash it with `python user_store.py hash users.json`
+USERS_PATH = "users.json"
+
+# --- User table: loaded and password-hashed once per process, shared by all sessions ---
+@st.cache_resource(max_entries=2, show_spinner=False)
+def user_store(version: str, path: str):
+    return load_user_store(auth, path)
 
-# --- Initialize authenticator (new API) ---
-authenticator = stauth.Authenticate(
-    credentials,
-    cookie_name,
-    signature_key,
-    cookie_expiry_days
-)
+users = user_store(users_version(auth, USERS_PATH), USERS_PATH)
+
+# --- Authenticator: one per session, rebuilt only when the user table changes ---
+# (it keeps login state in its own copy of the credentials; after login, reruns only
+# check st.session_state, the password hash is verified once per login)
+if st.session_state.get("authenticator_version") != users.version:
+    st.session_state["authenticator"] = stauth.Authenticate(
+        users.credentials(),
+        cookie_name,
+        signature_key,
+        cookie_expiry_days
+    )
+    st.session_state["authenticator_version"] = users.version
+authenticator = st.session_state["authenticator"]
 
 # ✅ New login syntax (v0.4.1 and newer)
 name, auth_status, username = authenticator.login(fields={'Form name': 'Login'})
@@ -40,7 +44,7 @@ if auth_status is False:
 elif auth_status is None:
     st.info("🟡 Please enter your credentials to access the dashboard.")
 else:
-
+    
     # step1_app.py
     # Goshala Inspection Dashboard - Full version
     # Light theme, tabs (no sidebar), interactive map, PDF generator for all tabs
@@ -50,260 +54,154 @@ else:
     import numpy as np
     import altair as alt
     import plotly.express as px
-    import plotly.graph_objects as go
-    from fpdf import FPDF
-    from io import BytesIO
     from datetime import datetime, date
-    import base64
-    import math
     import warnings
+    from sheet_sync import format_age
+    from sources import load_registry, sync_sources
+    from data_prep import data_fingerprint, prep_key, prepare_inspection, prepare_static
+    from schema import COL_RENAME, KPI_GROUPS, all_numeric_kpis, numeric_cols
+    from filter_index import FilterIndex
+    from aggregations import AggregationService, composite_score, filter_key
+    from query_store import QueryStore, open_store
+    from partitions import BlockPartitions, open_partitions, scope_key
+    from running_aggregates import RunningAggregates
+    from map_engine import bin_points, color_ramp, plotly_bins_figure, pydeck_bins_deck
+    from chart_images import ChartImageCache
+    from exports import FORMATS, ExportCache, export_key
+    from reports import ReportQueue, report_key, sample_table
+    from table_view import PAGE_SIZE, get_page
+    from time_series import FREQUENCIES
+    from instrumentation import RECENT_RUNS, RunTrace, cache_counters, cache_miss, configure_logging
+    from shelter_matching import coverage as shelter_coverage, load_or_build_match_table, normalize_names, static_shelter_count
     warnings.filterwarnings("ignore")
     
     st.set_page_config(page_title="Goshala Inspection Dashboard", layout="wide")
     
+    # per-rerun stage timings + cache hit/miss, logged as JSON on "goshala.perf" (see instrumentation.py)
+    configure_logging()
+    trace = RunTrace(user=username)
+    
     # -------------------------------
     # CONFIG / PATHS / CONSTANTS
     # -------------------------------
-    GSHEET_ID = "1WZ1mKLGvUj24lLvjzP0CwF8_IBIK4jSqxPikTtiSLVg"
-    # CSV export URL for first sheet. If you need a specific sheet tab, set GID below.
-    GSHEET_CSV_URL = f"https://docs.google.com/spreadsheets/d/{GSHEET_ID}/export?format=csv"
+    # Inspection sheets (district form exports: sheet ID + optional tab GID), see sources.py.
+    # Without this file the single default sheet 1WZ1mKLGvUj24lLvjzP0CwF8_IBIK4jSqxPikTtiSLVg is used.
+    SOURCES_PATH = "sources.json"
     
     LOCAL_STATIC_PATH = "goshala_static_data.xlsx"  # adjust if uploaded elsewhere
     
+    # Local snapshot of the sheet: re-downloaded at most once per TTL, new rows appended
+    SNAPSHOT_DIR = ".goshala_cache"
+    SHEET_SYNC_TTL_SECONDS = 15 * 60
+    
+    # Optional SQLite query store (secrets: auth.query_store = true): the prepared rows stay on
+    # disk and filters / group-bys / leaderboards run as SQL, see query_store.py
+    USE_QUERY_STORE = bool(auth.get("query_store", False))
+    
+    # usernames (secrets: auth.admins, or role "admin" in the users file) that see the diagnostics panel
+    ADMIN_USERS = {u.lower() for u in auth.get("admins", [])} | users.admins()
+    
     # Date-named PDF filename helper
     def pdf_filename():
         return f"goshala_dashboard_summary_{datetime.now().strftime('%Y%m%d')}.pdf"
     
-    # -------------------------------
-    # COLUMN RENAME MAPPING (from provided mapping)
-    # -------------------------------
-    COL_RENAME = {
-        "Created At": "created_at",
-        "निरीक्षण अधिकारी प्रकार": "inspector_type",
-        "निरीक्षण अधिकारी का पद चुनें": "inspector_designation",
-        "अधिकारी का नाम": "officer_name",
-        "निरीक्षण अधिकारी का नंबर": "officer_mobile",
-        "निरीक्षण का प्रकार": "inspection_type",
-        "गांव / गोवंश आश्रय स्थल का प्रकार": "shelter_category",
-        "विकास खंड/ नगर निकाय": "block_name_static",
-        "गोवंश संरक्षण स्थल का नाम": "shelter_name_static",
-        "गांव / गोवंश आश्रय स्थल का नाम": "village_name_static",
-        "गोवंश संरक्षित की क्षमता": "shelter_capacity_static",
-        "संरक्षित गोंवंश": "protected_cattle_static",
-        "ईअर टेगिंग की संख्या": "ear_tag_count_static",
-        "बधियाकरण": "castration_count_static",
-        "मृत पशुओं की संख्या": "dead_animals_count_static",
-        "कृत्रिम गर्भाधान": "artificial_insemination_count_static",
-        "सुपर्दगी गोवंश": "handover_cattle_static",
-        "लाभार्थियों की संख्या": "beneficiary_count_static",
-        "GPS Location": "gps_location_static",
-        "गोशाला का प्रकार": "goshala_type",
-        "उपलब्ध गोंवंश की संख्या": "available_cattle",
-        "उपलब्ध शेड की संख्या": "shed_count",
-        "शेड में उपलब्ध पंखों की संख्या": "fan_count",
-        "बोर से ढके शेड की संख्या": "roofed_shed_count",
-        "शेड के ऊपर पानी के छिड़काव की स्थिति": "shed_spray_status",
-        "शेड में वेंटिलेशन की स्थिति": "ventilation_status",
-        "उपलब्ध शेड में साफ़ सफ़ाई की व्यवस्था?": "cleanliness_arrangement",
-        "शेड की फोटो डालें": "shed_photo",
-        "उपलब्ध सभी शेड का कुल क्षेत्रफल ( वर्ग फीट)": "total_shed_area_sqft",
-        "गोशाला की अधिकतम क्षमता": "max_capacity",
-        "उपलब्ध शेड मौजूद पशुओं के लिए प्रयापत है?": "shed_adequate_animals_1",
-        "उपलब्ध शेड मौजूद पशुओं के लिए प्रयापत है? ": "shed_adequate_animals_2",
-        "अपर्याप्त शेड की दशा में अतिरिक्त शेड के निर्माण की स्थिति": "additional_shed_status",
-        "अतिरिक्त शेड निर्माण की वर्तमान स्थिति": "additional_shed_current_status",
-        "कुल ईअर टेगिंग किए हुए पशुओं की संख्या": "total_eartagged_cattle",
-        "ताजा पेयजल की व्यवस्था": "drinking_water",
-        "गोशाला पर मौजूद पानी भंडारण की क्षमता ( लीटर में)": "water_storage_capacity_litre",
-        "पानी का स्रोत्र की फोटो": "water_source_photo",
-        "उपलब्ध भूसा गोदाम की संख्या": "fodder_godown_count",
-        "उपलब्ध अस्थाई खोप की संख्या": "temp_shed_count",
-        "उपलब्ध भूसे की मात्रा ( क्विंटल में)": "fodder_quantity_quintal",
-        "उपलब्ध भूसा कितने दिन के लिए प्रयापत है?": "fodder_days_available",
-        "भूसे की फोटो": "fodder_photo",
-        "उपलब्ध चोकर - आहार की मात्रा (KG)": "bran_feed_quantity_kg",
-        "चोकर आहार की फोटो": "bran_feed_photo",
-        "उपलब्ध साइलेज की मात्रा (KG)": "silage_quantity_kg",
-        "साइलेज की फोटो": "silage_photo",
-        "गोवंश के विचरण के लिए खुले मैदान की स्थिति": "grazing_field_status",
-        "उपलब्ध मैदान का क्षेत्रफल ( हे में)": "grazing_field_area_ha",
-        "संबंध चारागाह का नाम": "pasture_name",
-        "संबंध चारागाह का क्षेत्रफल ( हेक्टर में)": "pasture_area_ha",
-        "संबंध चारागाह में चारा फसल बुवाई क्षेत्रफल ( हेक्टर में)": "pasture_crop_area_ha",
-        "चरागाह एव फसल की फोटो": "pasture_crop_photo",
-        "गोबर निस्तारण की स्थिति": "dung_disposal_status",
-        "मौजूद पशुओं के स्वास्थ्य की स्थिति": "animal_health_status",
-        "ख़राब स्वाथ्य वाले पशुओं की संख्या": "sick_animal_count",
-        "बीमार पशु का ईयर टैग स्कैन करें": "sick_tag_scan",
-        "ख़राब स्वाथ्य वाले पशुओं के ईयर टैग": "sick_animal_tags",
-        "उपलब्ध दवाओं का चयन करें ": "available_medicines",
-        "अस्वस्थ जानवरों की फोटो": "sick_animals_photo",
-        "मौजूद पशुओं के टीकाकरण की स्थिति": "vaccination_status",
-        "टीकाकरण वाले पशुओं की संख्या": "vaccinated_animals",
-        "टीकों का चयन करें ": "vaccine_types",
-        "आखरी टीकाकरण का दिनांक": "last_vaccine_date",
-        "आखरी कीट नियंत्रण छिड़काव का दिनांक": "last_pest_spray_date",
-        "किस माह तक फण्ड रिक्वेस्ट की गई": "fund_requested_till",
-        "निरीक्षण आख्या पोर्टल पर अपलोड की गई या नहीं": "report_uploaded",
-        "पिछले माह मृत गोवंश की संख्या": "prev_month_dead_count",
-        "पिछले माह मृत गोवंश के उपलब्ध पोस्टमार्टम की संख्या": "prev_month_postmortem_count",
-        "मृत पशुओं के शव के निस्तारण की स्थिति": "dead_disposal_status_1",
-        "मृत पशुओं के शव के निस्तारण की स्थिति ": "dead_disposal_status_2",
-        "गौशाला का सुरक्षा प्रबंधन": "security_management",
-        "कुल केयर टेकर की संख्या": "total_caretakers",
-        "रात्रि में केयर टेकर की संख्या": "night_caretakers",
-        "कुल CCTV की संख्या": "cctv_count",
-        "CCTV की रिकॉर्डिंग (दिवस)": "cctv_days",
-        "सभी केयर टेकर की फोटो": "caretakers_photo",
-        "किस माह तक केयर टेकर को तनख्वाह दी जा चुकी है": "salary_paid_till",
-        "गोशाला पर मौजूद रजिस्टर": "register_main",
-        "अन्य रजिस्टर का नाम एव विवरण दे": "register_other",
-        "सहभागिता के अंतर्गत संरक्षित गोवंश की संख्या": "participation_cattle_count",
-        "सहभागिता के अंतर्गत लाभान्वित परिवारों की संख्या": "participation_family_count",
-        "किस माह तक सहभागिता की राशि का भुगतान हो चुका है": "participation_paid_till",
-        "पोषण मिशन के अंतर्गत संरक्षित गोवंश की संख्या": "nutrition_cattle_count",
-        "पोषण मिशन के अंतर्गत लाभान्वित परिवारों की संख्या": "nutrition_family_count",
-        "किस माह तक पोषण माह की राशि का भुगतान हो चुका है": "nutrition_paid_till",
-        "अन्य रिमार्क": "remarks",
-        "UID टैग": "uid_tag",
-        "विकास खण्ड": "participant_block_name",
-        "राजस्व गांव का नाम": "participant_village_name",
-        "गोशाला का नाम": "participant_shelter_name",
-        "शाहभागी का नाम": "participant_name",
-        "शाहभागी का मोबाइल नंबर": "participant_mobile",
-        "शाहभागी का आधार नंबर": "participant_aadhar",
-        "शाहभागी का पता": "participant_address",
-        "ईयर टैग स्कैन करें": "participant_ear_tag_scan",
-        "शाहभागिता टैग UID": "participant_tag_uid",
-        "Date": "date",
-        "Time": "time",
-        "GPS Location inspection ": "gps_location_inspection",
-    }
-    
-    # -------------------------------
-    # Hardcoded KPI groups (as provided)
-    # -------------------------------
-    KPI_GROUPS = {
-        "inspection_basic": [
-            "created_at", "goshala_type", "available_cattle", "remarks",
-            "date", "time", "gps_location_inspection", "total_eartagged_cattle"
-        ],
-        "inspection_officer": [
-            "inspector_type", "inspector_designation", "officer_name", "officer_mobile",
-            "inspection_type", "shelter_category", "block_name_static",
-            "shelter_name_static", "village_name_static"
-        ],
-        "static_data": [
-            "shelter_capacity_static", "protected_cattle_static", "ear_tag_count_static",
-            "castration_count_static", "dead_animals_count_static", "artificial_insemination_count_static",
-            "handover_cattle_static", "beneficiary_count_static", "gps_location_static"
-        ],
-        "inspection_shed": [
-            "shed_count", "fan_count", "roofed_shed_count", "shed_spray_status", "ventilation_status",
-            "cleanliness_arrangement", "shed_photo", "total_shed_area_sqft", "max_capacity",
-            "shed_adequate_animals_1", "shed_adequate_animals_2", "additional_shed_status",
-            "additional_shed_current_status"
-        ],
-        "inspection_water": [
-            "drinking_water", "water_storage_capacity_litre", "water_source_photo"
-        ],
-        "inspection_fodder": [
-            "fodder_godown_count", "temp_shed_count", "fodder_quantity_quintal",
-            "fodder_days_available", "fodder_photo", "bran_feed_quantity_kg",
-            "bran_feed_photo", "silage_quantity_kg", "silage_photo"
-        ],
-        "inspection_pasture": [
-            "grazing_field_status", "grazing_field_area_ha", "pasture_name",
-            "pasture_area_ha", "pasture_crop_area_ha", "pasture_crop_photo"
-        ],
-        "inspection_health": [
-            "dung_disposal_status", "animal_health_status", "sick_animal_count",
-            "sick_tag_scan", "sick_animal_tags", "available_medicines",
-            "sick_animals_photo"
-        ],
-        "inspection_vaccination": [
-            "vaccination_status", "vaccinated_animals", "vaccine_types",
-            "last_vaccine_date", "last_pest_spray_date"
-        ],
-        "inspection_admin": [
-            "fund_requested_till", "report_uploaded", "register_main", "register_other"
-        ],
-        "inspection_dead_animals": [
-            "prev_month_dead_count", "prev_month_postmortem_count",
-            "dead_disposal_status_1"
-        ],
-        "inspection_security": [
-            "security_management", "total_caretakers", "night_caretakers", "cctv_count",
-            "cctv_days", "caretakers_photo", "salary_paid_till"
-        ],
-        "inspection_sahbhagita": [
-            "participation_cattle_count", "participation_family_count", "participation_paid_till"
-        ],
-        "inspection_poshan_mission": [
-            "nutrition_cattle_count", "nutrition_family_count", "nutrition_paid_till"
-        ],
-        "inspection_sahbhagita_details": [
-            "uid_tag", "participant_block_name", "participant_village_name", "participant_shelter_name",
-            "participant_name", "participant_mobile", "participant_aadhar", "participant_address"
-        ],
-        "sahbhagita_inspection_details": [
-            "participant_ear_tag_scan", "participant_tag_uid", "participant2_block_name",
-            "participant2_village_name", "participant2_shelter_name", "participant2_name",
-            "participant2_mobile", "participant2_aadhar", "participant2_address"
-        ],
-    }
+    # Optional Unicode TTF for PDF reports (Hindi names); the latin-1 core font is used when missing
+    REPORT_FONT_PATH = "DejaVuSans.ttf"
     
     # -------------------------------
     # Utility functions
     # -------------------------------
-    @st.cache_data
-    def load_csv_from_gsheet(csv_url: str) -> pd.DataFrame:
-        try:
-            return pd.read_csv(csv_url)
-        except Exception as e:
-            st.error(f"Failed to load Google Sheet CSV: {e}")
-            return pd.DataFrame()
-    
-    @st.cache_data
-    def load_static_local(path: str) -> pd.DataFrame:
+    @st.cache_resource(ttl=SHEET_SYNC_TTL_SECONDS, show_spinner=False)
+    def load_inspection_sheets(registry_path: str, force: bool = False):
+        cache_miss("load_inspection_sheets")
+        # all registered sheets fetched concurrently; shared across sessions and never mutated.
+        # returns (raw rows, data fingerprint, per-source load reports)
+        df, reports = sync_sources(load_registry(registry_path), SNAPSHOT_DIR,
+                                   ttl_seconds=SHEET_SYNC_TTL_SECONDS, force=force)
+        return df, data_fingerprint(df), reports
+    
+    @st.cache_resource(show_spinner=False)
+    def load_static_local(path: str):
+        cache_miss("load_static_local")
         try:
-            return pd.read_excel(path)
+            df = pd.read_excel(path)
         except Exception:
-            return pd.DataFrame()
-    
-    def safe_rename(df: pd.DataFrame, mapping: dict) -> pd.DataFrame:
-        present_map = {k: v for k, v in mapping.items() if k in df.columns}
-        return df.rename(columns=present_map)
-    
-    def ensure_date_col(df: pd.DataFrame):
-        # prefer existing renamed 'date', else try Created At / created_at
-        if "date" in df.columns:
-            try:
-                df["date"] = pd.to_datetime(df["date"], errors="coerce").dt.date
-                return df
-            except Exception:
-                pass
-        for c in ["Created At", "created_at", "CreatedAt", "Created"]:
-            if c in df.columns:
-                try:
-                    df["date"] = pd.to_datetime(df[c], errors="coerce").dt.date
-                    return df
-                except Exception:
-                    pass
-        # fallback: try to parse created_at column if available
-        if "created_at" in df.columns:
-            try:
-                df["date"] = pd.to_datetime(df["created_at"], errors="coerce").dt.date
-                return df
-            except Exception:
-                pass
-        df["date"] = pd.NaT
-        return df
-    
-    def prefix_cols_lower(df: pd.DataFrame, cols):
-        for c in cols:
-            if c in df.columns:
-                df[c] = df[c].astype(str).str.strip()
+            df = pd.DataFrame()
+        return df, data_fingerprint(df)
+    
+    # Prepared frames are cached per data version (content hash + pipeline version)
+    @st.cache_resource(max_entries=2, show_spinner=False)
+    def prepared_inspection(version: str, _raw: pd.DataFrame) -> pd.DataFrame:
+        cache_miss("prepared_inspection")
+        return prepare_inspection(_raw, COL_RENAME)
+    
+    @st.cache_resource(max_entries=2, show_spinner=False)
+    def prepared_static(version: str, _raw: pd.DataFrame) -> pd.DataFrame:
+        cache_miss("prepared_static")
+        return prepare_static(_raw, COL_RENAME)
+    
+    # Users limited to some blocks / districts read only those blocks' partitions (see partitions.py);
+    # each scope's rows, filter index and aggregates are cached once and shared by its sessions
+    @st.cache_resource(max_entries=2, show_spinner=False)
+    def block_partitions(version: str, _raw: pd.DataFrame) -> BlockPartitions:
+        cache_miss("block_partitions")
+        return open_partitions(SNAPSHOT_DIR, version, lambda: prepare_inspection(_raw, COL_RENAME))
+    
+    @st.cache_resource(max_entries=32, show_spinner=False)
+    def scoped_inspection(version: str, _partitions: BlockPartitions, scope_blocks: tuple) -> pd.DataFrame:
+        cache_miss("scoped_inspection")
+        return _partitions.load(scope_blocks)
+    
+    # keyed on the data version plus the user's scope: small scoped entries next to the state-wide one
+    @st.cache_resource(max_entries=16, show_spinner=False)
+    def inspection_filter_index(version: str, _df: pd.DataFrame) -> FilterIndex:
+        cache_miss("inspection_filter_index")
+        return FilterIndex(_df)
+    
+    @st.cache_resource(max_entries=16, show_spinner=False)
+    def aggregation_service(version: str, _index: FilterIndex, _cube=None) -> AggregationService:
+        cache_miss("aggregation_service")
+        # one memoized aggregate store per data version, shared by all views and sessions
+        return AggregationService(_index, version, cube=_cube)
+    
+    # State-wide KPI cube, last-seen dates and shelter name matches, advanced from the rows appended
+    # since the previous data version instead of rebuilt (see running_aggregates.py)
+    @st.cache_resource(max_entries=2, show_spinner=False)
+    def running_aggregates(version: str, static_version: str, _raw: pd.DataFrame, _static_names,
+                           _generations: dict) -> RunningAggregates:
+        cache_miss("running_aggregates")
+        running = RunningAggregates.load(f"{SNAPSHOT_DIR}/running")
+        # a source sheet_sync replaced (edited rows) gets a new generation: the state is rebuilt
+        running.update(_raw, _static_names, _generations)
+        running.save()
+        return running
+    
+    @st.cache_resource(max_entries=2, show_spinner=False)
+    def inspection_store(version: str, _raw: pd.DataFrame, _static: pd.DataFrame) -> QueryStore:
+        cache_miss("inspection_store")
+        # built once per data version and shared through SNAPSHOT_DIR; the prepared frame is dropped after the build
+        return open_store(SNAPSHOT_DIR, version, lambda: (prepare_inspection(_raw, COL_RENAME), _static))
+    
+    @st.cache_resource(max_entries=4, show_spinner=False)
+    def shelter_match_table(inspect_version: str, static_version: str, inspect_col: str, static_col: str,
+                            _inspected: pd.Series, _static: pd.Series):
+        cache_miss("shelter_match_table")
+        # inspected -> static name matches for the whole dataset, persisted next to the snapshot
+        table = load_or_build_match_table(_inspected, _static, cache_dir=SNAPSHOT_DIR)
+        return table, static_shelter_count(_static)
+    
+    def inspected_names(col: str) -> pd.Series:
+        return store.distinct(col) if store is not None else df_inspect[col]
+    
+    def coverage_for(names: pd.Series, inspect_col: str, static_col: str) -> dict:
+        # names: the inspected names in the selection (distinct is enough)
+        if running is not None and (inspect_col, static_col) == ("shelter_name_static", "shelter_name_base"):
+            # matches kept up to date by the running aggregates
+            return shelter_coverage(running.matches, names, static_shelter_count(static_df[static_col]))
+        with trace.stage("coverage_match", cache="shelter_match_table", rows=len(names), accumulate=True):
+            table, total_static = shelter_match_table(inspect_version, prep_key(static_fingerprint),
+                                                      inspect_col, static_col, inspected_names(inspect_col), static_df[static_col])
+        return shelter_coverage(table, names, total_static)
     
     # Performance category helper
     def perf_category(value, higher_is_better=True):
@@ -328,135 +226,161 @@ else:
             else:
                 return "poor"
     
-    # PDF helpers
-    def fig_to_png_bytes(fig):
-        """Try to export a plotly figure to PNG bytes. Requires kaleido."""
-        try:
-            img_bytes = fig.to_image(format="png", scale=2)
-            return img_bytes
-        except Exception as e:
-            # fallback: empty bytes
-            return None
+    # PDF reports are built by a shared background worker pool (see reports.py);
+    # rendered chart images are cached by figure content, in memory and on disk
+    @st.cache_resource(show_spinner=False)
+    def report_queue() -> ReportQueue:
+        return ReportQueue(font_path=REPORT_FONT_PATH, image_cache=ChartImageCache(cache_dir=f"{SNAPSHOT_DIR}/charts"))
     
-    def add_image_to_pdf(pdf: FPDF, img_bytes, w=180):
-        if not img_bytes:
+    def report_status(key: str, polling: bool):
+        job = report_queue().get(key)
+        if job is None:
             return
-        tmp_b = BytesIO(img_bytes)
-        pdf.image(tmp_b, x=None, y=None, w=w)
-    
-    def df_to_csv_bytes(df):
-        return df.to_csv(index=False).encode("utf-8")
+        if polling and job.finished:
+            # job finished while polling: full rerun to stop the timer
+            st.rerun()
+        if job.status == "done":
+            st.download_button("Download PDF report", data=job.result, file_name=pdf_filename(),
+                               mime="application/pdf", key=f"pdf_{key}")
+        elif job.status == "failed":
+            st.error(f"PDF generation failed: {job.error}")
+        else:
+            st.progress(job.progress, text=job.message)
+    
+    # Exports are written (in chunks, to disk) only when requested, then served from a shared cache (see exports.py)
+    @st.cache_resource(show_spinner=False)
+    def export_cache() -> ExportCache:
+        return ExportCache(f"{SNAPSHOT_DIR}/exports")
+    
+    def export_download(label: str, df, fmt: str, file_name: str, filters=None, key: str = "export"):
+        # df is a frame or a function returning one (read only when the export is prepared)
+        ekey = export_key(inspect_version, filter_key(filters), fmt, [key])
+        path = export_cache().peek(ekey, fmt)
+        if path is None and st.button(f"Prepare {label}", key=f"prepare_{key}"):
+            with st.spinner("Preparing export..."), trace.stage(f"export:{fmt}") as rec:
+                frame = df() if callable(df) else df
+                rec["rows"] = len(frame)
+                path = export_cache().build(ekey, frame, fmt)
+        if path is not None:
+            # deferred: the file is read (and the hit counted) when the button is clicked,
+            # not on every rerun; the callable runs off the script thread, so bind the cache here
+            cache = export_cache()
+    
+            def read_export() -> bytes:
+                cache.served(ekey)
+                with open(path, "rb") as f:
+                    return f.read()
+    
+            st.download_button(f"Download {label}", data=read_export, file_name=file_name,
+                               mime=FORMATS[fmt][0], key=f"download_{key}", on_click="ignore")
     
     # -------------------------------
     # Load data
     # -------------------------------
-    with st.spinner("Loading inspection data..."):
-        df_inspect = load_csv_from_gsheet(GSHEET_CSV_URL)
-    
-    # ---------------------------------------
-    # 🐄 LOAD & RENAME STATIC DATA
-    # ---------------------------------------
-    static_df = load_static_local(LOCAL_STATIC_PATH)
-    
-    if not static_df.empty:
-        # --- Normalize column headers ---
-        static_df.columns = static_df.columns.str.strip()
-    
-        # --- Rename Hindi → English (based on your actual file structure) ---
-        STATIC_COL_RENAME = {
-            "विकास खंड या नगर निकाय": "block_ulb_base",
-            "गांव / गोवंश आश्रय स्थल का प्रकार": "shelter_category_base",
-            "गांव / गोवंश आश्रय स्थल का नाम": "shelter_name_base",
-            "गोवंश संरक्षित की क्षमता": "shelter_capacity_base",
-            "संरक्षित गोंवंश": "protected_cattle_base",
-            "ईअर टेगिंग की संख्या": "ear_tag_count_base",
-            "बधियाकरण" : "count_castaration_base",
-            "मृत पशुओं की संख्या" : "count_dead_animal_base",
-            "कृत्रिम गर्भाधान": "count_artificial_insemination_base",
-            "सुपर्दगी गोवंश" : "count_sahbhagita_animals_base",
-            "लाभार्थियों की संख्या" : "count_sahbhagita_beneficiary_base",
-            "GPS Location": "gps_location_base",
-        }
-    
-        # --- Apply renaming safely ---
-        present_static_map = {k: v for k, v in STATIC_COL_RENAME.items() if k in static_df.columns}
-        static_df.rename(columns=present_static_map, inplace=True)
-    
-        # --- Clean and standardize ---
-        for col in ["block_name_static", "shelter_name_static", "shelter_category"]:
-            if col in static_df.columns:
-                static_df[col] = (
-                    static_df[col]
-                    .astype(str)
-                    .str.strip()
-                    .str.lower()
-                    .replace("nan", None)
-                )
+    with st.spinner("Loading inspection data..."), trace.stage("load_inspection", cache="load_inspection_sheets") as rec:
+        try:
+            raw_inspect, inspect_fingerprint, source_reports = load_inspection_sheets(SOURCES_PATH)
+        except Exception as e:
+            st.error(f"Failed to load Google Sheet CSV: {e}")
+            raw_inspect, inspect_fingerprint, source_reports = pd.DataFrame(), None, []
+        rec["rows"] = len(raw_inspect)
     
-        # --- Display preview ---
-        #st.success("✅ Static data loaded and renamed successfully!")
-        # st.dataframe(static_df.head(10))
-    else:
-        st.warning("⚠️ No local static file found or it’s empty.")
+    # offline sources keep serving their last good snapshot; say how old it is
+    def source_age(r):
+        return datetime.now().timestamp() - r["synced_at"] if r.get("synced_at") else None
     
-    # -------------------------------
-    # Data prep
-    # -------------------------------
-    if df_inspect.empty:
-        st.warning("Inspection data not loaded. Check Google Sheet ID or network.")
-    else:
-        # rename inspection columns
-        df_inspect = safe_rename(df_inspect, COL_RENAME)
-        df_inspect = ensure_date_col(df_inspect)
+    failed_sources = [r for r in source_reports if not r["ok"]]
+    if failed_sources:
+        st.warning("Some inspection sheets could not be refreshed: " + "; ".join(
+            f"{r['source']} ({'showing copy from ' + format_age(source_age(r)) + ' ago' if r['state'] == 'offline' else 'not loaded'}: {r.get('error')})"
+            for r in failed_sources))
     
-        # clean string columns
-        prefix_cols_lower(df_inspect, ["block_name_static", "shelter_name_static", "shelter_category", "officer_name"])
+    with trace.stage("load_static", cache="load_static_local") as rec:
+        raw_static, static_fingerprint = load_static_local(LOCAL_STATIC_PATH)
+        rec["rows"] = len(raw_static)
     
-        # drop duplicate columns if any
-        df_inspect = df_inspect.loc[:, ~df_inspect.columns.duplicated()]
+    # -------------------------------
+    # Data prep (runs once per data version, see data_prep.py)
+    # -------------------------------
+    with trace.stage("prep_static", cache="prepared_static", rows=len(raw_static)):
+        static_df = prepared_static(prep_key(static_fingerprint), raw_static)
+    if static_df.empty:
+        st.warning("⚠️ No local static file found or it’s empty.")
     
-        # numeric conversions for typical KPIs if present
-        for c in ["available_cattle", "protected_cattle_static", "ear_tag_count_static",
-                  "sick_animal_count", "dead_animals_count_static", "total_eartagged_cattle"]:
-            if c in df_inspect.columns:
-                df_inspect[c] = pd.to_numeric(df_inspect[c], errors="coerce")
+    # jurisdiction of this user: None = state-wide, else the blocks (of their blocks / districts) they may see
+    user_scope = users.scope(username, admin=username in ADMIN_USERS)
+    store = None
+    scope_blocks = None
+    running = None
+    inspect_version = prep_key(inspect_fingerprint)
+    with trace.stage("prep_inspection", cache="scoped_inspection" if user_scope else
+                     "inspection_store" if USE_QUERY_STORE else "prepared_inspection", rows=len(raw_inspect)):
+        if user_scope is not None:
+            # scoped users never load the state-wide frame (nor the query store)
+            parts = block_partitions(inspect_version, raw_inspect) if inspect_fingerprint else None
+            scope_blocks = parts.resolve(*user_scope) if parts is not None else ()
+            inspect_version = f"{inspect_version}|{scope_key(scope_blocks)}"
+            df_inspect = scoped_inspection(inspect_version, parts, scope_blocks) if parts is not None else pd.DataFrame()
+        elif USE_QUERY_STORE and inspect_fingerprint:
+            store = inspection_store(f"{prep_key(inspect_fingerprint)}|{prep_key(static_fingerprint)}", raw_inspect, static_df)
+            df_inspect = store.schema_frame()  # no rows: columns / dtypes only
+        else:
+            df_inspect = prepared_inspection(prep_key(inspect_fingerprint), raw_inspect) if inspect_fingerprint else raw_inspect
+    if user_scope is None and store is None and inspect_fingerprint:
+        # state-wide only: scoped users get their own cube over their blocks' rows
+        with trace.stage("running_aggregates", cache="running_aggregates", rows=len(raw_inspect)) as rec:
+            running = running_aggregates(inspect_version, prep_key(static_fingerprint), raw_inspect,
+                                         static_df["shelter_name_base"] if "shelter_name_base" in static_df.columns else None,
+                                         {r["source"]: r.get("generation") for r in source_reports if r.get("rows")})
+            rec["mode"], rec["new_rows"] = running.last_update["mode"], running.last_update["new_rows"]
+    if user_scope is not None and not any(user_scope):
+        st.warning("No blocks / districts are assigned to your account yet. Ask an administrator for access.")
+    elif user_scope is not None and not scope_blocks:
+        st.warning("No inspection data for your jurisdiction (blocks / districts assigned to your account).")
+    elif (store.rows if store is not None else len(df_inspect)) == 0:
+        st.warning("Inspection data not loaded. Check Google Sheet ID or network.")
     
-    # static data rename & cleanup if present
-    if not static_df.empty:
-        static_df = safe_rename(static_df, COL_RENAME)
-        prefix_cols_lower(static_df, ["block_name_static", "shelter_name_static", "shelter_category"])
-        static_df = static_df.loc[:, ~static_df.columns.duplicated()]
+    # date-sorted rows + per-value positions for the global filters (see filter_index.py);
+    # the query store answers the same calls with indexed SQL
+    with trace.stage("filter_index", cache="inspection_filter_index", rows=len(df_inspect)):
+        if store is not None:
+            fidx = store
+        else:
+            fidx = inspection_filter_index(inspect_version, df_inspect) if not df_inspect.empty else None
     
     # -------------------------------
     # Global filter options (available to all tabs)
     # -------------------------------
     blocks = []
-    if "block_name_static" in df_inspect.columns:
-        blocks = sorted(df_inspect["block_name_static"].dropna().unique().tolist())
+    if fidx is not None and "block_name_static" in df_inspect.columns:
+        blocks = fidx.options("block")
+    elif user_scope is not None:
+        blocks = list(scope_blocks)
     elif not static_df.empty and "block_name_static" in static_df.columns:
         blocks = sorted(static_df["block_name_static"].dropna().unique().tolist())
     
     shelter_types = []
-    if "shelter_category" in df_inspect.columns:
-        shelter_types = sorted(df_inspect["shelter_category"].dropna().unique().tolist())
+    if fidx is not None and "shelter_category" in df_inspect.columns:
+        shelter_types = fidx.options("shelter_type")
     elif not static_df.empty and "shelter_category" in static_df.columns:
         shelter_types = sorted(static_df["shelter_category"].dropna().unique().tolist())
     
     officers = []
-    if "officer_name" in df_inspect.columns:
-        officers = sorted(df_inspect["officer_name"].dropna().unique().tolist())
+    if fidx is not None:
+        officers = fidx.options("officer")
     
     # -------------------------------
     # TOP-FILTERS (placed inline above tabs)
     # -------------------------------
     st.title("🐄 Goshala Inspection Dashboard — Government of Uttar Pradesh")
+    ages = [source_age(r) for r in source_reports if r.get("synced_at")]
+    if ages:
+        st.caption(f"Inspection data last synced {format_age(max(ages))} ago")
     st.markdown("### Filters (apply to all tabs)")
     
     # Date range global - use df_inspect date column if available
-    if "date" in df_inspect.columns:
-        min_date = pd.to_datetime(df_inspect["date"], errors="coerce").min()
-        max_date = pd.to_datetime(df_inspect["date"], errors="coerce").max()
-    else:
+    min_date, max_date = fidx.date_bounds() if fidx is not None else (None, None)
+    if min_date is None:
         min_date = date.today()
         max_date = date.today()
     
@@ -472,28 +396,50 @@ else:
     refresh_btn = col_f.button("Refresh Data")
     
     if refresh_btn:
-        st.error("rerun button error")
-        #st.experimental_rerun()
-    
-    # Apply global date + block + type + officer filters to create df_base used across tabs
-    if not df_inspect.empty:
-        df_base = df_inspect.copy()
-        # apply date filter
-        if start_date:
-            df_base = df_base[pd.to_datetime(df_base["date"], errors="coerce") >= pd.to_datetime(start_date)]
-        if end_date:
-            df_base = df_base[pd.to_datetime(df_base["date"], errors="coerce") <= pd.to_datetime(end_date)]
-        # block filter
-        if selected_block != "All" and "block_name_static" in df_base.columns:
-            df_base = df_base[df_base["block_name_static"] == selected_block]
-        # shelter type
-        if selected_type != "All" and "shelter_category" in df_base.columns:
-            df_base = df_base[df_base["shelter_category"] == selected_type]
-        # officer
-        if selected_officer != "All" and "officer_name" in df_base.columns:
-            df_base = df_base[df_base["officer_name"] == selected_officer]
-    else:
-        df_base = pd.DataFrame()
+        # force a sheet sync, then rerun against the refreshed snapshot
+        load_inspection_sheets.clear()
+        load_inspection_sheets(SOURCES_PATH, force=True)
+        st.rerun()
+    
+    # Apply global date + block + type + officer filters to create df_base used across tabs:
+    # a binary-search date slice intersected with the precomputed value positions.
+    # With the query store df_base has no rows (columns / dtypes only): the views that
+    # need rows read them through base_rows(), the others only aggregate in SQL
+    filter_state = {"start": start_date, "end": end_date, "block": selected_block,
+                    "shelter_type": selected_type, "officer": selected_officer}
+    with trace.stage("global_filter", cache="aggregation_service") as rec:
+        if store is not None:
+            agg_service = store
+            df_base = df_inspect
+            n_base = store.count(filter_state)
+        elif fidx is not None:
+            agg_service = aggregation_service(inspect_version, fidx, running.cube() if running is not None else None)
+            df_base = agg_service.filtered(filter_state)
+            n_base = len(df_base)
+        else:
+            df_base = pd.DataFrame()
+            n_base = 0
+        rec["rows"] = n_base
+    
+    def base_rows(columns=None) -> pd.DataFrame:
+        # rows matching the global filters (only the given columns with the query store, memoized there)
+        return store.filtered(filter_state, columns) if store is not None else df_base
+    
+    def base_values(col: str, equals=None) -> pd.Series:
+        # distinct values of col in the rows matching the global filters and the {column: value} equals
+        # (SELECT DISTINCT with the query store: no rows are read)
+        if store is not None:
+            return store.distinct(col, filter_state, equals)
+        return pd.Series(base_sample([col], equals, n=None)[col].dropna().unique())
+    
+    def base_sample(columns, equals=None, n=50) -> pd.DataFrame:
+        # the first n rows (all with n=None) matching the global filters and the equals
+        if store is not None:
+            return store.filtered(filter_state, columns, limit=n, equals=equals)
+        rows = df_base
+        for col, value in (equals or {}).items():
+            rows = rows[rows[col].astype(str) == value]
+        return rows[[c for c in columns if c in rows.columns]].head(n) if n is not None else rows
     
     # helper: which columns to present often
     def cols_for_table():
@@ -504,19 +450,70 @@ else:
         cols = [c for c in dict.fromkeys(cols) if c in df_base.columns]
         return cols
     
+    # paginated table: sorting / column selection happen here, only one page goes to the browser
+    def paged_table(df: pd.DataFrame, columns, key: str, sort_by: str = "date", ascending: bool = False,
+                    choose_columns: bool = False, filters=None):
+        # with the query store, df is the zero-row schema frame and the page is read with LIMIT / OFFSET
+        paged_sql = store is not None and filters is not None
+        if choose_columns:
+            columns = st.multiselect("Columns", list(df.columns), default=columns, key=f"{key}_cols") or columns
+        sortable = [c for c in columns if c in df.columns]
+        t1, t2, t3 = st.columns([3, 2, 2])
+        sort_col = t1.selectbox("Sort by", sortable, index=sortable.index(sort_by) if sort_by in sortable else 0,
+                                key=f"{key}_sort")
+        order = t2.radio("Order", ["Descending", "Ascending"], index=1 if ascending else 0, horizontal=True,
+                         key=f"{key}_order")
+        n_pages = max(1, -(-(store.count(filters) if paged_sql else len(df)) // PAGE_SIZE))
+        page = t3.number_input("Page", min_value=1, max_value=n_pages, value=1, step=1, key=f"{key}_page")
+        if paged_sql:
+            rows, total, n_pages = store.page(filters, columns, sort_col, order == "Ascending", page, PAGE_SIZE)
+        else:
+            rows, total, n_pages = get_page(df, columns, sort_col, order == "Ascending", page, PAGE_SIZE)
+        st.dataframe(rows)
+        first = (page - 1) * PAGE_SIZE + 1 if total else 0
+        st.caption(f"Rows {first}–{min(page * PAGE_SIZE, total)} of {total} (page {page} of {n_pages})")
+    
+    # KPI trend chart: granularity + rolling window, served from the daily totals (see time_series.py)
+    def kpi_trend(kpi: str, filters: dict, key: str, title: str):
+        t1, t2 = st.columns([3, 2])
+        freq = t1.radio("Granularity", list(FREQUENCIES), horizontal=True, key=f"{key}_freq")
+        rolling = t2.slider("Rolling average (periods)", 1, 12, 1, key=f"{key}_rolling")
+        with trace.stage("trend", accumulate=True) as rec:
+            trend = agg_service.trend(kpi, filters, freq=FREQUENCIES[freq], rolling=rolling)
+            rec["rows"] = len(trend)
+        fig = px.line(trend, x="date", y=list(trend.columns[1:]), title=title, markers=len(trend) <= 120)
+        plotly_chart(fig, use_container_width=True)
+        return trend
+    
     # -------------------------------
-    # Tabs
+    # Views
     # -------------------------------
-    tabs = st.tabs(["Overview", "Jurisdiction", "Officer", "KPI Groups", "Map", "Leaderboards"])
+    # Only the selected view runs: st.tabs would execute (and build figures for)
+    # all six bodies on every rerun, even the ones nobody is looking at.
+    VIEWS = ["Overview", "Jurisdiction", "Officer", "KPI Groups", "Map", "Leaderboards"]
+    active_view = st.radio("View", VIEWS, horizontal=True, key="active_view", label_visibility="collapsed")
+    trace.context["view"] = active_view
+    trace.begin(f"view:{active_view}", rows=n_base)
+    
+    # figure serialisation is timed as one accumulated "figures" stage
+    def plotly_chart(fig, **kwargs):
+        with trace.stage("figures", accumulate=True):
+            st.plotly_chart(fig, **kwargs)
     
     # -------------------------------
     # TAB 1: Overview
     # -------------------------------
-    with tabs[0]:
+    if active_view == "Overview":
         st.header("📅 Overview — Last Inspections")
     
-        df_range = df_base.copy()
-        if df_range.empty:
+        # columns / dtypes only: coverage and the local filters below work on distinct values
+        # (base_values) and only the sample tables read rows
+        df_range = df_base
+        range_cols = [c for c in ["date", "shelter_name_static", "shelter_name", "village_name_static", "village_name",
+                                  "shelter_category_base", "shelter_category", "shelter_category_static",
+                                  "block_ulb_base", "block_name_static", "block_name", "block_ulb",
+                                  "officer_name", "inspector_name", "officer"] if c in df_range.columns]
+        if n_base == 0:
             st.info("No inspection rows in selected filters/date range.")
         else:
             # --- Ensure static and inspection datasets are harmonized ---
@@ -525,20 +522,8 @@ else:
             # 🧭 OVERVIEW — Static vs Inspection Coverage (Fixed)
             # ===================================================
     
-            import re
-            from difflib import get_close_matches
-    
             st.subheader("📊 Inspection Coverage Summary")
     
-            # --- Helper: normalize shelter names ---
-            def normalize_name(x):
-                if pd.isna(x):
-                    return None
-                s = str(x).strip().lower()
-                s = re.sub(r"[^\w\s]", " ", s)
-                s = re.sub(r"\s+", " ", s).strip()
-                return s if s else None
-    
             # --- Detect available columns ---
             inspect_col = None
             for c in ["shelter_name_static", "shelter_name", "village_name_static"]:
@@ -556,39 +541,14 @@ else:
                     static_col = c
                     break
     
-            # --- Normalize names ---
-            if static_col and not static_df.empty:
-                static_df["_norm_shelter"] = static_df[static_col].map(normalize_name)
-                static_unique = static_df["_norm_shelter"].dropna().unique().tolist()
-            else:
-                static_unique = []
-    
-            if inspect_col and not df_range.empty:
-                df_range["_norm_shelter"] = df_range[inspect_col].map(normalize_name)
-                inspected_unique = df_range["_norm_shelter"].dropna().unique().tolist()
+            # --- Coverage computation (indexed matcher, see shelter_matching.py) ---
+            if static_col and inspect_col and not static_df.empty:
+                cov = coverage_for(base_values(inspect_col), inspect_col, static_col)
+                total_shelters = cov["total"]
+                inspected_total = cov["inspected"]
+                coverage = cov["coverage"]
             else:
-                inspected_unique = []
-    
-            # --- Coverage computation ---
-            if static_unique:
-                total_shelters = len(static_unique)
-                # Direct matches
-                matched = [s for s in inspected_unique if s in static_unique]
-                direct_count = len(matched)
-    
-                # Fuzzy match fallback for slightly different names
-                unmatched = [s for s in inspected_unique if s not in static_unique]
-                fuzzy_matched = []
-                for s in unmatched:
-                    close = get_close_matches(s, static_unique, n=1, cutoff=0.75)
-                    if close:
-                        fuzzy_matched.append((s, close[0]))
-    
-                fuzzy_count = len(set([x[1] for x in fuzzy_matched]))
-                inspected_total = direct_count + fuzzy_count
-                coverage = round((inspected_total / total_shelters) * 100, 2)
-            else:
-                total_shelters = len(inspected_unique)
+                total_shelters = int(normalize_names(base_values(inspect_col)).dropna().nunique()) if inspect_col else 0
                 inspected_total = total_shelters
                 coverage = 100.0
     
@@ -602,16 +562,12 @@ else:
             #with st.expander("🔎 View Matching Debug Info"):
                 #st.write(f"Static shelter column used: `{static_col}`")
                 #st.write(f"Inspection shelter column used: `{inspect_col}`")
-                #st.write(f"Direct matches: {direct_count}, Fuzzy matches: {fuzzy_count}")
+                #st.write(f"Direct matches: {cov['exact']}, Fuzzy matches: {cov['fuzzy']}")
                 #st.write(f"Total inspected (effective): {inspected_total}")
-                #if fuzzy_matched:
-                    #st.dataframe(pd.DataFrame(fuzzy_matched, columns=["inspected_norm", "static_norm_match"]).head(10))
     
             
     
             # ===== Replacement: Interactive pie chart (robust column detection) =====
-            import altair as alt
-            import re
             from typing import Optional
     
             st.subheader("🥧 Inspection Coverage by Type / Jurisdiction / Officer (robust)")
@@ -641,7 +597,7 @@ else:
             # --- build dropdown options safely ---
             def safe_options(df: pd.DataFrame, col: Optional[str]):
                 if col and col in df.columns:
-                    vals = sorted(pd.Series(df[col].dropna().astype(str)).unique().tolist())
+                    vals = sorted(base_values(col).astype(str).unique().tolist())
                     return ["All"] + vals if vals else ["All"]
                 return ["All"]
     
@@ -654,45 +610,19 @@ else:
             selected_block = c2.selectbox("Jurisdiction (Block / ULB)", options=block_options, index=0, key="ov_block_select")
             selected_officer = c3.selectbox("Inspection Officer", options=officer_options, index=0, key="ov_officer_select")
     
-            # --- apply filters to df_range copy ---
-            df_filtered = df_range.copy()
-            if selected_type != "All" and type_col:
-                df_filtered = df_filtered[df_filtered[type_col].astype(str) == selected_type]
-            if selected_block != "All" and block_col:
-                df_filtered = df_filtered[df_filtered[block_col].astype(str) == selected_block]
-            if selected_officer != "All" and officer_col:
-                df_filtered = df_filtered[df_filtered[officer_col].astype(str) == selected_officer]
-    
-            # --- normalize names helper ---
-            def normalize_name(x):
-                if pd.isna(x):
-                    return None
-                s = str(x).strip().lower()
-                s = re.sub(r"[^\w\s]", " ", s)
-                s = re.sub(r"\s+", " ", s).strip()
-                return s if s else None
-    
-            # --- lists for matching ---
-            if static_shelter_col and static_df is not None and not static_df.empty:
-                static_df["_norm_shelter"] = static_df[static_shelter_col].map(normalize_name)
-                static_unique = [s for s in static_df["_norm_shelter"].dropna().unique()]
-            else:
-                static_unique = []
-    
-            if inspect_shelter_col and not df_filtered.empty:
-                df_filtered["_norm_shelter"] = df_filtered[inspect_shelter_col].map(normalize_name)
-                inspected_unique = [s for s in df_filtered["_norm_shelter"].dropna().unique()]
-            else:
-                inspected_unique = []
+            # --- local filters, applied on top of the global ones ---
+            local_equals = {col: value for col, value in ((type_col, selected_type), (block_col, selected_block),
+                                                          (officer_col, selected_officer)) if col and value != "All"}
     
-            # --- compute counts ---
-            if static_unique:
-                total_shelters = len(static_unique)
-                inspected_count = len([s for s in inspected_unique if s in static_unique])
+            # --- compute counts (same match table as the summary above) ---
+            if static_shelter_col and inspect_shelter_col:
+                cov_f = coverage_for(base_values(inspect_shelter_col, local_equals), inspect_shelter_col, static_shelter_col)
+                total_shelters = cov_f["total"]
+                inspected_count = cov_f["inspected"]
                 not_inspected = max(total_shelters - inspected_count, 0)
             else:
                 # fallback: use unique inspected as total (no static available)
-                total_shelters = len(inspected_unique)
+                total_shelters = int(normalize_names(base_values(inspect_shelter_col, local_equals)).dropna().nunique()) if inspect_shelter_col else 0
                 inspected_count = total_shelters
                 not_inspected = 0
     
@@ -728,46 +658,28 @@ else:
                 st.write(f"Inspected (effective): {inspected_count}")
                 st.write(f"Not inspected: {not_inspected}")
                 st.write("Inspection rows (sample):")
-                st.dataframe(df_filtered[[inspect_shelter_col, type_col, block_col, officer_col]].head(50) if inspect_shelter_col else df_filtered.head(50))
+                sample_cols = [c for c in (inspect_shelter_col, type_col, block_col, officer_col) if c] if inspect_shelter_col else range_cols
+                st.dataframe(base_sample(sample_cols, local_equals, n=50))
+                if running is not None:
+                    # whole history, independent of the filters: longest-unvisited shelters first
+                    st.write("Last inspection per shelter (all time):")
+                    st.dataframe(running.seen("shelter").sort_values("last_date").head(50))
     
             # KPI group quick summary (small table + selectable KPI)
             st.subheader("KPI Group Quick Summary")
+            report_charts = []
             group_choice = st.selectbox("Choose KPI Group", list(KPI_GROUPS.keys()), key="overview_group_choice")
-            kpi_cols = [c for c in KPI_GROUPS[group_choice] if c in df_range.columns]
+            kpi_cols = [c for c in KPI_GROUPS[group_choice] if c in df_base.columns]
             if kpi_cols:
-                # convert numeric ones
-                numeric = []
-                for c in kpi_cols:
-                    is_num = pd.api.types.is_numeric_dtype(df_range[c])
-                    if not is_num and df_range[c].dtype == "object":
-                        try:
-                            is_num = df_range[c].dropna().astype(str).str.replace(".", "", regex=False).str.isnumeric().any()
-                        except Exception:
-                            is_num = False
-                    if is_num:
-                        try:
-                            df_range[c] = pd.to_numeric(df_range[c], errors="coerce")
-                        except Exception:
-                            pass
-    
-                    
-                    
-                        try:
-                            df_range[c] = pd.to_numeric(df_range[c], errors="coerce")
-                        except:
-                            pass
-                    if pd.api.types.is_numeric_dtype(df_range[c]):
-                        numeric.append(c)
+                # column types are fixed by the schema (schema.py), no guessing here
+                numeric = numeric_cols(df_base, kpi_cols)
                 if numeric:
-                    kpi_summary = df_range[numeric].agg(["count", "mean", "sum"]).T.reset_index().rename(columns={"index": "kpi"})
+                    kpi_summary = agg_service.summary(numeric, ("count", "mean", "sum"), filter_state)
                     st.dataframe(kpi_summary)
                     sel_kpi = st.selectbox("Select KPI to plot (Overview)", numeric, key="overview_kpi_plot")
-                    # trend over time - mean per date
-                    trend = df_range.copy()
-                    trend["date"] = pd.to_datetime(trend["date"])
-                    trend_k = trend.groupby("date")[sel_kpi].mean().reset_index()
-                    fig = px.line(trend_k, x="date", y=sel_kpi, title=f"Trend: {sel_kpi}", markers=True)
-                    st.plotly_chart(fig, use_container_width=True)
+                    # trend over time - mean per day / week / month / quarter
+                    trend_k = kpi_trend(sel_kpi, filter_state, "overview_trend", f"Trend: {sel_kpi}")
+                    report_charts.append({"title": f"Trend: {sel_kpi}", "data": trend_k, "x": "date", "y": sel_kpi})
                 else:
                     st.info("No numeric KPIs in selected group for current filters.")
             else:
@@ -776,72 +688,37 @@ else:
             # show sample rows and allow CSV export
             st.subheader("Filtered inspection rows (sample)")
             showc = cols_for_table()
-            st.dataframe(df_range[showc].sort_values(by="date", ascending=False).reset_index(drop=True).head(200))
-            csv = df_range.to_csv(index=False).encode("utf-8")
-            st.download_button("Download filtered CSV", data=csv, file_name="goshala_inspections_filtered.csv", mime="text/csv")
+            paged_table(df_base, showc, key="overview_rows", filters=filter_state)
+            export_download("filtered CSV", base_rows, "csv", "goshala_inspections_filtered.csv", filter_state, key="overview_csv")
     
             # PDF generation (Overview includes link to generate full PDF across all tabs)
             st.markdown("### Reports")
+            # the report is built in the background; identical requests share one job
+            report_spec = {
+                "title": "🐄 Goshala Inspection Dashboard — Government of Uttar Pradesh",
+                "start": str(start_date),
+                "end": str(end_date),
+                "filters": {"Block": filter_state["block"], "Type": filter_state["shelter_type"],
+                            "Officer": filter_state["officer"]},
+                "metrics": [("Total shelters", total_shelters or None), ("Inspected (filters)", inspected_total),
+                            ("Coverage (%)", coverage)],
+                "charts": report_charts,
+                "table": sample_table(base_sample(range_cols, n=10)),
+            }
+            rkey = report_key(inspect_version, filter_key(filter_state), report_spec)
             if st.button("Generate PDF Report (all tabs)"):
-                with st.spinner("Generating PDF. This may take a few seconds..."):
-                    # Build PDF (fpdf)
-                    pdf = FPDF(orientation="P", unit="mm", format="A4")
-                    pdf.set_auto_page_break(auto=True, margin=10)
-                    # Title page
-                    pdf.add_page()
-                    pdf.set_font("Arial", "B", 14)
-                    pdf.cell(0, 8, "🐄 Goshala Inspection Dashboard — Government of Uttar Pradesh", ln=True)
-                    pdf.ln(4)
-                    pdf.set_font("Arial", size=10)
-                    pdf.cell(0, 6, f"Date range: {start_date} to {end_date}", ln=True)
-                    pdf.cell(0, 6, f"Filters: Block={selected_block} | Type={selected_type} | Officer={selected_officer}", ln=True)
-                    pdf.ln(6)
-    
-                    # Overview metrics
-                    pdf.set_font("Arial", "B", 12)
-                    pdf.cell(0, 6, "Overview Summary", ln=True)
-                    pdf.set_font("Arial", size=10)
-                    pdf.cell(0, 6, f"Total shelters: {total_shelters or 'N/A'}", ln=True)
-                    pdf.cell(0, 6, f"Inspected (filters): {inspected}", ln=True)
-                    pdf.cell(0, 6, f"Coverage (%): {coverage if coverage is not None else 'N/A'}", ln=True)
-                    pdf.ln(6)
-    
-                    # Add timeline chart as image
-                    try:
-                        img_bytes = None
-                        if 'fig' in locals():
-                            img_bytes = fig.to_image(format="png", scale=2)
-                        if img_bytes:
-                            tmp = BytesIO(img_bytes)
-                            pdf.image(tmp, w=180)
-                    except Exception:
-                        pass
-    
-                    # Add small table as CSV snippet
-                    try:
-                        sample_csv = df_range.head(10).to_csv(index=False)
-                        pdf.set_font("Arial", size=9)
-                        pdf.ln(6)
-                        pdf.multi_cell(0, 5, sample_csv)
-                    except Exception:
-                        pass
-    
-                    # Watermark / footer
-                    pdf.set_y(-20)
-                    pdf.set_font("Arial", size=8)
-                    pdf.cell(0, 5, "Auto-generated via Goshala Analytics, © 2025 Government of Uttar Pradesh", ln=True, align="C")
-    
-                    # deliver PDF
-                    pdf_bytes = pdf.output(dest="S").encode("latin-1")
-                    st.download_button("Download PDF report", data=pdf_bytes, file_name=pdf_filename(), mime="application/pdf")
+                report_queue().submit(rkey, report_spec)
+            job = report_queue().get(rkey)
+            polling = job is not None and not job.finished
+            st.fragment(report_status, run_every=2 if polling else None)(rkey, polling)
     
     # -------------------------------
     # TAB 2: Jurisdiction Performance
     # -------------------------------
-    with tabs[1]:
+    if active_view == "Jurisdiction":
         st.header("🏢 Jurisdiction Performance")
-        df_f = df_base.copy()
-        if df_f.empty:
+        df_f = df_base  # columns / dtypes only: the numbers below are aggregates
+        if n_base == 0:
             st.info("No data for selected filters.")
         else:
             sub = st.radio("View:", ["By KPI Group", "By Specific KPI", "By Officer"], horizontal=True, key="juris_view_mode")
@@ -853,17 +730,13 @@ else:
                     st.info("No KPI columns from this group found in filtered data.")
                 else:
                     # numeric KPI columns
-                    numeric_k = []
-                    for c in kcols:
-                        df_f[c] = pd.to_numeric(df_f[c], errors="coerce")
-                        if pd.api.types.is_numeric_dtype(df_f[c]):
-                            numeric_k.append(c)
+                    numeric_k = numeric_cols(df_f, kcols)
                     if not numeric_k:
                         st.info("No numeric KPIs in this group.")
                     else:
                         # compute means by block
                         if "block_name_static" in df_f.columns:
-                            agg = df_f.groupby("block_name_static")[numeric_k].mean().reset_index()
+                            agg = agg_service.aggregate("block", numeric_k, "mean", filter_state)
                             st.dataframe(agg)
                             sel_kpi = st.selectbox("Select KPI to visualize", numeric_k, key="juris_group_kpi_select")
                             # heatmap using plotly
@@ -871,22 +744,20 @@ else:
                             heat["rank"] = heat[sel_kpi].rank(method="dense", ascending=False)
                             fig = px.bar(heat.sort_values(sel_kpi, ascending=False), x="block_name_static", y=sel_kpi,
                                          color=sel_kpi, color_continuous_scale="Viridis")
-                            st.plotly_chart(fig, use_container_width=True)
+                            plotly_chart(fig, use_container_width=True)
                         else:
                             st.info("No block column available for grouping.")
     
             elif sub == "By Specific KPI":
                 # choose KPI from all KPI groups
-                all_kpis = sorted(list({c for group in KPI_GROUPS.values() for c in group if c in df_f.columns}))
+                all_kpis = all_numeric_kpis(df_f)
                 if not all_kpis:
                     st.info("No KPI columns available in filtered data.")
                 else:
                     sel_kpi = st.selectbox("Select KPI", all_kpis, key="juris_specific_kpi")
-                    # ensure numeric
-                    df_f[sel_kpi] = pd.to_numeric(df_f[sel_kpi], errors="coerce")
                     # group by block
                     if "block_name_static" in df_f.columns:
-                        agg = df_f.groupby("block_name_static")[[sel_kpi]].mean().reset_index().sort_values(by=sel_kpi, ascending=False)
+                        agg = agg_service.aggregate("block", sel_kpi, "mean", filter_state).sort_values(by=sel_kpi, ascending=False)
                         # interactive bar with altair
                         sel = alt.selection_single(on="click", fields=["block_name_static"], empty="all")
                         chart = alt.Chart(agg).mark_bar().encode(
@@ -905,41 +776,38 @@ else:
                     st.info("No officer data available.")
                 else:
                     group = st.selectbox("Select KPI Group", list(KPI_GROUPS.keys()), key="juris_by_officer_group")
-                    kcols = [c for c in KPI_GROUPS[group] if c in df_f.columns]
-                    numeric_k = []
-                    for c in kcols:
-                        df_f[c] = pd.to_numeric(df_f[c], errors="coerce")
-                        if pd.api.types.is_numeric_dtype(df_f[c]):
-                            numeric_k.append(c)
+                    numeric_k = numeric_cols(df_f, KPI_GROUPS[group])
                     if not numeric_k:
                         st.info("No numeric KPIs in this group.")
                     else:
-                        agg = df_f.groupby("officer_name")[numeric_k].mean().reset_index()
+                        agg = agg_service.aggregate("officer", numeric_k, "mean", filter_state)
                         st.dataframe(agg)
                         sel_k = st.selectbox("Select KPI to plot", numeric_k, key="juris_officer_kpi")
                         fig = px.bar(agg.sort_values(sel_k, ascending=False), x="officer_name", y=sel_k, color=sel_k, color_continuous_scale="Plasma")
-                        st.plotly_chart(fig, use_container_width=True)
+                        plotly_chart(fig, use_container_width=True)
     
     # -------------------------------
     # TAB 3: Officer Performance
     # -------------------------------
-    with tabs[2]:
+    if active_view == "Officer":
         st.header("👮 Officer Performance")
-        df_o = df_base.copy()
-        if df_o.empty:
+        df_o = df_base  # columns / dtypes only: the numbers below are aggregates
+        if n_base == 0:
             st.info("No data for selected filters.")
         else:
             if "officer_name" not in df_o.columns:
                 st.info("Officer column missing.")
             else:
-                officer_options = ["All"] + sorted(df_o["officer_name"].dropna().unique().tolist())
+                officers_in_range = agg_service.aggregate("officer", stat="size", filters=filter_state)["officer_name"]
+                officer_options = ["All"] + sorted(officers_in_range.astype(str).tolist())
                 chosen_officer = st.selectbox("Select Officer", officer_options, key="officer_tab_select")
-                df_o2 = df_o.copy()
+                df_o2 = df_o
+                officer_filters = dict(filter_state)
                 if chosen_officer != "All":
-                    df_o2 = df_o2[df_o2["officer_name"] == chosen_officer]
+                    officer_filters["officer"] = chosen_officer
     
                 # inspections count per officer
-                count_tbl = df_o2.groupby("officer_name").size().reset_index(name="Inspections").sort_values("Inspections", ascending=False)
+                count_tbl = agg_service.aggregate("officer", stat="size", filters=officer_filters).sort_values("Inspections", ascending=False)
                 if not count_tbl.empty:
                     sel = alt.selection_single(on="click", fields=["officer_name"], empty="all")
                     bar = alt.Chart(count_tbl).mark_bar().encode(
@@ -957,38 +825,30 @@ else:
                 # KPI group performance by officer
                 st.subheader("KPI Group Performance by Officer")
                 chosen_group = st.selectbox("Select KPI Group", list(KPI_GROUPS.keys()), key="officer_group_choice")
-                kcols = [c for c in KPI_GROUPS[chosen_group] if c in df_o2.columns]
-                numeric_k = []
-                for c in kcols:
-                    df_o2[c] = pd.to_numeric(df_o2[c], errors="coerce")
-                    if pd.api.types.is_numeric_dtype(df_o2[c]):
-                        numeric_k.append(c)
+                numeric_k = numeric_cols(df_o2, KPI_GROUPS[chosen_group])
                 if numeric_k:
-                    agg = df_o2.groupby("officer_name")[numeric_k].mean().reset_index()
+                    agg = agg_service.aggregate("officer", numeric_k, "mean", officer_filters)
                     st.dataframe(agg)
                     sel_kpi = st.selectbox("Select KPI to visualize", numeric_k, key="officer_kpi_choice")
                     fig = px.bar(agg.sort_values(sel_kpi, ascending=False), x="officer_name", y=sel_kpi, color=sel_kpi, color_continuous_scale="Viridis")
-                    st.plotly_chart(fig, use_container_width=True)
+                    plotly_chart(fig, use_container_width=True)
                 else:
                     st.info("No numeric KPIs for this group and filter.")
     
                 # trend for selected officer and KPI
                 st.subheader("KPI Trend for selected officer")
                 if "date" in df_o2.columns:
-                    sel_kpi2 = st.selectbox("Select KPI for trend", [c for c in sum(KPI_GROUPS.values(), []) if c in df_o2.columns], key="officer_trend_kpi")
+                    sel_kpi2 = st.selectbox("Select KPI for trend", all_numeric_kpis(df_o2), key="officer_trend_kpi")
                     if sel_kpi2:
-                        df_o2["date"] = pd.to_datetime(df_o2["date"])
-                        trend = df_o2.groupby("date")[[sel_kpi2]].mean().reset_index()
-                        fig = px.line(trend, x="date", y=sel_kpi2, markers=True, title=f"{sel_kpi2} over time")
-                        st.plotly_chart(fig, use_container_width=True)
+                        kpi_trend(sel_kpi2, officer_filters, "officer_trend", f"{sel_kpi2} over time")
     
     # -------------------------------
     # TAB 4: KPI Groups deep dive
     # -------------------------------
-    with tabs[3]:
+    if active_view == "KPI Groups":
         st.header("📚 KPI Groups Explorer")
-        df_k = df_base.copy()
-        if df_k.empty:
+        df_k = df_base
+        if n_base == 0:
             st.info("No data for selected filters.")
         else:
             group = st.selectbox("Choose KPI Group", list(KPI_GROUPS.keys()), key="kpi_group_tab")
@@ -996,25 +856,21 @@ else:
             if not kcols:
                 st.info("No columns for this group in filtered dataset.")
             else:
-                # numeric conversion
-                for c in kcols:
-                    df_k[c] = pd.to_numeric(df_k[c], errors="coerce")
-    
                 # correlation heatmap for numeric kpis
-                numeric_cols = [c for c in kcols if pd.api.types.is_numeric_dtype(df_k[c])]
-                if numeric_cols and len(numeric_cols) > 1:
-                    corr = df_k[numeric_cols].corr().round(2)
+                numeric_k = numeric_cols(df_k, kcols)
+                if numeric_k and len(numeric_k) > 1:
+                    corr = base_rows(numeric_k)[numeric_k].corr().round(2)
                     fig = px.imshow(corr, text_auto=True, aspect="auto", title="KPI Correlation Matrix")
-                    st.plotly_chart(fig, use_container_width=True)
+                    plotly_chart(fig, use_container_width=True)
                 else:
                     st.info("Not enough numeric KPI columns for correlation matrix.")
     
                 # Radar chart (approx) per block for selected KPIs (uses normalization)
                 st.subheader("Compare blocks on selected KPIs")
-                sel_kpis = st.multiselect("Select KPIs (2-6)", numeric_cols[:6], default=numeric_cols[:4], key="kpis_radar")
+                sel_kpis = st.multiselect("Select KPIs (2-6)", numeric_k[:6], default=numeric_k[:4], key="kpis_radar")
                 if sel_kpis and len(sel_kpis) >= 2:
                     if "block_name_static" in df_k.columns:
-                        agg = df_k.groupby("block_name_static")[sel_kpis].mean().reset_index()
+                        agg = agg_service.aggregate("block", sel_kpis, "mean", filter_state)
                         # normalize each column 0-1
                         norm = agg.copy()
                         for c in sel_kpis:
@@ -1029,7 +885,7 @@ else:
                         top_blocks = norm.sort_values("avg", ascending=False).head(3)
                         for _, r in top_blocks.iterrows():
                             fig = px.line_polar(r[sel_kpis].values.reshape(1, -1), r=[float(x) for x in r[sel_kpis]], theta=sel_kpis, line_close=True)
-                            st.plotly_chart(fig, use_container_width=True)
+                            plotly_chart(fig, use_container_width=True)
                     else:
                         st.info("No block column for comparison.")
                 else:
@@ -1038,91 +894,76 @@ else:
     # -------------------------------
     # TAB 5: Interactive Map (Plotly)
     # -------------------------------
-    with tabs[4]:
+    if active_view == "Map":
         st.header("🗺️ Interactive Map")
-        df_m = df_base.copy()
-        if df_m.empty:
+        df_m = df_base  # columns / dtypes only: the rows are read below with just the columns the map needs
+        if n_base == 0:
             st.info("No data for selected filters.")
         else:
-            gps_col = None
-            if "gps_location_inspection" in df_m.columns:
-                gps_col = "gps_location_inspection"
-            elif "gps_location_static" in df_m.columns:
-                gps_col = "gps_location_static"
-    
-            if gps_col is None:
+            if "gps_valid" not in df_m.columns:
                 st.info("No GPS location column available for mapping.")
             else:
-                # parse GPS -> lat, lon
-                def parse_gps(val):
-                    try:
-                        s = str(val)
-                        s = s.replace("(", "").replace(")", "")
-                        parts = [p.strip() for p in s.split(",") if p.strip() != ""]
-                        if len(parts) >= 2:
-                            return float(parts[0]), float(parts[1])
-                    except:
-                        pass
-                    return np.nan, np.nan
-    
-                df_m["lat"], df_m["lon"] = zip(*df_m[gps_col].astype(str).map(parse_gps))
-                df_map = df_m.dropna(subset=["lat", "lon"]).copy()
+                # Choose map mode
+                map_mode = st.selectbox("Map Mode", ["Inspection coverage", "KPI Group mean", "Specific KPI"], key="map_mode")
+                if map_mode == "KPI Group mean":
+                    group = st.selectbox("Select KPI Group", list(KPI_GROUPS.keys()), key="map_group")
+                    map_kpis = numeric_cols(df_m, KPI_GROUPS[group])
+                elif map_mode == "Specific KPI":
+                    sel_kpi = st.selectbox("Select KPI for map", all_numeric_kpis(df_m), key="map_specific_kpi")
+                    map_kpis = [sel_kpi] if sel_kpi else []
+                else:
+                    map_kpis = []
+                # lat / lon are parsed and bounds-checked once in data prep (geo.py)
+                df_map = base_rows(["gps_valid", "lat", "lon", "date", "shelter_name_static", *map_kpis])
+                df_map = df_map[df_map["gps_valid"]]
                 if df_map.empty:
                     st.info("No valid GPS records found after parsing.")
                 else:
-                    # Choose map mode
-                    map_mode = st.selectbox("Map Mode", ["Inspection coverage", "KPI Group mean", "Specific KPI"], key="map_mode")
+                    # points are binned on the server into zoom-dependent grid cells (map_engine.py),
+                    # so the browser gets at most MAX_BINS markers whatever the row count
+                    mc1, mc2 = st.columns([3, 2])
+                    map_zoom = mc1.slider("Zoom / cell size", min_value=5, max_value=14, value=9, key="map_zoom")
+                    renderer = mc2.radio("Renderer", ["Plotly", "WebGL (pydeck)"], horizontal=True, key="map_renderer")
+    
+                    def show_bins(bins, value_label, low_is_good=False, **plotly_kwargs):
+                        if renderer == "WebGL (pydeck)":
+                            colors = color_ramp(-bins["value"] if low_is_good else bins["value"])
+                            st.pydeck_chart(pydeck_bins_deck(bins, map_zoom, colors, value_label=value_label))
+                        else:
+                            fig = plotly_bins_figure(bins.rename(columns={"value": value_label}), map_zoom,
+                                                     color=plotly_kwargs.pop("color", value_label), **plotly_kwargs)
+                            plotly_chart(fig, use_container_width=True)
+                        st.caption(f"{len(df_map)} inspections in {len(bins)} map cells")
+    
                     if map_mode == "Inspection coverage":
-                        # marker color = inspected (all rows shown as points) - categorize by recency or presence
-                        df_map["last_date"] = pd.to_datetime(df_map["date"])
                         # performance: inspected in selected range -> all are inspected; show recent vs older
-                        df_map["days_from_end"] = (pd.to_datetime(end_date) - df_map["last_date"]).dt.days
-                        df_map["recency_cat"] = df_map["days_from_end"].apply(lambda x: "recent" if x <= 30 else "older")
-                        fig = px.scatter_mapbox(df_map, lat="lat", lon="lon", hover_name="shelter_name_static", color="recency_cat",
-                                                color_discrete_map={"recent":"green","older":"orange"}, zoom=9, height=700)
-                        fig.update_layout(mapbox_style="open-street-map")
-                        st.plotly_chart(fig, use_container_width=True)
+                        days_from_end = (pd.to_datetime(end_date) - df_map["date"]).dt.days
+                        bins = bin_points(df_map, days_from_end, zoom=map_zoom, how="min")
+                        bins["recency_cat"] = np.where(bins["value"] <= 30, "recent", "older")
+                        show_bins(bins, "days since inspection", low_is_good=True, color="recency_cat",
+                                  color_discrete_map={"recent": "green", "older": "orange"})
                     elif map_mode == "KPI Group mean":
-                        group = st.selectbox("Select KPI Group", list(KPI_GROUPS.keys()), key="map_group")
-                        kcols = [c for c in KPI_GROUPS[group] if c in df_map.columns]
-                        # compute mean per shelter or per block (we'll do per shelter)
-                        if kcols:
-                            numeric = []
-                            for c in kcols:
-                                df_map[c] = pd.to_numeric(df_map[c], errors="coerce")
-                                if pd.api.types.is_numeric_dtype(df_map[c]):
-                                    numeric.append(c)
-                            if numeric:
-                                df_map["kpi_mean"] = df_map[numeric].mean(axis=1)
-                                # color scale
-                                fig = px.scatter_mapbox(df_map, lat="lat", lon="lon", hover_name="shelter_name_static", color="kpi_mean",
-                                                        color_continuous_scale="RdYlGn", zoom=9, height=700)
-                                fig.update_layout(mapbox_style="open-street-map")
-                                st.plotly_chart(fig, use_container_width=True)
-                            else:
-                                st.info("No numeric KPIs in selected group for mapping.")
+                        # mean of the group's KPIs per inspection, averaged per map cell
+                        if map_kpis:
+                            bins = bin_points(df_map, df_map[map_kpis].mean(axis=1), zoom=map_zoom)
+                            show_bins(bins, "kpi_mean", color_continuous_scale="RdYlGn")
                         else:
-                            st.info("No KPIs for this group present in map data.")
+                            st.info("No numeric KPIs in selected group for mapping.")
                     else:
                         # specific KPI
-                        all_kpis = sorted([c for group in KPI_GROUPS.values() for c in group if c in df_map.columns])
-                        sel_kpi = st.selectbox("Select KPI for map", all_kpis, key="map_specific_kpi")
-                        df_map[sel_kpi] = pd.to_numeric(df_map[sel_kpi], errors="coerce")
-                        if df_map[sel_kpi].dropna().empty:
+                        if not sel_kpi or df_map[sel_kpi].dropna().empty:
                             st.info("No numeric values for selected KPI.")
                         else:
-                            fig = px.scatter_mapbox(df_map, lat="lat", lon="lon", hover_name="shelter_name_static", color=sel_kpi,
-                                                    color_continuous_scale="Viridis", zoom=9, height=700)
-                            fig.update_layout(mapbox_style="open-street-map")
-                            st.plotly_chart(fig, use_container_width=True)
+                            bins = bin_points(df_map, df_map[sel_kpi], zoom=map_zoom)
+                            show_bins(bins, sel_kpi, color_continuous_scale="Viridis")
     
     # -------------------------------
     # TAB 6: Leaderboards
     # -------------------------------
-    with tabs[5]:
+    if active_view == "Leaderboards":
         st.header("🏆 Leaderboards")
-        df_l = df_base.copy()
-        if df_l.empty:
+        df_l = df_base  # columns / dtypes only: the numbers below are aggregates
+        if n_base == 0:
             st.info("No data for selection.")
         else:
             mode = st.radio("Mode", ["Cumulative", "KPI Group", "Specific KPI"], horizontal=True, key="leader_mode")
@@ -1130,32 +971,19 @@ else:
     
             if mode == "Cumulative":
                 if block_col:
-                    lb = df_l.groupby(block_col).size().reset_index(name="Inspections").sort_values("Inspections", ascending=False)
+                    lb = agg_service.top_n("block", stat="size", n=10, filters=filter_state)
                     st.subheader("Top Performing Jurisdictions (by inspection count)")
-                    st.dataframe(lb.head(10))
+                    st.dataframe(lb)
                 else:
                     st.info("No block column available.")
     
             elif mode == "KPI Group":
                 group = st.selectbox("Choose KPI Group", list(KPI_GROUPS.keys()), key="leader_group")
-                kcols = [c for c in KPI_GROUPS[group] if c in df_l.columns]
-                numeric = []
-                for c in kcols:
-                    df_l[c] = pd.to_numeric(df_l[c], errors="coerce")
-                    if pd.api.types.is_numeric_dtype(df_l[c]):
-                        numeric.append(c)
+                numeric = numeric_cols(df_l, KPI_GROUPS[group])
                 if numeric and block_col:
-                    agg = df_l.groupby(block_col)[numeric].mean().reset_index()
+                    agg = agg_service.aggregate("block", numeric, "mean", filter_state)
                     # create an overall score = mean of normalized KPI columns
-                    df_norm = agg.copy()
-                    for c in numeric:
-                        mn = df_norm[c].min(); mx = df_norm[c].max()
-                        if pd.isna(mn) or pd.isna(mx) or mx == mn:
-                            df_norm[c] = 0.5
-                        else:
-                            df_norm[c] = (df_norm[c] - mn) / (mx - mn)
-                    df_norm["score"] = df_norm[numeric].mean(axis=1)
-                    df_norm = df_norm.sort_values("score", ascending=False)
+                    df_norm = composite_score(agg, numeric)
                     st.subheader("Top jurisdictions (by KPI group composite score)")
                     st.dataframe(df_norm[[block_col, "score"] + numeric].head(10))
                     st.subheader("Bottom jurisdictions")
@@ -1165,27 +993,22 @@ else:
     
             else:
                 # specific KPI
-                all_kpis = sorted([c for group in KPI_GROUPS.values() for c in group if c in df_l.columns])
+                all_kpis = all_numeric_kpis(df_l)
                 if not all_kpis:
                     st.info("No KPIs available for leaderboard.")
                 else:
                     sel_kpi = st.selectbox("Select KPI", all_kpis, key="leader_specific_kpi")
-                    df_l[sel_kpi] = pd.to_numeric(df_l[sel_kpi], errors="coerce")
                     if block_col:
-                        agg = df_l.groupby(block_col)[sel_kpi].mean().reset_index().sort_values(sel_kpi, ascending=False)
                         st.subheader("Top jurisdictions")
-                        st.dataframe(agg.head(10))
+                        st.dataframe(agg_service.top_n("block", sel_kpi, "mean", 10, filter_state))
                         st.subheader("Lowest jurisdictions")
-                        st.dataframe(agg.tail(10))
+                        st.dataframe(agg_service.top_n("block", sel_kpi, "mean", 10, filter_state, ascending=True).iloc[::-1])
                     else:
                         st.info("No block column for grouping.")
     
     
     
-    import io
-    import pandas as pd
-    import streamlit as st
-    from datetime import datetime
+    trace.end(f"view:{active_view}")
     
     # Assuming your dataframe is called df and already loaded from Google Sheet
     
@@ -1193,8 +1016,9 @@ else:
     st.subheader("📅 Date Range & Data Download")
     
     # --- DATE RANGE SELECTOR ---
-    min_date = pd.to_datetime(df_inspect['date']).min() if 'date' in df_inspect.columns else datetime(2024, 1, 1)
-    max_date = pd.to_datetime(df_inspect['date']).max() if 'date' in df_inspect.columns else datetime.now()
+    min_date, max_date = fidx.date_bounds() if fidx is not None else (None, None)
+    if min_date is None:
+        min_date, max_date = datetime(2024, 1, 1), datetime.now()
     
     start_date, end_date = st.date_input(
         "Select Date Range",
@@ -1203,16 +1027,16 @@ else:
         max_value=max_date
     )
     
-    if len([start_date, end_date]) == 2:
-        filtered_df = df_inspect[
-            (pd.to_datetime(df_inspect['date']) >= pd.to_datetime(start_date)) &
-            (pd.to_datetime(df_inspect['date']) <= pd.to_datetime(end_date))
-        ]
+    range_filters = {"start": start_date, "end": end_date}
+    if store is not None:
+        filtered_df = df_inspect  # no rows: paged in SQL
+    elif fidx is not None and len([start_date, end_date]) == 2:
+        filtered_df = fidx.select(start_date, end_date)
     else:
         filtered_df = df_inspect.copy()
     
     st.write(f"Showing records from **{start_date}** to **{end_date}**")
-    st.dataframe(filtered_df)
+    paged_table(filtered_df, cols_for_table(), key="range_rows", choose_columns=True, filters=range_filters)
     
     # --- PDF REPORT DOWNLOAD SECTION (existing) ---
     st.markdown("### 📄 Generate PDF Report")
@@ -1221,22 +1045,29 @@ else:
     # --- EXCEL DOWNLOAD SECTION ---
     st.markdown("### 💾 Download Full Data (Excel)")
     
-    def convert_df_to_excel(df):
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Data')
-        output.seek(0)
-        return output.getvalue()
+    # entire dataframe, not filtered; built on first request per data version
+    full_data = store.table if store is not None else df_inspect
+    export_download("Complete Data (Excel)", full_data, "xlsx",
+                    f"goshala_data_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx", key="full_xlsx")
+    # columnar copy for analysts (pandas / Arrow / DuckDB)
+    export_download("Complete Data (Parquet)", full_data, "parquet",
+                    f"goshala_data_{datetime.now().strftime('%Y%m%d_%H%M')}.parquet", key="full_parquet")
+    
+    # --- Diagnostics (admins only): this run's stages, cache counters, recent runs ---
+    if username in ADMIN_USERS:
+        with st.expander("🛠 Diagnostics"):
+            st.markdown("**This run**")
+            st.dataframe(pd.DataFrame(trace.stages))
+            caches = [{"cache": k, **v} for k, v in cache_counters().items()]
+            if fidx is not None:
+                caches.append({"cache": "aggregates", **agg_service.stats()})
+            caches.append({"cache": "exports", **export_cache().stats()})
+            caches.append({"cache": "chart_images", **report_queue().images.stats()})
+            st.markdown("**Caches (this process)**")
+            st.dataframe(pd.DataFrame(caches))
+            st.markdown("**Recent runs**")
+            st.dataframe(pd.DataFrame(list(RECENT_RUNS)[::-1]).drop(columns="stages", errors="ignore"))
     
-    excel_data = convert_df_to_excel(df_inspect)  # entire dataframe, not filtered
-    
-    st.download_button(
-        label="⬇️ Download Complete Data (Excel)",
-        data=excel_data,
-        file_name=f"goshala_data_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
-
     # --- Top right logout button ---
     col1, col2 = st.columns([8, 2])
     with col2:
@@ -1249,4 +1080,5 @@ else:
     # -------------------------------
     st.markdown("---")
     st.caption("Dashboard generated by Goshala Inspection Dashboard system. PDF footers include watermark. © 2025 Government of Uttar Pradesh")
+    trace.finish()
     
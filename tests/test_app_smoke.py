@@ -0,0 +1,87 @@
+# test_app_smoke.py
+# Renders every view of the dashboard with Streamlit's AppTest on synthetic data.
+#
+# The inspection sheet is served from a fresh local snapshot (no network), the
+# static sheet is a synthetic workbook, and the user logs in through the real
+# login form (secrets users, plus roster users from users.json). Each view must
+# render without an exception.
+
+import json
+import os
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+AppTest = pytest.importorskip("streamlit.testing.v1").AppTest
+
+import sheet_sync  # noqa: E402
+from synthetic_data import make_inspection, make_static  # noqa: E402
+
+APP = os.path.join(ROOT, "test_authenticator.py")
+SHEET_CSV_URL = "https://docs.google.com/spreadsheets/d/1WZ1mKLGvUj24lLvjzP0CwF8_IBIK4jSqxPikTtiSLVg/export?format=csv"
+VIEWS = ["Overview", "Jurisdiction", "Officer", "KPI Groups", "Map", "Leaderboards"]
+PASSWORD = "smoke-pass"
+
+
+@pytest.fixture(scope="module")
+def workdir(tmp_path_factory):
+    """Working directory with a fresh snapshot of the default sheet and the static workbook."""
+    path = tmp_path_factory.mktemp("app")
+    data_path, meta_path = sheet_sync._snapshot_paths(str(path / ".goshala_cache"), SHEET_CSV_URL)
+    os.makedirs(os.path.dirname(data_path))
+    make_inspection(600, blocks=4, shelters=60, officers=8, seed=1).to_parquet(data_path, index=False)
+    with open(meta_path, "w", encoding="utf-8") as fh:
+        json.dump({"fetched_at": time.time() + 3600}, fh)  # fresh for the whole run: never fetched
+    make_static(blocks=4, shelters=60, seed=1).to_excel(path / "goshala_static_data.xlsx", index=False)
+    with open(path / "users.json", "w", encoding="utf-8") as fh:
+        json.dump([{"username": "scoped", "password": PASSWORD, "blocks": ["विकास खंड 1"]},
+                   {"username": "unassigned", "password": PASSWORD}], fh, ensure_ascii=False)
+    return path
+
+
+def login(workdir, monkeypatch, username: str, secrets=None) -> AppTest:
+    monkeypatch.chdir(workdir)
+    at = AppTest.from_file(APP, default_timeout=180)
+    at.secrets["auth"] = {"cookie_name": "smoke", "signature_key": "smoke-key", "cookie_expiry_days": 1,
+                          "usernames": ["admin", "viewer"], "names": ["Admin", "Viewer"],
+                          "passwords": [PASSWORD, PASSWORD], "admins": ["admin"], **(secrets or {})}
+    at.run()
+    at.text_input[0].input(username)
+    at.text_input[1].input(PASSWORD)
+    at.button[0].click().run()
+    assert not at.exception, at.exception
+    return at
+
+
+def assert_clean(at, what: str):
+    assert not at.exception, f"{what}: {at.exception}"
+    assert not at.error, f"{what}: {[e.value for e in at.error]}"
+
+
+@pytest.mark.parametrize("username, secrets", [("admin", None), ("admin", {"query_store": True}), ("scoped", None)],
+                         ids=["pandas", "query_store", "scoped"])
+def test_views_render(workdir, monkeypatch, username, secrets):
+    at = login(workdir, monkeypatch, username, secrets)
+    for view in VIEWS:
+        at.radio(key="active_view").set_value(view).run()
+        assert_clean(at, view)
+    # the Overview's local filters and every map mode read their own columns / values
+    at.radio(key="active_view").set_value("Overview").run()
+    at.selectbox(key="ov_block_select").set_value(at.selectbox(key="ov_block_select").options[1]).run()
+    assert_clean(at, "Overview local filter")
+    at.radio(key="active_view").set_value("Map").run()
+    for mode in ["KPI Group mean", "Specific KPI"]:
+        at.selectbox(key="map_mode").set_value(mode).run()
+        assert_clean(at, f"Map: {mode}")
+
+
+def test_unassigned_roster_user_sees_no_data(workdir, monkeypatch):
+    at = login(workdir, monkeypatch, "unassigned")
+    assert any("No blocks / districts are assigned" in w.value for w in at.warning)
+    for view in VIEWS:
+        at.radio(key="active_view").set_value(view).run()
+        assert not at.exception, f"{view}: {at.exception}"
@@ -0,0 +1,91 @@
+# test_filter_index.py
+# FilterIndex selections against a plain pandas boolean mask, at the date boundaries.
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_prep import prepare_inspection  # noqa: E402
+from filter_index import FILTER_DIMS, FilterIndex  # noqa: E402
+from schema import COL_RENAME  # noqa: E402
+from synthetic_data import make_inspection  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def df():
+    out = prepare_inspection(make_inspection(2000, blocks=5, shelters=60, officers=8, seed=4), COL_RENAME)
+    # rows without a date never match a selection
+    out.loc[out.sample(40, random_state=1).index, "date"] = pd.NaT
+    return out.assign(row_id=range(len(out)))
+
+
+@pytest.fixture(scope="module")
+def fidx(df):
+    return FilterIndex(df)
+
+
+def reference(df, start=None, end=None, **filters) -> pd.DataFrame:
+    mask = df["date"].notna()
+    if start is not None:
+        mask &= df["date"] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= df["date"] <= pd.Timestamp(end)
+    for name, value in filters.items():
+        if value is not None and value != "All":
+            mask &= df[FILTER_DIMS[name]].astype(str) == str(value)
+    return df[mask]
+
+
+def same_rows(got: pd.DataFrame, want: pd.DataFrame):
+    # FilterIndex returns the rows in date order; compare as row sets
+    got = got.sort_values("row_id").reset_index(drop=True)
+    want = want.sort_values("row_id").reset_index(drop=True)
+    pd.testing.assert_frame_equal(got[want.columns], want)
+
+
+def test_bounds_are_inclusive(df, fidx):
+    days = sorted(df["date"].dropna().unique())
+    lo, hi = pd.Timestamp(days[3]), pd.Timestamp(days[-4])
+    same_rows(fidx.select(lo, hi), reference(df, lo, hi))
+    # the first and last day of the range are both in the selection
+    picked = fidx.select(lo, hi)["date"]
+    assert picked.min() == lo and picked.max() == hi
+
+
+@pytest.mark.parametrize("shift", [-1, 0, 1])
+def test_single_day(df, fidx, shift):
+    day = pd.Timestamp(sorted(df["date"].dropna().unique())[10]) + pd.Timedelta(days=shift)
+    same_rows(fidx.select(day, day), reference(df, day, day))
+
+
+def test_open_and_outside_ranges(df, fidx):
+    first, last = fidx.date_bounds()
+    assert (first, last) == (df["date"].min(), df["date"].max())
+    same_rows(fidx.select(), reference(df))
+    same_rows(fidx.select(None, first), reference(df, None, first))
+    same_rows(fidx.select(last, None), reference(df, last, None))
+    assert fidx.select(last + pd.Timedelta(days=1), None).empty
+    assert fidx.select(None, first - pd.Timedelta(days=1)).empty
+    # start after end: empty, not an error
+    assert fidx.select(last, first).empty
+
+
+def test_date_objects_match_timestamps(df, fidx):
+    # the sidebar passes datetime.date values
+    days = sorted(df["date"].dropna().unique())
+    lo, hi = pd.Timestamp(days[5]), pd.Timestamp(days[20])
+    same_rows(fidx.select(lo.date(), hi.date()), reference(df, lo, hi))
+
+
+def test_filters_combined_with_dates(df, fidx):
+    days = sorted(df["date"].dropna().unique())
+    lo, hi = pd.Timestamp(days[2]), pd.Timestamp(days[-3])
+    block = fidx.options("block")[1]
+    officer = fidx.options("officer")[0]
+    for filters in ({"block": block}, {"block": block, "officer": officer}, {"block": "All", "officer": officer}):
+        same_rows(fidx.select(lo, hi, **filters), reference(df, lo, hi, **filters))
+    assert fidx.select(lo, hi, block="no such block").empty
@@ -0,0 +1,81 @@
+# test_kpi_cube.py
+# KpiCube roll-ups against a plain pandas group-by over the same rows.
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_prep import prepare_inspection  # noqa: E402
+from kpi_cube import CUBE_FILTERS, KpiCube  # noqa: E402
+from schema import COL_RENAME  # noqa: E402
+from synthetic_data import make_inspection  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def df():
+    return prepare_inspection(make_inspection(3000, blocks=5, shelters=60, officers=8, seed=5), COL_RENAME)
+
+
+@pytest.fixture(scope="module")
+def cube(df):
+    return KpiCube(df)
+
+
+def reference(df, dimension, kpis, stat, start=None, end=None, **filters) -> pd.DataFrame:
+    mask = df["date"].notna()
+    if start is not None:
+        mask &= df["date"] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= df["date"] <= pd.Timestamp(end)
+    for name, value in filters.items():
+        mask &= df[CUBE_FILTERS[name]].astype(str) == value
+    # KPIs are stored as float32; the cube sums in float64, so does the reference
+    rows = df[mask].astype({k: "float64" for k in kpis})
+    if dimension is None:
+        if stat == "size":
+            return pd.DataFrame({"Inspections": [len(rows)]})
+        return rows[kpis].agg(stat).to_frame().T.reset_index(drop=True)
+    grouped = rows.groupby(dimension, observed=True, sort=True)
+    out = grouped.size().rename("Inspections").to_frame() if stat == "size" else grouped[kpis].agg(stat)
+    return out.reset_index()
+
+
+def assert_same(got: pd.DataFrame, want: pd.DataFrame):
+    assert list(got.columns) == list(want.columns)
+    assert len(got) == len(want) > 0
+    for col in want.columns:
+        if pd.api.types.is_numeric_dtype(want[col]):
+            np.testing.assert_allclose(got[col].to_numpy(dtype="float64"), want[col].to_numpy(dtype="float64"),
+                                       rtol=1e-9, atol=1e-9, err_msg=col)
+        else:
+            assert got[col].astype(str).tolist() == want[col].astype(str).tolist()
+
+
+@pytest.mark.parametrize("stat", ["mean", "std", "var", "sum", "count", "size"])
+@pytest.mark.parametrize("dimension", [None, "block_name_static", "officer_name"])
+def test_rollup_matches_groupby(df, cube, dimension, stat):
+    kpis = cube.kpis[:6]
+    assert_same(cube.rollup(dimension, kpis, stat), reference(df, dimension, kpis, stat))
+
+
+@pytest.mark.parametrize("stat", ["mean", "std"])
+def test_filtered_rollup_matches_groupby(df, cube, stat):
+    kpis = cube.kpis[:6]
+    days = sorted(df["date"].dropna().unique())
+    start, end = pd.Timestamp(days[5]), pd.Timestamp(days[-5])
+    block = sorted(df["block_name_static"].dropna().astype(str).unique())[0]
+    got = cube.rollup("officer_name", kpis, stat, start, end, block=block)
+    assert_same(got, reference(df, "officer_name", kpis, stat, start, end, block=block))
+
+
+def test_std_of_single_value_is_nan(df):
+    # one inspection per officer: a sample std is undefined, as in pandas
+    rows = df.dropna(subset=["officer_name"]).drop_duplicates("officer_name")
+    cube = KpiCube(rows)
+    got = cube.rollup("officer_name", cube.kpis[:3], "std")
+    assert got[cube.kpis[:3]].isna().all().all()
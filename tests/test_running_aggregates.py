@@ -0,0 +1,76 @@
+# test_running_aggregates.py
+# Running aggregates against a full rebuild: appends fold in, rewrites rebuild.
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_prep import prepare_inspection  # noqa: E402
+from kpi_cube import KpiCube  # noqa: E402
+from running_aggregates import RunningAggregates  # noqa: E402
+from schema import COL_RENAME  # noqa: E402
+from sources import SOURCE_COL  # noqa: E402
+from synthetic_data import HEADER, make_inspection  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def raw():
+    a = make_inspection(3000, blocks=5, shelters=80, officers=10, seed=1).assign(**{SOURCE_COL: "A"})
+    b = make_inspection(1000, blocks=5, shelters=80, officers=10, seed=2).assign(**{SOURCE_COL: "B"})
+    return pd.concat([a, b], ignore_index=True)
+
+
+def kpi_totals(cube: KpiCube) -> pd.Series:
+    cols = [c for c in cube.table.columns if c.endswith("__sum") or c.endswith("__count")]
+    return cube.table[cols].sum().sort_index()
+
+
+def full_totals(raw: pd.DataFrame) -> pd.Series:
+    return kpi_totals(KpiCube(prepare_inspection(raw, COL_RENAME)))
+
+
+def edited(raw: pd.DataFrame, row: int) -> tuple:
+    """raw with one KPI cell of an early row changed in place, and that KPI."""
+    kpi = KpiCube(prepare_inspection(raw.iloc[:50], COL_RENAME)).kpis[0]
+    out = raw.copy()
+    out.loc[row, HEADER[kpi]] = "99999"
+    return out, kpi
+
+
+def test_append_is_incremental_and_exact(raw, tmp_path):
+    running = RunningAggregates.load(str(tmp_path))
+    assert running.update(raw.iloc[:3500], generations={"A": 0, "B": 0})["mode"] == "rebuild"
+    running.save()
+    running = RunningAggregates.load(str(tmp_path))
+    result = running.update(raw, generations={"A": 0, "B": 0})
+    assert result["mode"] == "incremental" and result["new_rows"] == 500
+    pd.testing.assert_series_equal(kpi_totals(running.cube()), full_totals(raw), check_dtype=False)
+
+
+@pytest.mark.parametrize("with_generations", [True, False])
+def test_edited_row_rebuilds(raw, tmp_path, with_generations):
+    running = RunningAggregates.load(str(tmp_path))
+    running.update(raw, generations={"A": 0, "B": 0} if with_generations else None)
+    running.save()
+    # one cell of a row in the middle of source A
+    changed, kpi = edited(raw, 1237)
+    assert full_totals(changed)[f"{kpi}__sum"] != full_totals(raw)[f"{kpi}__sum"]
+    running = RunningAggregates.load(str(tmp_path))
+    # sheet_sync reports the rewritten source with a new generation
+    result = running.update(changed, generations={"A": 1, "B": 0} if with_generations else None)
+    assert result["mode"] == "rebuild"
+    totals = kpi_totals(running.cube())
+    assert totals[f"{kpi}__sum"] == full_totals(changed)[f"{kpi}__sum"]
+    pd.testing.assert_series_equal(totals, full_totals(changed), check_dtype=False)
+
+
+def test_missing_source_rebuilds(raw, tmp_path):
+    running = RunningAggregates.load(str(tmp_path))
+    running.update(raw, generations={"A": 0, "B": 0})
+    only_a = raw[raw[SOURCE_COL] == "A"].reset_index(drop=True)
+    assert running.update(only_a, generations={"A": 0})["mode"] == "rebuild"
+    pd.testing.assert_series_equal(kpi_totals(running.cube()), full_totals(only_a), check_dtype=False)
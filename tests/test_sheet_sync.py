@@ -0,0 +1,113 @@
+# test_sheet_sync.py
+# sync_sheet_status against a local HTTP stand-in for the Google Sheet export.
+
+import http.server
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sheet_sync import read_meta, sync_sheet_status  # noqa: E402
+
+HEADER = "Created At,Block,Score\n"
+ROWS = "2024-01-01 10:00,A,1\n2024-01-02 10:00,B,2\n"
+
+
+class SheetServer:
+    """Serves one CSV body with an ETag; answers 304 to a matching If-None-Match."""
+
+    def __init__(self):
+        self.body = (HEADER + ROWS).encode("utf-8")
+        self.status = 200
+        self.requests = []
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append(dict(self.headers))
+                etag = f'"{hash(server.body) & 0xffffffff:x}"'
+                if server.status != 200:
+                    self.send_response(server.status)
+                    self.end_headers()
+                elif self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                else:
+                    self.send_response(200)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", str(len(server.body)))
+                    self.end_headers()
+                    self.wfile.write(server.body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = http.server.HTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/export?format=csv"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+
+@pytest.fixture
+def sheet():
+    server = SheetServer()
+    yield server
+    server.httpd.shutdown()
+
+
+def sync(sheet, tmp_path):
+    return sync_sheet_status(sheet.url, str(tmp_path), force=True, timeout=5)
+
+
+def test_first_fetch_then_304(sheet, tmp_path):
+    df, status = sync(sheet, tmp_path)
+    assert status["state"] == "replaced" and len(df) == 2
+    df, status = sync(sheet, tmp_path)
+    assert status["state"] == "not_modified"
+    assert sheet.requests[-1].get("If-None-Match")
+    assert len(df) == 2
+
+
+def test_ttl_serves_cached_snapshot(sheet, tmp_path):
+    sync(sheet, tmp_path)
+    df, status = sync_sheet_status(sheet.url, str(tmp_path), ttl_seconds=3600, timeout=5)
+    assert status["state"] == "cached" and len(df) == 2
+    assert len(sheet.requests) == 1
+
+
+def test_changed_content_appends(sheet, tmp_path):
+    sync(sheet, tmp_path)
+    # same timestamp, blank timestamp: new rows are found by position, not by "Created At"
+    sheet.body = (HEADER + ROWS + "2024-01-02 10:00,C,3\n,D,4\n").encode("utf-8")
+    df, status = sync(sheet, tmp_path)
+    assert status["state"] == "appended" and status["appended_rows"] == 2
+    assert status["generation"] == 1  # the first fetch was generation 1; appends keep it
+    assert df["Block"].tolist() == ["A", "B", "C", "D"]
+    assert read_meta(str(tmp_path), sheet.url)["rows"] == 4
+
+
+def test_rewrite_replaces(sheet, tmp_path):
+    sync(sheet, tmp_path)
+    sheet.body = (HEADER + "2024-01-01 10:00,A,10\n2024-01-02 10:00,B,2\n2024-01-03 10:00,C,3\n").encode("utf-8")
+    df, status = sync(sheet, tmp_path)
+    assert status["state"] == "replaced" and status["generation"] == 2
+    assert df["Score"].tolist() == ["10", "2", "3"]
+    # the validators now describe the rewritten export
+    assert sync(sheet, tmp_path)[1]["state"] == "not_modified"
+
+
+def test_offline_serves_snapshot(sheet, tmp_path):
+    sync(sheet, tmp_path)
+    sheet.status = 500
+    df, status = sync(sheet, tmp_path)
+    assert status["state"] == "offline" and "error" in status
+    assert status["synced_at"] is not None
+    assert df["Block"].tolist() == ["A", "B"]
+
+
+def test_offline_without_snapshot_raises(sheet, tmp_path):
+    sheet.status = 500
+    with pytest.raises(Exception):
+        sync(sheet, tmp_path)
@@ -0,0 +1,64 @@
+# test_table_view.py
+# get_page against a stable pandas sort (missing values last) of the whole frame.
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from table_view import get_page, top_k_positions  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def df():
+    rng = np.random.default_rng(6)
+    n = 1000
+    score = rng.integers(0, 20, n).astype("float64")  # many ties
+    score[rng.choice(n, 60, replace=False)] = np.nan
+    dates = np.sort(pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 40, n), unit="D"))
+    return pd.DataFrame({
+        "row_id": np.arange(n),
+        "score": score,
+        "name": pd.Categorical(rng.choice(["b", "a", "d", "c", None], n)),
+        "date": dates,  # date-sorted, with ties: the monotonic slicing path
+    })
+
+
+def reference_page(df, sort_by, ascending, page, page_size) -> pd.DataFrame:
+    ordered = df.sort_values(sort_by, ascending=ascending, kind="stable", na_position="last")
+    return ordered.iloc[(page - 1) * page_size:page * page_size]
+
+
+@pytest.mark.parametrize("ascending", [True, False])
+@pytest.mark.parametrize("sort_by", ["score", "name", "date"])
+@pytest.mark.parametrize("page", [1, 2, 7, 20])
+def test_page_matches_stable_sort(df, sort_by, ascending, page):
+    rows, total, n_pages = get_page(df, ["row_id", sort_by], sort_by, ascending, page, page_size=50)
+    want = reference_page(df, sort_by, ascending, page, 50)
+    assert (total, n_pages) == (1000, 20)
+    # same rows in the same order: ties keep their original order, missing values come last
+    assert rows["row_id"].tolist() == want["row_id"].tolist()
+    assert rows.index.tolist() == list(range((page - 1) * 50 + 1, (page - 1) * 50 + 1 + len(want)))
+
+
+def test_page_out_of_range_is_clamped(df):
+    rows, _, n_pages = get_page(df, ["row_id"], "score", True, page=99, page_size=300)
+    assert n_pages == 4
+    assert rows["row_id"].tolist() == reference_page(df, "score", True, 4, 300)["row_id"].tolist()
+
+
+def test_unsorted_page_is_a_slice(df):
+    rows, _, _ = get_page(df, ["row_id"], None, True, page=3, page_size=50)
+    assert rows["row_id"].tolist() == list(range(100, 150))
+
+
+def test_top_k_ties_and_missing():
+    keys = np.array([3.0, np.nan, 1.0, 3.0, 1.0, 2.0, np.nan, 3.0])
+    assert top_k_positions(keys, 4).tolist() == [2, 4, 5, 0]
+    assert top_k_positions(keys, 4, ascending=False).tolist() == [0, 3, 7, 5]
+    assert top_k_positions(keys, 8).tolist() == [2, 4, 5, 0, 3, 7, 1, 6]
+    assert top_k_positions(keys, 0).tolist() == []
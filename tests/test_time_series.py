@@ -0,0 +1,77 @@
+# test_time_series.py
+# LTTB downsampling invariants, and KPI trends against a pandas group-by by period.
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from time_series import daily_totals_from_rows, lttb, trend_from_totals  # noqa: E402
+
+
+def series(n: int, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    x = np.cumsum(rng.integers(1, 4, n)).astype("float64")  # uneven spacing
+    y = np.sin(np.arange(n) / 25) + rng.normal(0, 0.1, n)
+    return x, y
+
+
+@pytest.mark.parametrize("n, n_out", [(1000, 600), (1000, 3), (5000, 100), (601, 600), (10, 9)])
+def test_lttb_size_and_endpoints(n, n_out):
+    x, y = series(n)
+    keep = lttb(x, y, n_out)
+    assert len(keep) == n_out
+    assert keep[0] == 0 and keep[-1] == n - 1
+    # positions strictly increase: no duplicates, x order kept
+    assert (np.diff(keep) > 0).all()
+
+
+@pytest.mark.parametrize("n_out", [1000, 2000, 2])
+def test_lttb_short_series_is_kept(n_out):
+    # nothing to reduce (or too few points asked for a middle bucket): every point
+    x, y = series(1000)
+    assert lttb(x, y, n_out).tolist() == list(range(1000))
+
+
+def test_lttb_keeps_a_spike():
+    x, y = series(2000)
+    y[1234] = 50.0
+    assert 1234 in lttb(x, y, 100)
+
+
+@pytest.fixture(scope="module")
+def rows():
+    rng = np.random.default_rng(8)
+    n = 5000
+    score = rng.normal(10, 3, n)
+    score[rng.choice(n, 500, replace=False)] = np.nan
+    dates = pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 700, n), unit="D")
+    return pd.DataFrame({"date": dates, "score": score})
+
+
+@pytest.mark.parametrize("freq", ["D", "W", "M", "Q"])
+@pytest.mark.parametrize("stat", ["mean", "sum", "count", "size"])
+def test_trend_matches_groupby(rows, freq, stat):
+    got = trend_from_totals(daily_totals_from_rows(rows, ["score"]), "score", stat, freq, max_points=10_000)
+    grouped = rows.groupby(rows["date"].dt.to_period(freq).dt.start_time)
+    name = "Inspections" if stat == "size" else "score"
+    want = (grouped.size() if stat == "size" else grouped["score"].agg(stat)).rename(name)
+    if stat == "sum":
+        want = want[grouped["score"].count() > 0]
+    want = want.rename_axis("date").reset_index()
+    assert got["date"].tolist() == want["date"].tolist()
+    np.testing.assert_allclose(got[name].to_numpy(dtype="float64"), want[name].to_numpy(dtype="float64"), rtol=1e-9)
+
+
+def test_trend_is_downsampled_with_endpoints(rows):
+    full = trend_from_totals(daily_totals_from_rows(rows, ["score"]), "score", "mean", "D", max_points=10_000)
+    short = trend_from_totals(daily_totals_from_rows(rows, ["score"]), "score", "mean", "D", max_points=100)
+    assert len(full) > 100 and len(short) == 100
+    assert short["date"].iloc[0] == full["date"].iloc[0] and short["date"].iloc[-1] == full["date"].iloc[-1]
+    # every kept point is a real point of the full series
+    merged = short.merge(full, on="date", suffixes=("", "_full"))
+    assert len(merged) == 100 and (merged["score"] == merged["score_full"]).all()
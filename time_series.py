@@ -0,0 +1,109 @@
+# time_series.py
+# KPI trends at a chosen granularity, with rolling averages and LTTB downsampling.
+#
+# The services (AggregationService, QueryStore) hand out daily totals for the
+# filtered rows: per day, the sum and non-null count of each KPI and the row
+# count. For cube KPIs these are roll-ups of the KPI cube, which already holds
+# them per day x block x shelter type x officer, so no raw rows are touched.
+# Weeks / months / quarters and rolling windows are sums of those totals, which
+# keeps weekly and monthly means exact (weighted by inspections, not a mean of
+# daily means). Series longer than the chart budget are reduced with
+# Largest-Triangle-Three-Buckets, which keeps the visual shape (peaks, dips)
+# with a few hundred points, so a multi-year trend plots like a one-month one.
+
+import numpy as np
+import pandas as pd
+
+from kpi_cube import ROWS
+
+# label -> pandas period frequency
+FREQUENCIES = {"Day": "D", "Week": "W", "Month": "M", "Quarter": "Q"}
+MAX_POINTS = 600
+
+
+def total_cols(kpi: str):
+    return f"{kpi}__sum", f"{kpi}__count"
+
+
+def daily_totals_from_rows(df: pd.DataFrame, kpis: list) -> pd.DataFrame:
+    """Per-day row count and per-KPI sum / non-null count of a frame of inspection rows."""
+    if "date" not in df.columns or df.empty:
+        return pd.DataFrame(columns=["date", ROWS] + [c for k in kpis for c in total_cols(k)])
+    parts = {"date": df["date"].to_numpy(), ROWS: np.ones(len(df), dtype="int64")}
+    for k in kpis:
+        values = df[k].astype("float64")
+        s, c = total_cols(k)
+        parts[s] = values.fillna(0.0).to_numpy()
+        parts[c] = values.notna().to_numpy().astype("int64")
+    return pd.DataFrame(parts).dropna(subset=["date"]).groupby("date", sort=True).sum().reset_index()
+
+
+def resample_totals(daily: pd.DataFrame, freq: str = "D") -> pd.DataFrame:
+    """Totals per period (start date), with empty periods in the range filled with zeros."""
+    if daily.empty:
+        return daily
+    period = pd.to_datetime(daily["date"]).dt.to_period(freq)
+    totals = daily.drop(columns="date").groupby(period.to_numpy(), sort=True).sum()
+    full = pd.period_range(totals.index.min(), totals.index.max(), freq=freq)
+    totals = totals.reindex(full, fill_value=0)
+    totals.index = totals.index.start_time
+    return totals.rename_axis("date").reset_index()
+
+
+def _value(totals: pd.DataFrame, kpi: str, stat: str) -> pd.Series:
+    if stat == "size":
+        return totals[ROWS].astype("float64").where(totals[ROWS] > 0)
+    s, c = (totals[col].astype("float64") for col in total_cols(kpi))
+    if stat == "sum":
+        return s.where(c > 0)
+    if stat == "count":
+        return c
+    return s / c.where(c > 0)
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Positions of the n_out points Largest-Triangle-Three-Buckets keeps (first and last included)."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)  # n_out - 2 buckets between the end points
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # average of the next bucket (the last point for the last bucket)
+        nlo, nhi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def trend_from_totals(daily: pd.DataFrame, kpi: str, stat: str = "mean", freq: str = "D", rolling: int = 0,
+                      max_points: int = MAX_POINTS) -> pd.DataFrame:
+    """date, <kpi> and, with rolling > 1, "<kpi> (<rolling>-<period> rolling)" over rolling periods.
+
+    stat is "mean", "sum", "count" or "size" (inspections, returned as "Inspections").
+    Periods without a value are left out; longer series are LTTB-downsampled to max_points.
+    """
+    name = "Inspections" if stat == "size" else kpi
+    totals = resample_totals(daily, freq)
+    if totals.empty:
+        return pd.DataFrame(columns=["date", name])
+    out = pd.DataFrame({"date": totals["date"], name: _value(totals, kpi, stat)})
+    if rolling and rolling > 1:
+        window = totals.drop(columns="date").rolling(rolling, min_periods=1).sum()
+        out[f"{name} ({rolling}-{freq_label(freq).lower()} rolling)"] = _value(window, kpi, stat)
+    out = out.dropna(subset=[name]).reset_index(drop=True)
+    if len(out) > max_points:
+        x = out["date"].to_numpy().astype("datetime64[ns]").astype("int64")
+        out = out.iloc[lttb(x, out[name].to_numpy(), max_points)].reset_index(drop=True)
+    return out
+
+
+def freq_label(freq: str) -> str:
+    return next((label for label, f in FREQUENCIES.items() if f == freq), freq)
@@ -0,0 +1,152 @@
+# user_store.py
+# Dashboard users from secrets and an optional local users file.
+#
+# Users come from the auth.usernames / names / passwords lists in secrets (any
+# number of entries) and from a JSON list of {username, name, password, email,
+# role, blocks, districts} records, e.g. the field officer roster. They are indexed by
+# lowercase username (what streamlit-authenticator compares against), and plain
+# text passwords are bcrypt-hashed once when the store is loaded, so building an
+# authenticator never hashes anything. Secrets users and admins see the whole
+# state; a roster user sees only their blocks / districts, and nothing until
+# they are assigned some. Keep the users file hashed:
+#
+#   python user_store.py hash users.json
+#
+# The app caches the store per process and keeps one authenticator per session.
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+
+import bcrypt
+
+BCRYPT_RE = re.compile(r"^\$2[aby]\$\d{2}\$.{53}$")
+
+logger = logging.getLogger("goshala.users")
+
+
+def is_hash(password: str) -> bool:
+    return bool(BCRYPT_RE.match(str(password)))
+
+
+def hash_password(password: str) -> str:
+    return bcrypt.hashpw(str(password).encode(), bcrypt.gensalt()).decode()
+
+
+def _secrets_users(auth) -> list:
+    usernames = list(auth.get("usernames", []))
+    names = list(auth.get("names", [])) + [None] * len(usernames)
+    passwords = list(auth.get("passwords", []))
+    if len(passwords) < len(usernames):
+        raise ValueError("auth.passwords must have one entry per auth.usernames entry")
+    return [{"username": u, "name": n or u, "password": p} for u, n, p in zip(usernames, names, passwords)]
+
+
+def _file_users(path) -> list:
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as fh:
+        entries = json.load(fh)
+    if isinstance(entries, dict):  # {username: record}
+        entries = [{"username": u, **rec} for u, rec in entries.items()]
+    return entries
+
+
+def users_version(auth, path=None) -> str:
+    """Changes whenever the secrets user lists or the users file change (cache key)."""
+    h = hashlib.sha1(json.dumps([list(auth.get(k, [])) for k in ("usernames", "names", "passwords")],
+                                default=str).encode("utf-8"))
+    if path and os.path.exists(path):
+        stat = os.stat(path)
+        h.update(f"{path}:{stat.st_mtime_ns}:{stat.st_size}".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+class UserStore:
+    """Users by lowercase username, passwords already hashed."""
+
+    def __init__(self, records, version: str = ""):
+        self.version = version
+        self.users = {}
+        self._unassigned = set()  # roster users already logged as having no jurisdiction
+        for rec in records:
+            username = str(rec["username"]).strip().lower()
+            if not username or not rec.get("password"):
+                continue
+            password = str(rec["password"])
+            self.users[username] = {
+                "name": rec.get("name") or username,
+                "password": password if is_hash(password) else hash_password(password),
+                "email": rec.get("email"),
+                "role": rec.get("role"),
+                "blocks": list(rec.get("blocks") or []),
+                "districts": list(rec.get("districts") or []),
+                "roster": bool(rec.get("roster")),
+            }
+
+    def __len__(self):
+        return len(self.users)
+
+    def __contains__(self, username):
+        return str(username or "").lower() in self.users
+
+    def get(self, username) -> dict:
+        return self.users.get(str(username or "").lower())
+
+    def scope(self, username, admin: bool = False):
+        """(blocks, districts) a user is limited to, or None for state-wide access.
+
+        A roster user who is not an admin (role "admin" or admin=True) and has no
+        blocks / districts gets ([], []): no data until they are assigned some.
+        """
+        rec = self.get(username)
+        if rec is None:
+            return None
+        if rec["blocks"] or rec["districts"]:
+            return rec["blocks"], rec["districts"]
+        if not rec["roster"] or admin or rec["role"] == "admin":
+            return None
+        key = str(username).lower()
+        if key not in self._unassigned:
+            self._unassigned.add(key)
+            logger.warning("user %r has no blocks / districts assigned: no inspection data shown", key)
+        return [], []
+
+    def admins(self) -> set:
+        return {u for u, rec in self.users.items() if rec["role"] == "admin"}
+
+    def credentials(self) -> dict:
+        """Credentials dict for stauth.Authenticate. A fresh copy per call: the
+        authenticator writes login state into the records."""
+        return {"usernames": {u: dict(rec) for u, rec in self.users.items()}}
+
+
+def load_user_store(auth, path=None) -> UserStore:
+    """Secrets users first; a users file entry with the same username replaces it."""
+    return UserStore(_secrets_users(auth) + [{**rec, "roster": True} for rec in _file_users(path)],
+                     users_version(auth, path))
+
+
+def hash_file(path: str) -> int:
+    """Replace plain text passwords in a users file by bcrypt hashes; returns how many."""
+    entries = _file_users(path)
+    changed = 0
+    for rec in entries:
+        if rec.get("password") and not is_hash(rec["password"]):
+            rec["password"] = hash_password(rec["password"])
+            changed += 1
+    if changed:
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(entries, fh, indent=2, ensure_ascii=False)
+        os.replace(tmp, path)
+    return changed
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "hash":
+        sys.exit("usage: python user_store.py hash users.json")
+    print(f"{hash_file(sys.argv[2])} passwords hashed in {sys.argv[2]}")